@@ -0,0 +1,168 @@
+# Streaming archive of scraped members
+#
+# Members are written as newline-delimited JSON, compressed with gzip or
+# zstd, into files rotated by item count or size so no run ever holds more
+# than one line in memory. iter_members() reads any number of archived runs
+# back lazily, old CSV feeds included.
+
+import csv
+import glob
+import gzip
+import io
+import json
+import os
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXTENSIONS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst", "none": ".jsonl"}
+
+
+class ArchiveWriter:
+    """
+    Writes members to a series of compressed NDJSON files.
+
+    A new file is started once the current one holds ``max_items`` members or
+    ``max_bytes`` compressed bytes. The compressor is flushed every
+    ``flush_every`` members, so an interrupted run leaves readable files.
+
+    Attributes:
+        directory (str): Directory receiving the files.
+        prefix (str): File name prefix, e.g. the spider name and run time.
+        compression (str): One of 'gzip', 'zstd' or 'none'.
+        paths (list): The files written so far.
+
+    Example:
+        >>> writer = ArchiveWriter("archive", "Ontario-20240101T000000")
+        >>> writer.write({"Name": "Jane Doe"})
+        >>> writer.close()
+    """
+
+    def __init__(self, directory, prefix, compression="gzip", max_items=100000,
+                 max_bytes=64 * 1024 * 1024, flush_every=1000):
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Unknown archive compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd archives require the zstandard library")
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = compression
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.paths = []
+        self.raw = None
+        self.stream = None
+        self.items = 0
+
+    def open_next(self):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.paths):04d}"
+                            + EXTENSIONS[self.compression])
+        self.raw = open(path, "wb")
+        if self.compression == "gzip":
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode="wb")
+        elif self.compression == "zstd":
+            self.stream = zstandard.ZstdCompressor().stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+        self.paths.append(path)
+        self.items = 0
+
+    def write(self, member):
+        """
+        Appends one member, rotating to a new file when the current one is full.
+
+        Args:
+            member (dict): The member fields.
+        """
+        if self.stream is None or self.items >= self.max_items or self.raw.tell() >= self.max_bytes:
+            self.open_next()
+        line = json.dumps(member, ensure_ascii=False) + "\n"
+        self.stream.write(line.encode("utf-8"))
+        self.items += 1
+        if self.items % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        if self.stream is None:
+            return
+        if self.compression == "zstd":
+            self.stream.flush(zstandard.FLUSH_BLOCK)
+        else:
+            self.stream.flush()
+        self.raw.flush()
+
+    def close(self):
+        if self.stream is None:
+            return
+        if self.stream is not self.raw:
+            self.stream.close()
+        self.raw.close()
+        self.stream = self.raw = None
+
+
+def run_prefix(spider_name):
+    """
+    Returns the file prefix of a new run of a spider, e.g. ``Ontario-20240101T120000``.
+    """
+    return f"{spider_name}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}"
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("zstd archives require the zstandard library")
+        raw = open(path, "rb")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True),
+                                encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def archive_paths(*patterns):
+    """
+    Expands files, directories and glob patterns into archive paths, in name order.
+
+    Args:
+        *patterns (str): Files, directories or glob patterns.
+
+    Yields:
+        str: The path of each archived run.
+    """
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        for path in sorted(glob.glob(pattern)):
+            if path.endswith((".jsonl", ".jsonl.gz", ".jsonl.zst", ".jl", ".csv", ".csv.gz")):
+                yield path
+
+
+def iter_members(*patterns):
+    """
+    Iterates lazily over the members of any number of archived runs.
+
+    Only one line is held in memory at a time, whatever the number and size
+    of the runs. NDJSON archives and the CSV feeds of older runs are both read.
+
+    Args:
+        *patterns (str): Files, directories or glob patterns.
+
+    Yields:
+        dict: The fields of each member, in file order.
+
+    Example:
+        >>> for member in iter_members("archive/Ontario-*", "Ontario.csv"):
+        ...     print(member["Name"])
+    """
+    for path in archive_paths(*patterns):
+        with _open_text(path) as f:
+            if ".csv" in path:
+                yield from csv.DictReader(f)
+            else:
+                yield from (json.loads(line) for line in f if line.strip())
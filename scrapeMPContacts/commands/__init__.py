@@ -0,0 +1,4 @@
+# This package contains the custom scrapy commands of the project
+#
+# They are registered through the COMMANDS_MODULE setting, see:
+# https://docs.scrapy.org/en/latest/topics/commands.html#custom-project-commands
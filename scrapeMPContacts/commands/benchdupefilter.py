@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from scrapy import Request
+from scrapy.commands import ScrapyCommand
+from scrapy.dupefilters import RFPDupeFilter
+
+from scrapeMPContacts.fingerprints import CompactDupeFilter
+
+
+def synthetic_requests(start, count):
+    """
+    Yields ``count`` distinct member page requests.
+    """
+    for number in range(start, start + count):
+        yield Request(f"https://www.example.ca/members/member-{number}")
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+class Command(ScrapyCommand):
+    """
+    Compares resuming a JOBDIR with Scrapy's RFPDupeFilter and with CompactDupeFilter.
+
+    Both dupefilters first record the same history of synthetic requests in
+    a JOBDIR of their own. The report gives the time and memory needed to
+    reopen each history, as a resumed crawl does, the time per request_seen()
+    call on seen and new requests, and the size of the files on disk.
+    """
+    requires_project = True
+
+    def syntax(self):
+        return "[options]"
+
+    def short_desc(self):
+        return "Benchmark the resume cost of JOBDIR request fingerprints"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("--fingerprints", type=int, default=1000000, metavar="N",
+                            help="requests in the history (default: 1000000)")
+        parser.add_argument("--lookups", type=int, default=100000, metavar="N",
+                            help="request_seen() calls, half of them on seen requests (default: 100000)")
+        parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    def run(self, args, opts):
+        report = {"fingerprints": opts.fingerprints, "lookups": opts.lookups}
+
+        directory = tempfile.mkdtemp(prefix="benchdupefilter-")
+        try:
+            for name, dupefilter_cls in (("stock", RFPDupeFilter), ("compact", CompactDupeFilter)):
+                path = os.path.join(directory, name)
+                os.makedirs(path)
+                started = time.perf_counter()
+                dupefilter = dupefilter_cls(path)
+                for request in synthetic_requests(0, opts.fingerprints):
+                    dupefilter.request_seen(request)
+                dupefilter.close("finished")
+                write_seconds = time.perf_counter() - started
+                report[name] = self.measure(dupefilter_cls, path, opts.fingerprints, opts.lookups)
+                report[name]["write_seconds"] = round(write_seconds, 3)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if opts.json:
+            print(json.dumps(report, indent=2))
+            return
+        print(f"{opts.fingerprints} requests in the history, {opts.lookups} lookups")
+        print(f"{'Format':<8} {'Write s':>8} {'Resume s':>9} {'Resume MiB':>11} {'Lookup us':>10} {'Disk MiB':>9}")
+        for name in ("stock", "compact"):
+            row = report[name]
+            print(f"{name:<8} {row['write_seconds']:>8.2f} {row['resume_seconds']:>9.3f} "
+                  f"{row['resume_memory_mib']:>11.1f} {row['lookup_microseconds']:>10.2f} {row['disk_mib']:>9.1f}")
+
+    def measure(self, dupefilter_cls, path, history, count):
+        """
+        Reopens a recorded history and checks requests against it.
+
+        Args:
+            dupefilter_cls (type): The dupefilter that recorded the history.
+            path (str): The JOBDIR holding the history.
+            history (int): Number of requests in the history.
+            count (int): Number of requests to check, half of them in the history.
+
+        Returns:
+            dict: Resume time and memory, time per request_seen() call and size on disk.
+        """
+        # Fresh requests, Scrapy caches the fingerprint of each request object
+        seen = count // 2
+        lookups = list(synthetic_requests(0, seen)) + list(synthetic_requests(history, count - seen))
+        tracemalloc.start()
+        started = time.perf_counter()
+        dupefilter = dupefilter_cls(path)
+        resume_seconds = time.perf_counter() - started
+        resume_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        found = sum(1 for request in lookups if dupefilter.request_seen(request))
+        lookup_seconds = time.perf_counter() - started
+        dupefilter.close("finished")
+        if found != seen:
+            raise RuntimeError(f"{found} requests found in {path}, {seen} expected")
+        return {
+            # Timed with tracemalloc running, so both dupefilters pay the same overhead
+            "resume_seconds": round(resume_seconds, 3),
+            "resume_memory_mib": round(resume_memory / 2 ** 20, 1),
+            "lookup_microseconds": round(lookup_seconds / len(lookups) * 1e6, 2) if lookups else 0.0,
+            "disk_mib": round(directory_size(path) / 2 ** 20, 1),
+        }
@@ -0,0 +1,111 @@
+import json
+import time
+
+from scrapy import Request
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from scrapy.http import TextResponse
+
+from scrapeMPContacts.extraction import compile_legislatures, load_legislatures
+from scrapeMPContacts.replay import HarArchive
+
+
+class Command(ScrapyCommand):
+    """
+    Compares the per-page CPU time of the parsel and lxml extraction engines.
+
+    Member pages are taken from a HAR archive recorded with
+    ``scrapy crawl <spider> -s HAR_RECORD_DIR=fixtures``: every archived page
+    linked from an archived roster page is extracted with both engines, and
+    fields on which they disagree are reported.
+    """
+    requires_project = True
+
+    def syntax(self):
+        return "[options] <legislature> <archive.har>"
+
+    def short_desc(self):
+        return "Benchmark member page extraction engines over a recorded HAR archive"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("--repeat", type=int, default=5, metavar="N",
+                            help="extract every page N times with each engine")
+        parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    def run(self, args, opts):
+        if len(args) != 2:
+            raise UsageError()
+        name, path = args
+        extractors = compile_legislatures(load_legislatures(self.settings.get("LEGISLATURE_CONFIG")))
+        if name not in extractors:
+            raise UsageError(f"Unknown legislature: {name}", print_help=False)
+        extractor = extractors[name]
+
+        archive = HarArchive.load(path)
+        requests = self.member_requests(extractor, archive)
+        if not requests:
+            raise UsageError(f"No {name} member pages found in {path}", print_help=False)
+
+        report = {"pages": len(requests), "repeat": opts.repeat}
+        for engine, extract in (("parsel", extractor.extract), ("lxml", extractor.extract_fast)):
+            # Responses cache their parsed selector, so each run gets fresh ones
+            seconds = 0.0
+            for _ in range(opts.repeat):
+                responses = [archive.response_for(request) for request in requests]
+                started = time.process_time()
+                for response in responses:
+                    extract(response)
+                seconds += time.process_time() - started
+            report[engine] = {"cpu_seconds": round(seconds, 4),
+                              "ms_per_page": round(seconds * 1000 / (len(requests) * opts.repeat), 3)}
+        report["speedup"] = (round(report["parsel"]["cpu_seconds"] / report["lxml"]["cpu_seconds"], 2)
+                             if report["lxml"]["cpu_seconds"] else None)
+        extractor.fallbacks = 0
+        report["mismatches"] = self.mismatches(extractor, archive, requests)
+        report["fallbacks_per_page"] = round(extractor.fallbacks / len(requests), 3)
+
+        if opts.json:
+            print(json.dumps(report, indent=2))
+            return
+        print(f"{name}: {report['pages']} member pages, {opts.repeat} runs per engine")
+        for engine in ("parsel", "lxml"):
+            print(f"  {engine:<8} {report[engine]['cpu_seconds']:>9.4f}s CPU "
+                  f"{report[engine]['ms_per_page']:>8.3f} ms/page")
+        print(f"  speedup  {report['speedup']}x, "
+              f"{report['fallbacks_per_page']} parsel fallbacks per page")
+        for field, count in report["mismatches"].items():
+            print(f"  {field}: engines disagree on {count} pages")
+
+    def member_requests(self, extractor, archive):
+        """
+        Returns requests for the archived pages linked as member pages from an archived page.
+
+        Args:
+            extractor (LegislatureExtractor): The legislature whose member links are followed.
+            archive (HarArchive): The recorded responses.
+
+        Returns:
+            list: One GET request per archived member page.
+        """
+        linked = set()
+        for entry in archive.entries.values():
+            response = archive.response_for(Request(entry["request"]["url"]))
+            if isinstance(response, TextResponse):
+                linked.update(HarArchive.key("GET", response.urljoin(link))
+                              for link in extractor.member_links(response))
+        return [Request(archive.entries[key]["request"]["url"])
+                for key in sorted(linked) if key in archive.entries]
+
+    def mismatches(self, extractor, archive, requests):
+        """
+        Counts, per field, the pages on which both engines extract different values.
+        """
+        counts = {}
+        for request in requests:
+            expected = extractor.extract(archive.response_for(request))
+            actual = extractor.extract_fast(archive.response_for(request))
+            for field, value in expected.items():
+                if actual.get(field) != value:
+                    counts[field] = counts.get(field, 0) + 1
+        return counts
@@ -0,0 +1,100 @@
+import json
+import random
+import time
+from collections import Counter
+
+from scrapy.commands import ScrapyCommand
+
+from scrapeMPContacts.normalize import clean_email, clean_name, e164_phone, normalize_members, strip_accents
+
+FIRST_NAMES = ["Jane", "Jean-François", "Mary", "Amarjeet", "Élise", "John", "Ann", "Kevin"]
+LAST_NAMES = ["Doe", "Tremblay", "O'Neil", "Singh", "Roy", "MacDonald", "Lee", "Gagnon"]
+PREFIXES = ["", "", "Hon. ", "The Honourable ", "Dr. "]
+SUFFIXES = ["", "", ", MPP", ", MLA", ", K.C., MNA"]
+PHONE_FORMATS = ["{}-{}-{}", "({}) {}-{}", "1-{}-{}-{}", "{}.{}.{}", "{} {} {}"]
+EMAIL_FORMATS = ["{}", "mailto:{}", "MAILTO:{}", " {} "]
+
+
+def synthetic_roster(size, seed=0):
+    """
+    Builds members formatted the various ways the legislature sites format them.
+
+    Args:
+        size (int): Number of members.
+        seed (int): Seed of the random generator, for reproducible rosters.
+
+    Returns:
+        list: The members, as dicts.
+    """
+    rng = random.Random(seed)
+    members = []
+    for number in range(size):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        area = rng.choice(["416", "418", "204", "604", "902", "780"])
+        phone = rng.choice(PHONE_FORMATS).format(area, f"{rng.randint(200, 999)}", f"{number % 10000:04d}")
+        email = rng.choice(EMAIL_FORMATS).format(f"{strip_accents(first)}.{last}{number}@Assembly.CA")
+        members.append({
+            "Name": f"{rng.choice(PREFIXES)}{first} {last}{rng.choice(SUFFIXES)}",
+            "Telephone": phone,
+            "Contact": email,
+        })
+    return members
+
+
+class Command(ScrapyCommand):
+    """
+    Measures the throughput of contact normalization on a large synthetic roster.
+
+    The batched normalize_members() is compared with normalizing every field
+    of every member separately, as the spider callbacks used to.
+    """
+    requires_project = True
+
+    def syntax(self):
+        return "[options]"
+
+    def short_desc(self):
+        return "Benchmark contact normalization on a synthetic roster"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("--members", type=int, default=200000, metavar="N",
+                            help="number of synthetic members (default: 200000)")
+        parser.add_argument("--batch-size", dest="batch_size", type=int, default=1000, metavar="N",
+                            help="members normalized per batch (default: 1000)")
+        parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    def run(self, args, opts):
+        roster = synthetic_roster(opts.members)
+        report = {"members": opts.members, "batch_size": opts.batch_size}
+
+        members = [dict(member) for member in roster]
+        started = time.perf_counter()
+        for member in members:
+            member["Telephone"] = e164_phone(member["Telephone"]) or member["Telephone"]
+            member["Contact"] = clean_email(member["Contact"]) or member["Contact"]
+            member["Name"] = clean_name(member["Name"]) or member["Name"]
+        report["per_field"] = self.timing(started, opts.members)
+
+        members = [dict(member) for member in roster]
+        invalid = Counter()
+        started = time.perf_counter()
+        for start in range(0, len(members), opts.batch_size):
+            normalize_members(members[start:start + opts.batch_size], stats=invalid)
+        report["batched"] = self.timing(started, opts.members)
+        report["invalid"] = dict(invalid)
+
+        if opts.json:
+            print(json.dumps(report, indent=2))
+            return
+        print(f"{opts.members} members, batches of {opts.batch_size}")
+        for mode in ("per_field", "batched"):
+            print(f"  {mode:<10} {report[mode]['seconds']:>8.3f}s "
+                  f"{report[mode]['members_per_second']:>12,.0f} members/s")
+        if invalid:
+            print(f"  invalid values: {dict(invalid)}")
+
+    def timing(self, started, count):
+        seconds = time.perf_counter() - started
+        return {"seconds": round(seconds, 4),
+                "members_per_second": round(count / seconds, 1) if seconds else 0.0}
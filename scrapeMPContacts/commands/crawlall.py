@@ -0,0 +1,219 @@
+import re
+from datetime import datetime, timezone
+from functools import partial
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.commands import BaseRunSpiderCommand
+from scrapy.exceptions import UsageError
+from scrapy.utils.misc import build_from_crawler, load_object
+
+# Formats a second run can append to without corrupting the file
+APPENDABLE_FORMATS = ("jsonlines", "jl")
+# URI parameters with the same value for every spider of a run
+_run_params = re.compile(r"%\((time|batch_time|batch_id)\)s")
+
+
+def is_merged_uri(uri):
+    """
+    Tells whether a feed URI names a single feed for the whole run.
+
+    URIs with spider parameters such as ``%(name)s`` name one feed per
+    spider, and are left to each crawler's own feed exporter.
+    """
+    return "%(" not in _run_params.sub("", uri)
+
+
+class MergedFeed:
+    """
+    A single feed shared by every crawler of a ``crawlall`` run.
+
+    Scrapy gives each crawler its own feed exporter, so several crawlers
+    pointed at the same file would overwrite each other. All crawlers of a
+    ``CrawlerProcess`` run on the same reactor thread, so one exporter can
+    safely receive the ``item_scraped`` signal of every crawler instead.
+
+    The feed goes through Scrapy's feed storages (FEED_STORAGES), so local
+    paths, ``file://``, ``s3://``, ``ftp://`` and ``stdout:`` URIs all work,
+    and ``%(time)s``/``%(batch_time)s`` are replaced once for the run. It is
+    opened when the first spider opens and stored once the last one closes.
+    Unless the options say otherwise, formats that cannot be appended to,
+    such as CSV with its header or Parquet, overwrite an existing feed.
+
+    Attributes:
+        uri (str): URI of the feed, ``-`` for stdout.
+        options (dict): Feed options as produced by ``-o``/``-O``.
+    """
+
+    def __init__(self, uri, options, settings):
+        self.uri = "stdout:" if uri == "-" else uri
+        self.options = dict(options)
+        if urlparse(self.uri).scheme != "stdout":
+            self.options.setdefault("overwrite", self.options["format"] not in APPENDABLE_FORMATS)
+        self.settings = settings
+        self.storage = None
+        self.file = None
+        self.exporter = None
+        self.item_count = 0
+        self.open_crawlers = 0
+
+    def connect(self, crawler):
+        """
+        Receives the items of a crawler, and keeps the feed open until it closes.
+        """
+        self.open_crawlers += 1
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    def spider_opened(self, spider):
+        if self.exporter is None:
+            self.open(spider)
+
+    def open(self, spider):
+        """
+        Opens the feed storage and starts the exporter for the configured format.
+        """
+        exporters = self.settings.getwithbase("FEED_EXPORTERS")
+        feed_format = self.options["format"]
+        if feed_format not in exporters:
+            raise UsageError(f"Unknown feed format: {feed_format}")
+        now = datetime.now(tz=timezone.utc)
+        self.uri = self.uri % {
+            "time": now.replace(microsecond=0).isoformat().replace(":", "-"),
+            "batch_time": now.isoformat().replace(":", "-"),
+            "batch_id": 1,
+        }
+        storages = self.settings.getwithbase("FEED_STORAGES")
+        storage_cls = load_object(storages.get(urlparse(self.uri).scheme, storages["file"]))
+        self.storage = build_from_crawler(storage_cls, spider.crawler, self.uri, feed_options=self.options)
+        self.file = self.storage.open(spider)
+        exporter_cls = load_object(exporters[feed_format])
+        # Project exporters read their own settings through from_settings
+        build = getattr(exporter_cls, "from_settings", None)
+        build = partial(build, self.settings) if build else exporter_cls
+        self.exporter = build(
+            self.file,
+            encoding=self.options.get("encoding") or self.settings.get("FEED_EXPORT_ENCODING"),
+            fields_to_export=self.options.get("fields") or self.settings.getlist("FEED_EXPORT_FIELDS") or None,
+            indent=self.options.get("indent", self.settings.getint("FEED_EXPORT_INDENT")),
+        )
+        self.exporter.start_exporting()
+
+    def item_scraped(self, item, spider):
+        self.exporter.export_item(item)
+        self.item_count += 1
+
+    def spider_closed(self, spider):
+        self.open_crawlers -= 1
+        if self.open_crawlers == 0:
+            # The last engine waits for the upload of remote storages
+            return self.close()
+
+    def close(self):
+        """
+        Finishes the exporter and stores the feed, once.
+
+        Returns:
+            twisted.internet.defer.Deferred: The upload of remote storages, or None.
+        """
+        if self.exporter is None:
+            return None
+        self.exporter.finish_exporting()
+        self.exporter = None
+        return self.storage.store(self.file)
+
+
+class Command(BaseRunSpiderCommand):
+    """
+    Runs every spider of the project concurrently in a single process.
+
+    All spiders share one reactor and one settings load, so a full refresh
+    takes about as long as the slowest legislature. Items from all spiders
+    are written to one merged feed and a per-spider timing summary is
+    printed once every crawl has finished.
+    """
+    requires_project = True
+
+    def syntax(self):
+        return "[options] [spider ...]"
+
+    def short_desc(self):
+        return "Run all spiders (or the given ones) concurrently in one process"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--per-domain",
+            dest="per_domain",
+            type=int,
+            metavar="N",
+            help="maximum concurrent requests per domain (CONCURRENT_REQUESTS_PER_DOMAIN)",
+        )
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        if opts.per_domain:
+            self.settings.set("CONCURRENT_REQUESTS_PER_DOMAIN",
+                              opts.per_domain, priority="cmdline")
+        # Take the feeds away from the individual crawlers, they are written
+        # once for all spiders by MergedFeed. Per-spider feeds stay with them.
+        feeds = self.settings.getdict("FEEDS")
+        self.feeds = [MergedFeed(uri, options, self.settings)
+                      for uri, options in feeds.items() if is_merged_uri(uri)]
+        self.settings.set("FEEDS", {uri: options for uri, options in feeds.items() if not is_merged_uri(uri)},
+                          priority="cmdline")
+
+    def run(self, args, opts):
+        spider_loader = self.crawler_process.spider_loader
+        available = spider_loader.list()
+        unknown = [name for name in args if name not in available]
+        if unknown:
+            raise UsageError(f"Unknown spider(s): {', '.join(unknown)}")
+        excluded = self.settings.getlist("CRAWLALL_EXCLUDE")
+        names = args or [name for name in sorted(available) if name not in excluded]
+
+        crawlers = []
+        for name in names:
+            crawler = self.crawler_process.create_crawler(name)
+            for feed in self.feeds:
+                feed.connect(crawler)
+            self.crawler_process.crawl(crawler, **opts.spargs)
+            crawlers.append(crawler)
+
+        try:
+            self.crawler_process.start()
+        finally:
+            for feed in self.feeds:
+                feed.close()
+
+        self.print_summary(crawlers)
+        if self.crawler_process.bootstrap_failed:
+            self.exitcode = 1
+
+    def print_summary(self, crawlers):
+        """
+        Prints the elapsed time, item count and finish reason of each spider.
+
+        Args:
+            crawlers (list): The crawlers that were run by this command.
+        """
+        rows = []
+        for crawler in crawlers:
+            stats = crawler.stats.get_stats() if crawler.stats else {}
+            elapsed = stats.get("elapsed_time_seconds")
+            if elapsed is None and "start_time" in stats and "finish_time" in stats:
+                elapsed = (stats["finish_time"] - stats["start_time"]).total_seconds()
+            rows.append((
+                crawler.spidercls.name,
+                elapsed or 0.0,
+                stats.get("downloader/request_count", 0),
+                stats.get("item_scraped_count", 0),
+                stats.get("finish_reason", "-"),
+            ))
+
+        print(f"{'Spider':<15} {'Seconds':>9} {'Requests':>9} {'Items':>7}  Finish reason")
+        for name, elapsed, requests, items, reason in sorted(rows, key=lambda r: -r[1]):
+            print(f"{name:<15} {elapsed:>9.1f} {requests:>9} {items:>7}  {reason}")
+        for feed in self.feeds:
+            print(f"Wrote {feed.item_count} items to {feed.uri}")
@@ -0,0 +1,210 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from scrapy import signals
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from scrapy.utils.conf import arglist_to_dict
+
+from scrapeMPContacts.mockserver import MockLegislatureServer, enrichment_settings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss():
+    """
+    Returns the peak resident memory of the process in bytes, None where it cannot be measured.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class LoadMonitor:
+    """
+    Samples the scheduler queue depth of a crawler on every response.
+
+    Attributes:
+        samples (int): Number of samples taken.
+        total_depth (int): Sum of the sampled depths, for the mean.
+        max_depth (int): Deepest queue seen.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+        crawler.signals.connect(self.response_received, signal=signals.response_received)
+
+    def queue_depth(self):
+        stats = self.crawler.stats
+        return stats.get_value("scheduler/enqueued", 0) - stats.get_value("scheduler/dequeued", 0)
+
+    def response_received(self, response, request, spider):
+        depth = self.queue_depth()
+        self.samples += 1
+        self.total_depth += depth
+        self.max_depth = max(self.max_depth, depth)
+
+
+class Command(ScrapyCommand):
+    """
+    Crawls a local mock of the legislature sites at a chosen scale and reports throughput.
+
+    The spiders run unchanged, concurrently as with ``crawlall``, against a
+    MockLegislatureServer started by the command with the given number of
+    members per legislature, latency and error rate. The HTTP cache and the
+    components keeping state between runs are disabled, and the files the
+    other components write (member state, quarantine, dedupe index, shared
+    queue, SQLite database and archives) go to a temporary directory removed
+    after the run, so synthetic members never reach the state of real
+    crawls. The enrichment pipeline, when enabled, uses the stub services of
+    the mock.
+    """
+    requires_project = True
+
+    def syntax(self):
+        return "[options] [spider ...]"
+
+    def short_desc(self):
+        return "Load test the spiders against a local mock of the legislature sites"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("-a", dest="spargs", action="append", default=[],
+                            metavar="NAME=VALUE", help="set spider argument (may be repeated)")
+        parser.add_argument("--members", type=int, default=1000, metavar="N",
+                            help="members of every legislature (default: 1000)")
+        parser.add_argument("--latency", type=float, default=0.0, metavar="SECONDS",
+                            help="delay of every mock response")
+        parser.add_argument("--jitter", type=float, default=0.0, metavar="SECONDS",
+                            help="extra random delay of every mock response")
+        parser.add_argument("--error-rate", dest="error_rate", type=float, default=0.0, metavar="RATE",
+                            help="share of requests answered with a 503 error, e.g. 0.02")
+        parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        self.server = MockLegislatureServer(members=opts.members, latency=opts.latency,
+                                            jitter=opts.jitter, error_rate=opts.error_rate)
+        self.state_dir = tempfile.mkdtemp(prefix="loadtest-")
+        overrides = {
+            "MOCK_SERVER_URL": self.server.url,
+            "HTTPCACHE_ENABLED": False,
+            "FIELD_HEALTH_ENABLED": False,
+            "ADAPTIVE_CONCURRENCY_STATE": None,
+            "INCREMENTAL_ENABLED": False,
+            "ROSTER_FINGERPRINT_ENABLED": False,
+            "ENRICHMENT_CACHE_PATH": None,
+            "INCREMENTAL_STATE_DIR": os.path.join(self.state_dir, "state"),
+            "ROSTER_STATE_DIR": os.path.join(self.state_dir, "state"),
+            "FIELD_HEALTH_BASELINE_DIR": os.path.join(self.state_dir, "state"),
+            "QUARANTINE_DIR": os.path.join(self.state_dir, "quarantine"),
+            "DEDUPE_INDEX_PATH": os.path.join(self.state_dir, "dedupe.db"),
+            "SHARED_QUEUE_DATABASE": os.path.join(self.state_dir, "queue.db"),
+            **enrichment_settings(self.server.url),
+        }
+        # Outputs enabled in the settings keep running, into the temporary directory
+        if self.settings.get("SQLITE_DATABASE"):
+            overrides["SQLITE_DATABASE"] = os.path.join(self.state_dir, "members.db")
+        if self.settings.get("ARCHIVE_DIR"):
+            overrides["ARCHIVE_DIR"] = os.path.join(self.state_dir, "archive")
+        if self.settings.get("JOBDIR"):
+            overrides["JOBDIR"] = os.path.join(self.state_dir, "job")
+        for name, value in overrides.items():
+            self.settings.set(name, value, priority="cmdline")
+
+    def run(self, args, opts):
+        try:
+            self.load_test(args, opts)
+        finally:
+            self.server.server_close()
+            shutil.rmtree(self.state_dir, ignore_errors=True)
+
+    def load_test(self, args, opts):
+        spider_loader = self.crawler_process.spider_loader
+        available = spider_loader.list()
+        unknown = [name for name in args if name not in available]
+        if unknown:
+            raise UsageError(f"Unknown spider(s): {', '.join(unknown)}")
+        try:
+            spargs = arglist_to_dict(opts.spargs)
+        except ValueError:
+            raise UsageError("Invalid -a value, use -a NAME=VALUE", print_help=False)
+        excluded = self.settings.getlist("CRAWLALL_EXCLUDE")
+        names = args or [name for name in sorted(available) if name not in excluded]
+
+        monitors = []
+        for name in names:
+            crawler = self.crawler_process.create_crawler(name)
+            monitors.append(LoadMonitor(crawler))
+            self.crawler_process.crawl(crawler, **spargs)
+
+        self.server.start()
+        rss_before = peak_rss()
+        try:
+            self.crawler_process.start()
+        finally:
+            self.server.stop()
+        rss_after = peak_rss()
+
+        report = {
+            "members": opts.members,
+            "latency": opts.latency,
+            "jitter": opts.jitter,
+            "error_rate": opts.error_rate,
+            "spiders": {monitor.crawler.spidercls.name: self.spider_report(monitor) for monitor in monitors},
+        }
+        if rss_before is not None:
+            report["peak_rss_mib"] = round(rss_after / 2 ** 20, 1)
+            report["rss_growth_mib"] = round((rss_after - rss_before) / 2 ** 20, 1)
+        if opts.json:
+            print(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+        if self.crawler_process.bootstrap_failed:
+            self.exitcode = 1
+
+    def spider_report(self, monitor):
+        stats = monitor.crawler.stats.get_stats()
+        elapsed = stats.get("elapsed_time_seconds")
+        if elapsed is None and "start_time" in stats and "finish_time" in stats:
+            elapsed = (stats["finish_time"] - stats["start_time"]).total_seconds()
+        elapsed = elapsed or 0.0
+        # Requests are counted twice, before and after MockServerMiddleware rewrites them
+        requests = stats.get("downloader/response_count", 0)
+        items = stats.get("item_scraped_count", 0)
+        return {
+            "seconds": round(elapsed, 3),
+            "requests": requests,
+            "items": items,
+            "requests_per_second": round(requests / elapsed, 1) if elapsed else 0.0,
+            "items_per_second": round(items / elapsed, 1) if elapsed else 0.0,
+            "retries": stats.get("retry/count", 0),
+            "errors": stats.get("log_count/ERROR", 0),
+            "max_queue_depth": monitor.max_depth,
+            "mean_queue_depth": round(monitor.total_depth / monitor.samples, 1) if monitor.samples else 0.0,
+            "finish_reason": stats.get("finish_reason", "-"),
+        }
+
+    def print_report(self, report):
+        print(f"{report['members']} members per legislature, latency {report['latency']}s "
+              f"(+{report['jitter']}s), error rate {report['error_rate']:.1%}")
+        print(f"{'Spider':<12} {'Seconds':>8} {'Requests':>9} {'Req/s':>8} {'Items':>7} {'Items/s':>8} "
+              f"{'Retries':>8} {'Queue max':>10} {'mean':>7}  Finish reason")
+        for name, row in report["spiders"].items():
+            print(f"{name:<12} {row['seconds']:>8.1f} {row['requests']:>9} {row['requests_per_second']:>8.1f} "
+                  f"{row['items']:>7} {row['items_per_second']:>8.1f} {row['retries']:>8} "
+                  f"{row['max_queue_depth']:>10} {row['mean_queue_depth']:>7.1f}  {row['finish_reason']}")
+        if "peak_rss_mib" in report:
+            print(f"Peak memory {report['peak_rss_mib']} MiB, "
+                  f"{report['rss_growth_mib']:+} MiB during the crawls")
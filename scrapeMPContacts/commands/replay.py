@@ -0,0 +1,75 @@
+import json
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from scrapy.utils.conf import arglist_to_dict
+
+from scrapeMPContacts.replay import HarArchive, recorded_requests, replay
+
+
+class Command(ScrapyCommand):
+    """
+    Replays a recorded HAR archive through a spider's callbacks, with no network.
+
+    Archives are recorded with ``scrapy crawl <spider> -s HAR_RECORD_DIR=fixtures``.
+    The report gives pages/second, items/second, peak memory and the time spent
+    in each callback, so parse path changes can be compared reproducibly.
+    """
+    requires_project = True
+
+    def syntax(self):
+        return "[options] <spider> <archive.har>"
+
+    def short_desc(self):
+        return "Benchmark a spider's callbacks over a recorded HAR archive"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument("-a", dest="spargs", action="append", default=[],
+                            metavar="NAME=VALUE", help="set spider argument (may be repeated)")
+        parser.add_argument("--repeat", type=int, default=1, metavar="N",
+                            help="replay the archive N times and report each run")
+        parser.add_argument("--max-pages", dest="max_pages", type=int, metavar="N",
+                            help="stop each run after N pages")
+        parser.add_argument("--recorded", action="store_true",
+                            help="replay every page with the callback it was recorded with, "
+                                 "e.g. a quarantine archive, without following links")
+        parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        # Callbacks are replayed synchronously, member pages are parsed in process
+        self.settings.set("PARSE_POOL_SIZE", 0, priority="cmdline")
+
+    def run(self, args, opts):
+        if len(args) != 2:
+            raise UsageError()
+        name, path = args
+        try:
+            spargs = arglist_to_dict(opts.spargs)
+        except ValueError:
+            raise UsageError("Invalid -a value, use -a NAME=VALUE", print_help=False)
+
+        archive = HarArchive.load(path)
+        reports = []
+        for _ in range(opts.repeat):
+            crawler = self.crawler_process.create_crawler(name)
+            spider = crawler.spidercls.from_crawler(crawler, **spargs)
+            if opts.recorded:
+                stats = replay(spider, archive, max_pages=opts.max_pages,
+                               requests=recorded_requests(spider, archive), follow=False)
+            else:
+                stats = replay(spider, archive, max_pages=opts.max_pages)
+            reports.append(stats.report())
+
+        if opts.json:
+            print(json.dumps(reports if opts.repeat > 1 else reports[0], indent=2))
+            return
+        for number, report in enumerate(reports, 1):
+            print(f"Run {number}: {report['pages']} pages, {report['items']} items, "
+                  f"{report['missing']} missing, {report['errors']} errors in {report['seconds']:.3f}s "
+                  f"({report['pages_per_second']} pages/s, {report['items_per_second']} items/s, "
+                  f"peak {report['peak_memory_kib']} KiB)")
+            for callback, timing in report["callbacks"].items():
+                print(f"  {callback:<20} {timing['calls']:>6} calls "
+                      f"{timing['seconds']:>9.4f}s {timing['ms_per_call']:>8.3f} ms/call")
@@ -0,0 +1,331 @@
+# Outbound enrichment of scraped members
+#
+# Enrichers look members up in external JSON services: the coordinates of
+# their riding, whether the domain of their email accepts mail (MX records)
+# and the identifier of their riding boundary. EnrichmentPipeline runs them
+# as asyncio coroutines on the crawl's reactor, over one pooled HTTP client,
+# so enrichment overlaps with crawling. Results are cached with a time to
+# live, so a riding or email domain shared by many members is looked up once.
+#
+# An enricher subclasses Enricher, returns the MemberItem fields it sets for
+# a lookup key, and is listed in the ENRICHERS setting.
+
+import asyncio
+import json
+import os
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class TTLCache:
+    """
+    A bounded mapping whose entries expire after a time to live.
+
+    Entries are stored with their wall clock expiry, so a cache saved with
+    to_dict() can be reloaded by a later run. The oldest entry is evicted once
+    ``max_entries`` is reached.
+
+    Attributes:
+        ttl (float): Seconds an entry stays valid.
+        max_entries (int): Largest number of entries kept.
+        hits (int): Lookups answered by a valid entry.
+    """
+
+    def __init__(self, ttl=86400, max_entries=100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires < time.time():
+            del self.entries[key]
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.entries.pop(key, None)
+        if len(self.entries) >= self.max_entries:
+            del self.entries[next(iter(self.entries))]
+        self.entries[key] = (time.time() + self.ttl, value)
+
+    def to_dict(self):
+        now = time.time()
+        return {key: entry for key, entry in self.entries.items() if entry[0] >= now}
+
+    @classmethod
+    def load(cls, path, ttl=86400, max_entries=100000):
+        """
+        Returns the valid entries of a cache saved as JSON, an empty cache when the file does not exist.
+        """
+        cache = cls(ttl, max_entries)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)
+            now = time.time()
+            cache.entries = {key: tuple(entry) for key, entry in entries.items() if entry[0] >= now}
+        return cache
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+class EnrichmentClient:
+    """
+    JSON HTTP client shared by every enricher of a crawl.
+
+    One aiohttp session keeps a pool of at most ``concurrency`` connections,
+    reused across lookups. It is created on first use, inside the running
+    asyncio loop.
+
+    Attributes:
+        concurrency (int): Largest number of lookups in flight.
+        timeout (float): Seconds before a lookup is abandoned.
+        user_agent (str): User-Agent header of the lookups.
+    """
+
+    def __init__(self, concurrency=8, timeout=10.0, user_agent=None):
+        if aiohttp is None:
+            raise RuntimeError("EnrichmentClient requires the aiohttp library")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.session = None
+
+    async def get_json(self, url, params=None):
+        """
+        Sends a GET request and returns its decoded JSON body.
+
+        Args:
+            url (str): The service URL.
+            params (dict): Query string parameters.
+
+        Returns:
+            The decoded JSON document.
+
+        Raises:
+            aiohttp.ClientError: When the service cannot be reached or answers with an error status.
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": self.user_agent} if self.user_agent else None,
+            )
+        async with self.session.get(url, params=params) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class Enricher:
+    """
+    Base class of the enrichers listed in the ENRICHERS setting.
+
+    Subclasses name the lookups a member needs with key(), and implement
+    lookup() for one key. Members with the same key share one lookup, and its
+    result is cached under the enricher's name and the key.
+
+    Attributes:
+        name (str): Name of the enricher in the cache and the ``enrichment/<name>/*`` stats.
+    """
+    name = "enricher"
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    def key(self, member):
+        """
+        Returns the key of the lookup a member needs, or None to leave the member as it is.
+
+        Args:
+            member (itemadapter.ItemAdapter): The member.
+
+        Returns:
+            str: The lookup key.
+        """
+        return None
+
+    async def lookup(self, client, key):
+        """
+        Looks a key up.
+
+        Args:
+            client (EnrichmentClient): The shared HTTP client.
+            key (str): The lookup key.
+
+        Returns:
+            dict: The member fields to set.
+        """
+        raise NotImplementedError
+
+
+class ConstituencyGeocoder(Enricher):
+    """
+    Sets the Latitude and Longitude of a member's riding with a Nominatim compatible geocoder.
+
+    Settings:
+        ENRICHMENT_GEOCODER_URL (str): The geocoder search endpoint.
+    """
+    name = "geocode"
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.url = settings.get("ENRICHMENT_GEOCODER_URL")
+
+    def key(self, member):
+        if not member.get("Constituency"):
+            return None
+        return ", ".join(filter(None, [member.get("Constituency"), member.get("ProvinceTerritory"), "Canada"]))
+
+    async def lookup(self, client, key):
+        places = await client.get_json(self.url, {"q": key, "format": "json", "limit": 1})
+        if not places:
+            return {"Latitude": "", "Longitude": ""}
+        return {"Latitude": str(places[0]["lat"]), "Longitude": str(places[0]["lon"])}
+
+
+class ContactDomainChecker(Enricher):
+    """
+    Sets ContactMX to 'yes' when the domain of a member's email has MX records, 'no' otherwise.
+
+    Records are resolved with a DNS-over-HTTPS JSON endpoint.
+
+    Settings:
+        ENRICHMENT_DNS_URL (str): The DNS JSON API endpoint.
+    """
+    name = "mx"
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.url = settings.get("ENRICHMENT_DNS_URL")
+
+    def key(self, member):
+        email = (member.get("Contact") or "").lower()
+        if email.startswith("mailto:"):
+            email = email[len("mailto:"):]
+        _, at, domain = email.partition("@")
+        return (domain.strip() or None) if at else None
+
+    async def lookup(self, client, key):
+        data = await client.get_json(self.url, {"name": key, "type": "MX"})
+        # Status 0 is NOERROR, answers of type 15 are MX records
+        found = data.get("Status") == 0 and any(a.get("type") == 15 for a in data.get("Answer", []))
+        return {"ContactMX": "yes" if found else "no"}
+
+
+class RidingBoundaryLookup(Enricher):
+    """
+    Sets the BoundaryId of a member's riding from a Represent compatible boundaries API.
+
+    Federal and provincial ridings often share names, so federal members
+    take the identifier of a federal boundary and other members of any other.
+
+    Settings:
+        ENRICHMENT_BOUNDARIES_URL (str): The boundaries list endpoint.
+    """
+    name = "boundary"
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.url = settings.get("ENRICHMENT_BOUNDARIES_URL")
+
+    def key(self, member):
+        if not member.get("Constituency"):
+            return None
+        level = "federal" if "Federal" in (member.get("Govt") or "") else "provincial"
+        return f"{level}:{member.get('Constituency')}"
+
+    async def lookup(self, client, key):
+        level, _, riding = key.partition(":")
+        data = await client.get_json(self.url, {"name": riding})
+        for boundary in data.get("objects", []):
+            federal = "Federal" in boundary.get("boundary_set_name", "")
+            if federal == (level == "federal"):
+                return {"BoundaryId": str(boundary.get("external_id", ""))}
+        return {"BoundaryId": ""}
+
+
+async def enrich_members(members, enrichers, client, cache, semaphore=None, stats=None, inflight=None):
+    """
+    Runs every enricher over a batch of members, each distinct lookup once.
+
+    Lookups are answered from the cache when possible, otherwise sent
+    concurrently, at most as many at a time as the semaphore allows. A failed
+    lookup leaves its members as they are and is not cached.
+
+    Args:
+        members (list): The members, as ItemAdapter objects, updated in place.
+        enrichers (list): The Enricher objects.
+        client (EnrichmentClient): The shared HTTP client.
+        cache (TTLCache): Results of earlier lookups, keyed by enricher name and key.
+        semaphore (asyncio.Semaphore): Bounds the lookups in flight.
+        stats (scrapy.statscollectors.StatsCollector): Receives the ``enrichment/*`` counters.
+        inflight (dict): Lookups in progress, shared between batches so none is sent twice.
+    """
+    inflight = {} if inflight is None else inflight
+    pending = {}
+    for member in members:
+        for enricher in enrichers:
+            key = enricher.key(member)
+            if key is not None:
+                pending.setdefault((enricher, key), []).append(member)
+
+    async def run(enricher, key):
+        cache_key = f"{enricher.name}|{key}"
+        result = cache.get(cache_key)
+        if result is not None:
+            if stats is not None:
+                stats.inc_value(f"enrichment/{enricher.name}/cache_hits")
+            return result
+        task = inflight.get(cache_key)
+        if task is None:
+            task = inflight[cache_key] = asyncio.ensure_future(send(enricher, key, cache_key))
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            if stats is not None:
+                stats.inc_value(f"enrichment/{enricher.name}/errors")
+                stats.inc_value(f"enrichment/errors/{type(e).__name__}")
+            return None
+
+    async def send(enricher, key, cache_key):
+        try:
+            if semaphore is None:
+                result = await enricher.lookup(client, key)
+            else:
+                async with semaphore:
+                    result = await enricher.lookup(client, key)
+        finally:
+            inflight.pop(cache_key, None)
+        if stats is not None:
+            stats.inc_value(f"enrichment/{enricher.name}/lookups")
+        cache.set(cache_key, result)
+        return result
+
+    results = await asyncio.gather(*(run(enricher, key) for enricher, key in pending))
+    for ((enricher, key), batch), result in zip(pending.items(), results):
+        for member in batch:
+            for field, value in (result or {}).items():
+                member[field] = value
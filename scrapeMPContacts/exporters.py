@@ -0,0 +1,96 @@
+# Define here the feed exporters of the project
+#
+# Don't forget to register them in the FEED_EXPORTERS setting
+# See: https://docs.scrapy.org/en/latest/topics/feed-exports.html#feed-exporters
+
+from collections import defaultdict
+
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+from scrapy.exporters import BaseItemExporter
+
+from scrapeMPContacts.items import MEMBER_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+class ParquetItemExporter(BaseItemExporter):
+    """
+    Exports members to a Parquet file with a stable all-string schema.
+
+    Items are buffered and written as record batches of ``row_group_size``
+    rows. When ``partition_by`` names a field, items are buffered per value of
+    that field so every row group holds a single value, e.g. one province.
+    Parquet readers then skip the row groups of other provinces using the
+    column statistics, and can load single columns without scanning the file.
+
+    Settings:
+        FEED_PARQUET_ROW_GROUP_SIZE (int): Rows per row group, 10000 by default.
+        FEED_PARQUET_PARTITION_BY (str): Field whose values get their own row groups.
+        FEED_PARQUET_COMPRESSION (str): Parquet compression codec, 'snappy' by default.
+    """
+
+    def __init__(self, file, row_group_size=10000, partition_by=None,
+                 compression="snappy", **kwargs):
+        if pa is None:
+            raise NotConfigured("ParquetItemExporter requires the pyarrow library")
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+        self.row_group_size = row_group_size
+        self.partition_by = partition_by
+        self.compression = compression
+        self.columns = list(self.fields_to_export or MEMBER_FIELDS)
+        self.schema = pa.schema([(name, pa.string()) for name in self.columns])
+        self.buffers = defaultdict(list)
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler, file, **kwargs):
+        return cls.from_settings(crawler.settings, file, **kwargs)
+
+    @classmethod
+    def from_settings(cls, settings, file, **kwargs):
+        kwargs.setdefault("row_group_size", settings.getint("FEED_PARQUET_ROW_GROUP_SIZE", 10000))
+        kwargs.setdefault("partition_by", settings.get("FEED_PARQUET_PARTITION_BY"))
+        kwargs.setdefault("compression", settings.get("FEED_PARQUET_COMPRESSION", "snappy"))
+        return cls(file, **kwargs)
+
+    def start_exporting(self):
+        self.writer = pq.ParquetWriter(self.file, self.schema, compression=self.compression)
+
+    def export_item(self, item):
+        adapter = ItemAdapter(item)
+        row = [self.serialize_value(adapter.get(name)) for name in self.columns]
+        key = adapter.get(self.partition_by) if self.partition_by else None
+        buffer = self.buffers[key]
+        buffer.append(row)
+        if len(buffer) >= self.row_group_size:
+            self.write_batch(buffer)
+            buffer.clear()
+
+    def serialize_value(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return str(value)
+
+    def write_batch(self, rows):
+        """
+        Writes buffered rows to the file as one row group.
+
+        Args:
+            rows (list): Rows of values, in column order.
+        """
+        columns = [pa.array(values, type=pa.string()) for values in zip(*rows)]
+        table = pa.Table.from_arrays(columns, schema=self.schema)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+
+    def finish_exporting(self):
+        for key in sorted(self.buffers, key=lambda k: (k is None, k or "")):
+            if self.buffers[key]:
+                self.write_batch(self.buffers[key])
+        self.buffers.clear()
+        self.writer.close()
@@ -0,0 +1,214 @@
+# Define here the extensions of the project
+#
+# Don't forget to enable them in the EXTENSIONS setting
+# See: https://docs.scrapy.org/en/latest/topics/extensions.html
+
+import json
+import os
+import re
+from collections import Counter, defaultdict
+
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_from_coro
+
+from scrapeMPContacts.items import MEMBER_FIELDS
+
+_letters = re.compile(r"[^\W\d_]+")
+_digits = re.compile(r"\d+")
+
+# Fields whose values are not extracted from the page
+UNPROFILED_FIELDS = ("Url", "Latitude", "Longitude", "ContactMX", "BoundaryId", "ChangeType", "Errors")
+
+
+def value_shape(value):
+    """
+    Returns the shape of a value: runs of letters become ``a``, runs of digits ``9``.
+
+    ``"+14165550100"`` has the shape ``+9`` and ``"Jane Doe"`` the shape ``a a``,
+    so a selector that starts returning another kind of text changes shape.
+
+    Args:
+        value (str): The extracted value.
+
+    Returns:
+        str: The shape, empty for an empty value.
+    """
+    return _digits.sub("9", _letters.sub("a", value or ""))[:40]
+
+
+class FieldProfile:
+    """
+    Fill rates and value shapes of the fields of one run of a spider.
+
+    Attributes:
+        items (int): Number of profiled members.
+        filled (collections.Counter): Number of members with a value, per field.
+        shapes (dict): A Counter of value shapes, per field.
+    """
+
+    def __init__(self, items=0, filled=None, shapes=None):
+        self.items = items
+        self.filled = Counter(filled or {})
+        self.shapes = defaultdict(Counter, {f: Counter(s) for f, s in (shapes or {}).items()})
+
+    def add(self, member):
+        self.items += 1
+        for field in MEMBER_FIELDS:
+            if field in UNPROFILED_FIELDS:
+                continue
+            value = member.get(field)
+            if value:
+                self.filled[field] += 1
+                self.shapes[field][value_shape(str(value))] += 1
+
+    def fill_rate(self, field):
+        return self.filled[field] / self.items if self.items else 0.0
+
+    def shape_share(self, field):
+        total = sum(self.shapes[field].values())
+        return {shape: count / total for shape, count in self.shapes[field].items()} if total else {}
+
+    def to_dict(self, top=10):
+        return {
+            "items": self.items,
+            "filled": dict(self.filled),
+            "shapes": {field: dict(shapes.most_common(top)) for field, shapes in self.shapes.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["items"], data["filled"], data["shapes"])
+
+
+def compare_profiles(baseline, current, max_drop=0.2, max_shape_drift=0.5):
+    """
+    Lists the fields of a run that drifted from the baseline.
+
+    Args:
+        baseline (FieldProfile): Profile of the last healthy run.
+        current (FieldProfile): Profile of the current run.
+        max_drop (float): Largest tolerated fall of a fill rate, 0.2 meaning 20 points.
+        max_shape_drift (float): Largest tolerated total variation distance between shape shares.
+
+    Returns:
+        list: Human readable problems, empty when the run looks healthy.
+    """
+    problems = []
+    for field in MEMBER_FIELDS:
+        if field in UNPROFILED_FIELDS:
+            continue
+        before, now = baseline.fill_rate(field), current.fill_rate(field)
+        if before - now > max_drop:
+            problems.append(f"{field} filled for {now:.0%} of members, {before:.0%} in the baseline")
+            continue
+        old, new = baseline.shape_share(field), current.shape_share(field)
+        if old and new:
+            drift = sum(abs(old.get(s, 0) - new.get(s, 0)) for s in old.keys() | new.keys()) / 2
+            if drift > max_shape_drift:
+                top = max(new, key=new.get)
+                problems.append(f"{field} values changed shape ({drift:.0%} drift), now mostly '{top}'")
+    return problems
+
+
+class FieldHealth:
+    """
+    Tracks per-field fill rates and value shapes and compares them with a baseline.
+
+    The profile of each run is compared with the one of the last healthy run
+    of the same spider. A drifted field is logged as a warning when the spider
+    closes. With FIELD_HEALTH_FAIL_FAST the comparison is also made once
+    FIELD_HEALTH_MIN_ITEMS members were scraped, and the spider is closed
+    right away, so a layout change does not cost a full crawl of broken data.
+    Runs that finish healthy replace the baseline.
+
+    Settings:
+        FIELD_HEALTH_ENABLED (bool): Enable the extension.
+        FIELD_HEALTH_BASELINE_DIR (str): Directory holding the per-spider baselines.
+        FIELD_HEALTH_MAX_DROP (float): Largest tolerated fall of a fill rate.
+        FIELD_HEALTH_MAX_SHAPE_DRIFT (float): Largest tolerated change of the value shapes.
+        FIELD_HEALTH_MIN_ITEMS (int): Members scraped before the early check.
+        FIELD_HEALTH_FAIL_FAST (bool): Close the spider when the early check finds drift.
+    """
+
+    def __init__(self, crawler, baseline_dir, max_drop=0.2, max_shape_drift=0.5,
+                 min_items=20, fail_fast=False):
+        self.crawler = crawler
+        self.baseline_dir = baseline_dir
+        self.max_drop = max_drop
+        self.max_shape_drift = max_shape_drift
+        self.min_items = min_items
+        self.fail_fast = fail_fast
+        self.baseline = None
+        self.profile = FieldProfile()
+        self.problems = []
+        self.closing = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("FIELD_HEALTH_ENABLED"):
+            raise NotConfigured
+        ext = cls(
+            crawler,
+            settings.get("FIELD_HEALTH_BASELINE_DIR", "state"),
+            max_drop=settings.getfloat("FIELD_HEALTH_MAX_DROP", 0.2),
+            max_shape_drift=settings.getfloat("FIELD_HEALTH_MAX_SHAPE_DRIFT", 0.5),
+            min_items=settings.getint("FIELD_HEALTH_MIN_ITEMS", 20),
+            fail_fast=settings.getbool("FIELD_HEALTH_FAIL_FAST"),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def baseline_path(self, spider):
+        return os.path.join(self.baseline_dir, f"{spider.name}.fields.json")
+
+    def spider_opened(self, spider):
+        path = self.baseline_path(spider)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.baseline = FieldProfile.from_dict(json.load(f))
+
+    def item_scraped(self, item, spider):
+        member = ItemAdapter(item)
+        if member.get("ChangeType"):
+            # Incremental runs only pass changed members on
+            return
+        self.profile.add(member)
+        if self.profile.items == self.min_items and self.baseline is not None:
+            problems = self.check()
+            if problems and self.fail_fast:
+                spider.logger.error("Field drift after %d members: %s"
+                                    % (self.min_items, "; ".join(problems)))
+                # Kept, so the close is not garbage collected before it ends
+                self.closing = deferred_from_coro(
+                    self.crawler.engine.close_spider_async(reason="field_health_drift"))
+
+    def check(self):
+        self.problems = compare_profiles(self.baseline, self.profile,
+                                         self.max_drop, self.max_shape_drift)
+        return self.problems
+
+    def spider_closed(self, spider, reason):
+        stats = self.crawler.stats
+        for field in self.profile.filled.keys() | self.baseline_fields():
+            stats.set_value(f"field_health/{field}/fill_rate", round(self.profile.fill_rate(field), 3))
+        if not self.profile.items:
+            return
+        if self.baseline is not None and self.check():
+            stats.set_value("field_health/drifted_fields", len(self.problems))
+            for problem in self.problems:
+                spider.logger.warning("Field drift: %s" % problem)
+            return
+        if reason == "finished":
+            os.makedirs(self.baseline_dir, exist_ok=True)
+            path = self.baseline_path(spider)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.profile.to_dict(), f, indent=2, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+
+    def baseline_fields(self):
+        return set(self.baseline.filled) if self.baseline is not None else set()
@@ -0,0 +1,425 @@
+# Declarative member page extraction
+#
+# Each legislature is described in legislatures.json by its start URLs, the
+# selector of its member links and one selector per member field. Selectors
+# are translated to XPath once when the configuration is compiled, and every
+# distinct expression is evaluated only once per page.
+#
+# The fast engine (FAST_EXTRACTION_ENABLED) skips parsel altogether: the page
+# is parsed once with lxml and the expressions run as precompiled
+# etree.XPath objects. parsel is only used for fields the fast engine missed.
+#
+# A legislature may also describe a "bulk" source, a roster table or export
+# listing every member with some of their fields. In bulk source mode
+# (BULK_SOURCE_ENABLED) members come from its rows, and a member page is only
+# requested for the rows missing a required field.
+
+import json
+import pkgutil
+import re
+
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+from scrapy.http import HtmlResponse
+
+_translator = HTMLTranslator()
+
+
+def load_legislatures(path=None):
+    """
+    Loads the legislature descriptions.
+
+    Args:
+        path (str): Path of a JSON configuration, defaults to the bundled legislatures.json.
+
+    Returns:
+        dict: The description of each legislature, keyed by legislature name.
+    """
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(pkgutil.get_data("scrapeMPContacts", "legislatures.json"))
+
+
+class CompiledSelector:
+    """
+    A CSS selector translated once to an XPath expression.
+
+    Attributes:
+        css (str): The CSS selector, with parsel's ``::text``/``::attr()`` extensions.
+        xpath (str): The equivalent XPath expression.
+    """
+
+    def __init__(self, css):
+        self.css = css.strip()
+        self.xpath = _translator.css_to_xpath(self.css)
+        try:
+            self.compiled = etree.XPath(self.xpath)
+        except etree.XPathSyntaxError:
+            self.compiled = None
+
+    def evaluate(self, root):
+        """
+        Evaluates the precompiled expression on an lxml document.
+
+        Elements are serialized to HTML and text nodes converted to plain
+        strings, as parsel's ``getall()`` does.
+
+        Args:
+            root (lxml.etree._Element): The parsed page.
+
+        Returns:
+            list: The matched values, or None when the expression cannot be evaluated by lxml.
+        """
+        if self.compiled is None:
+            return None
+        try:
+            results = self.compiled(root)
+        except etree.XPathEvalError:
+            return None
+        if not isinstance(results, list):
+            return [str(results)]
+        return [
+            etree.tostring(r, method="html", encoding="unicode", with_tail=False)
+            if isinstance(r, etree._Element) else str(r)
+            for r in results
+        ]
+
+
+def parse_html(response):
+    """
+    Parses a response body the way parsel does, without building a Selector.
+
+    Args:
+        response (scrapy.http.TextResponse): The downloaded page.
+
+    Returns:
+        lxml.etree._Element: The root of the document.
+    """
+    body = response.text.strip().replace("\x00", "").encode("utf-8") or b"<html/>"
+    parser = etree.HTMLParser(recover=True, encoding="utf-8")
+    root = etree.fromstring(body, parser=parser, base_url=response.url)
+    if root is None:
+        root = etree.fromstring(b"<html/>", parser=parser, base_url=response.url)
+    return root
+
+
+class FieldRule:
+    """
+    One way of extracting a field from the values matched by a selector.
+
+    Attributes:
+        selector (CompiledSelector): The selector providing the values.
+        index (int): Position of the value to use.
+        join (str): Separator joining all values instead of picking one.
+        regex (re.Pattern): Pattern whose first group is extracted from the values.
+        min_results (int): Minimum number of values for the rule to apply.
+        strip (bool): Strip surrounding whitespace from the value.
+    """
+
+    def __init__(self, selector, index=0, join=None, regex=None, min_results=1, strip=True):
+        self.selector = selector
+        self.index = index
+        self.join = join
+        self.regex = re.compile(regex) if regex else None
+        self.min_results = min_results
+        self.strip = strip
+
+    def apply(self, values):
+        if len(values) < self.min_results:
+            return None
+        if self.regex is not None:
+            value = next((m.group(1) for m in map(self.regex.search, values) if m), None)
+        elif self.join is not None:
+            value = self.join.join(values)
+        else:
+            value = values[self.index] if self.index < len(values) else None
+        if value is not None and self.strip:
+            value = value.strip()
+        return value
+
+
+def compile_fields(config, selectors):
+    """
+    Compiles the field descriptions of a page.
+
+    Args:
+        config (dict): For each field, a constant value or one or more rule descriptions.
+        selectors (dict): CompiledSelector objects keyed by CSS selector, shared and completed.
+
+    Returns:
+        dict: For each field, the constant value or a list of FieldRule alternatives.
+    """
+    fields = {}
+    for field, spec in config.items():
+        if not isinstance(spec, (dict, list)):
+            fields[field] = spec
+            continue
+        rules = []
+        for rule in spec if isinstance(spec, list) else [spec]:
+            rule = dict(rule)
+            css = rule.pop("css").strip()
+            selector = selectors.setdefault(css, CompiledSelector(css))
+            rules.append(FieldRule(selector, **rule))
+        fields[field] = rules
+    return fields
+
+
+class LegislatureExtractor:
+    """
+    Compiled description of a legislature's roster and member pages.
+
+    Attributes:
+        name (str): The legislature name.
+        start_urls (list): The roster pages.
+        allowed_domains (list): The domains of the legislature site.
+        links (CompiledSelector): Selector of the member page links on the roster.
+        fields (dict): For each output field, a constant value or a list of FieldRule alternatives.
+        bulk (BulkSource): The structured roster of the legislature, None when it has none.
+    """
+
+    def __init__(self, name, config):
+        self.name = name
+        self.start_urls = config["start_urls"]
+        self.allowed_domains = config["allowed_domains"]
+        links = config["links"]
+        self.links = CompiledSelector(links["css"])
+        self.links_contains = links.get("contains")
+        self.links_replace = links.get("replace")
+
+        # Identical CSS selectors share one CompiledSelector, so a page never
+        # evaluates the same expression twice.
+        selectors = {}
+        self.fields = compile_fields(config["fields"], selectors)
+        self.selectors = list(selectors.values())
+        self.fallbacks = 0
+        self.bulk = BulkSource(config["bulk"], self) if config.get("bulk") else None
+
+    def member_links(self, response):
+        """
+        Extracts the member page links from a roster page.
+
+        Args:
+            response (scrapy.http.Response): The roster page.
+
+        Returns:
+            list: The member page URLs, relative as found in the page.
+        """
+        links = response.xpath(self.links.xpath).getall()
+        if self.links_contains:
+            links = [link for link in links if self.links_contains in link]
+        if self.links_replace:
+            old, new = self.links_replace
+            links = [link.replace(old, new) for link in links]
+        return links
+
+    def extract(self, response):
+        """
+        Extracts every configured field from a member page.
+
+        Args:
+            response (scrapy.http.Response): The member page.
+
+        Returns:
+            dict: The member fields, in configuration order, followed by the page Url.
+        """
+        values = {s.xpath: response.xpath(s.xpath).getall() for s in self.selectors}
+        member = {field: self.apply_rules(rules, values) for field, rules in self.fields.items()}
+        member["Url"] = response.url
+        return member
+
+    def extract_fast(self, response):
+        """
+        Extracts every configured field from a member page with lxml directly.
+
+        All expressions run in one pass over a single lxml parse of the page,
+        parsed exactly as parsel would. Expressions lxml cannot evaluate on its
+        own are a miss: their fields are extracted again through parsel, so
+        the result matches extract(), and counted in ``fallbacks``.
+
+        Args:
+            response (scrapy.http.Response): The member page.
+
+        Returns:
+            dict: The member fields, in configuration order, followed by the page Url.
+        """
+        root = parse_html(response)
+        values = {s.xpath: s.evaluate(root) for s in self.selectors}
+        member = {}
+        for field, rules in self.fields.items():
+            if isinstance(rules, list) and any(values[r.selector.xpath] is None for r in rules):
+                self.fallbacks += 1
+                missed = {r.selector.xpath: response.xpath(r.selector.xpath).getall() for r in rules}
+                member[field] = self.apply_rules(rules, missed)
+            else:
+                member[field] = self.apply_rules(rules, values)
+        member["Url"] = response.url
+        return member
+
+    def extract_safely(self, response):
+        """
+        Extracts every configured field on its own, so one failing selector does not lose the others.
+
+        Args:
+            response (scrapy.http.Response): The member page.
+
+        Returns:
+            tuple: The member fields as extract() returns them, and a dict of the
+            error message of each field that raised or came back empty.
+        """
+        member, errors = {}, {}
+        for field, rules in self.fields.items():
+            try:
+                values = {} if not isinstance(rules, list) else {
+                    rule.selector.xpath: response.xpath(rule.selector.xpath).getall() for rule in rules}
+                member[field] = self.apply_rules(rules, values)
+            except Exception as e:
+                member[field] = None
+                errors[field] = f"{type(e).__name__}: {e}"
+            else:
+                if member[field] is None:
+                    errors[field] = "no value"
+        member["Url"] = response.url
+        return member, errors
+
+    def merge(self, row, member):
+        """
+        Completes the fields of a structured roster row with those of the member page.
+
+        Args:
+            row (dict): The member as extracted from the structured roster.
+            member (dict): The member as extracted from the member page.
+
+        Returns:
+            dict: The member page fields, with the values of the row where it has one.
+        """
+        return {field: row.get(field) or value for field, value in member.items()}
+
+    def apply_rules(self, rules, values):
+        """
+        Returns the value of the first rule that applies, or a constant field value.
+
+        Args:
+            rules: A constant, or a list of FieldRule alternatives.
+            values (dict): The values matched by each XPath expression.
+
+        Returns:
+            The field value, or None when no rule applies.
+        """
+        if not isinstance(rules, list):
+            return rules
+        for rule in rules:
+            value = rule.apply(values[rule.selector.xpath])
+            if value:
+                return value
+        return None
+
+
+class BulkSource:
+    """
+    Compiled description of a structured document listing a whole roster.
+
+    Every member is one row of the document, such as a row of a roster table
+    or an element of an XML export, and its fields are extracted relative to
+    that row. Fields the row does not describe keep the constants of the
+    member page description.
+
+    Attributes:
+        urls (list): The structured documents, the legislature's start URLs by default.
+        rows (CompiledSelector): Selector of one element per member.
+        link (CompiledSelector): Selector of the member page link within a row, or None.
+        fields (dict): For each output field, a constant value or a list of FieldRule alternatives.
+        required (list): Fields whose absence from a row calls for the member page.
+    """
+
+    def __init__(self, config, extractor):
+        self.extractor = extractor
+        self.urls = config.get("urls", extractor.start_urls)
+        self.rows = CompiledSelector(config["rows"])
+        self.link = CompiledSelector(config["link"]) if config.get("link") else None
+        selectors = {}
+        row_fields = compile_fields(config["fields"], selectors)
+        self.fields = {
+            field: row_fields.get(field, None if isinstance(rules, list) else rules)
+            for field, rules in extractor.fields.items()
+        }
+        self.selectors = list(selectors.values())
+        self.required = config.get(
+            "required", [field for field, rules in extractor.fields.items() if isinstance(rules, list)])
+
+    def members(self, response):
+        """
+        Extracts every member of a structured roster.
+
+        Args:
+            response (scrapy.http.Response): The structured document.
+
+        Yields:
+            tuple: The member fields, followed by their Url, and the absolute
+            URL of the member page, None when the row has no link. The Url is
+            the member page, or the document itself for rows without a link.
+        """
+        for row in response.xpath(self.rows.xpath):
+            values = {s.xpath: row.xpath(s.xpath).getall() for s in self.selectors}
+            member = {field: self.extractor.apply_rules(rules, values) for field, rules in self.fields.items()}
+            link = row.xpath(self.link.xpath).get() if self.link is not None else None
+            url = response.urljoin(link.strip()) if link else None
+            member["Url"] = url or response.url
+            yield member, url
+
+    def missing(self, member):
+        """
+        Returns the required fields a member extracted from a row has no value for.
+        """
+        return [field for field in self.required if not member.get(field)]
+
+
+def compile_legislatures(config):
+    """
+    Compiles every legislature of a configuration.
+
+    Args:
+        config (dict): Legislature descriptions as returned by load_legislatures.
+
+    Returns:
+        dict: A LegislatureExtractor for each legislature, keyed by name.
+    """
+    return {name: LegislatureExtractor(name, spec) for name, spec in config.items()}
+
+
+# Extractors of a parse pool worker process, compiled once by init_pool_worker
+_pool_extractors = None
+
+
+def init_pool_worker(config_path=None):
+    """
+    Compiles the legislature descriptions in a parse pool worker process.
+
+    Args:
+        config_path (str): Path of a JSON configuration, defaults to the bundled legislatures.json.
+    """
+    global _pool_extractors
+    _pool_extractors = compile_legislatures(load_legislatures(config_path))
+
+
+def extract_in_pool(legislature, url, body, encoding, fast=False):
+    """
+    Extracts a member page in a parse pool worker process.
+
+    Only the page bytes cross the process boundary, the response is rebuilt
+    in the worker and parsed with the same selectors as in the spider.
+
+    Args:
+        legislature (str): The legislature the member page belongs to.
+        url (str): URL of the member page.
+        body (bytes): The page body.
+        encoding (str): Encoding of the body, as detected by the spider's response.
+        fast (bool): Use the lxml-direct engine.
+
+    Returns:
+        dict: The member fields.
+    """
+    response = HtmlResponse(url, body=body, encoding=encoding)
+    extractor = _pool_extractors[legislature]
+    return extractor.extract_fast(response) if fast else extractor.extract(response)
+
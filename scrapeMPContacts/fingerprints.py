@@ -0,0 +1,277 @@
+# Compact request fingerprints for JOBDIR crawls
+#
+# Scrapy's RFPDupeFilter keeps every fingerprint of a JOBDIR as a hex line
+# in requests.seen and reads them all back into a set on resume, so resume
+# time and memory grow with the crawl history. CompactDupeFilter keeps them
+# as sorted 20-byte records in JOBDIR/fingerprints.idx, memory-mapped rather
+# than loaded, with a bucket table over the first two bytes that finds the
+# few candidate records of a fingerprint in constant time. Fingerprints
+# added since the file was written are appended to fingerprints.log and
+# merged into the sorted file when the spider closes.
+#
+# Enable it with:
+#
+#     DUPEFILTER_CLASS = "scrapeMPContacts.fingerprints.CompactDupeFilter"
+
+import array
+import bisect
+import hashlib
+import logging
+import mmap
+import os
+
+from scrapy.dupefilters import BaseDupeFilter
+from scrapy.utils.job import job_dir
+from scrapy.utils.request import RequestFingerprinter
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FPIDX001"
+RECORD_SIZE = 20
+BUCKETS = 1 << 16
+# Magic, then the index of the first record of each bucket and the record count
+HEADER_SIZE = len(MAGIC) + (BUCKETS + 1) * 8
+
+
+def fingerprint_key(fingerprint):
+    """
+    Returns a fingerprint as a 20-byte record, hashing fingerprints of another size.
+    """
+    if len(fingerprint) == RECORD_SIZE:
+        return fingerprint
+    return hashlib.sha1(fingerprint).digest()
+
+
+def read_requests_seen(data):
+    """
+    Returns the fingerprints of a requests.seen file written by RFPDupeFilter.
+
+    Scrapy up to 2.13 writes one hexadecimal fingerprint per line, later
+    versions a 2-byte big-endian length followed by the raw fingerprint.
+    """
+    if not data.strip(b"0123456789abcdef\r\n"):
+        return [bytes.fromhex(line.decode("ascii")) for line in data.split() if line]
+    fingerprints, i = [], 0
+    while i + 2 <= len(data):
+        size = int.from_bytes(data[i:i + 2], "big")
+        fingerprints.append(data[i + 2:i + 2 + size])
+        i += 2 + size
+    return fingerprints
+
+
+def bucket_of(key):
+    return key[0] << 8 | key[1]
+
+
+class _Records:
+    # Sequence view of the sorted records of a mapped index, for bisect
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // RECORD_SIZE
+
+    def __getitem__(self, i):
+        return bytes(self.data[i * RECORD_SIZE:(i + 1) * RECORD_SIZE])
+
+
+class FingerprintStore:
+    """
+    A set of request fingerprints stored in a directory.
+
+    Without a directory the fingerprints are only kept in memory.
+
+    Attributes:
+        directory (str): Directory holding fingerprints.idx and fingerprints.log.
+        recent (set): Fingerprints added since fingerprints.idx was written.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.recent = set()
+        self.index_file = None
+        self.index = None
+        self.offsets = None
+        self.records = _Records(b"")
+        self.log = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.open_index()
+            self.open_log()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, "fingerprints.idx")
+
+    @property
+    def log_path(self):
+        return os.path.join(self.directory, "fingerprints.log")
+
+    def open_index(self):
+        if not os.path.exists(self.index_path) or os.path.getsize(self.index_path) < HEADER_SIZE:
+            return
+        self.index_file = open(self.index_path, "rb")
+        self.index = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.index[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.index_path} is not a fingerprint index")
+        self.offsets = memoryview(self.index)[len(MAGIC):HEADER_SIZE].cast("Q")
+        self.records = _Records(memoryview(self.index)[HEADER_SIZE:])
+
+    def open_log(self):
+        first_use = self.index is None and not os.path.exists(self.log_path)
+        if not first_use and os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                data = f.read()
+            # A record cut short by a crash is dropped, and so are the records
+            # of a log a crash left behind after compacting it into the index
+            end = len(data) - len(data) % RECORD_SIZE
+            for i in range(0, end, RECORD_SIZE):
+                key = data[i:i + RECORD_SIZE]
+                if key not in self:
+                    self.recent.add(key)
+            if end < len(data):
+                # New records must not be appended after the partial one
+                os.truncate(self.log_path, end)
+        self.log = open(self.log_path, "ab")
+        if first_use:
+            self.import_requests_seen()
+
+    def import_requests_seen(self):
+        # Carry over the history of a JOBDIR written by RFPDupeFilter
+        path = os.path.join(self.directory, "requests.seen")
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            for fingerprint in read_requests_seen(f.read()):
+                if fingerprint not in self:
+                    self.add(fingerprint)
+        logger.info("Imported %d fingerprints from %s" % (len(self.recent), path))
+
+    def __len__(self):
+        return len(self.records) + len(self.recent)
+
+    def __contains__(self, fingerprint):
+        key = fingerprint_key(fingerprint)
+        if key in self.recent:
+            return True
+        if self.offsets is None:
+            return False
+        bucket = bucket_of(key)
+        lo, hi = self.offsets[bucket], self.offsets[bucket + 1]
+        i = bisect.bisect_left(self.records, key, lo, hi)
+        return i < hi and self.records[i] == key
+
+    def add(self, fingerprint):
+        """
+        Adds a fingerprint that is not in the store yet.
+        """
+        key = fingerprint_key(fingerprint)
+        self.recent.add(key)
+        if self.log is not None:
+            self.log.write(key)
+
+    def compact(self):
+        """
+        Merges the recent fingerprints into a new sorted index file and empties the log.
+        """
+        if self.directory is None or not self.recent:
+            return
+        self.log.flush()
+        new = sorted(self.recent)
+        counts = array.array("Q", bytes(8 * (BUCKETS + 1)))
+        for key in new:
+            counts[bucket_of(key) + 1] += 1
+        offsets = array.array("Q", bytes(8 * (BUCKETS + 1)))
+        added = 0
+        for bucket in range(BUCKETS + 1):
+            # Every bucket starts after the new fingerprints of the buckets before it
+            added += counts[bucket]
+            offsets[bucket] = self.base_offset(bucket) + added
+
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(offsets.tobytes())
+            # Copy the old records between the new ones in bulk
+            data, start = self.records.data, 0
+            for key in new:
+                position = bisect.bisect_left(self.records, key)
+                f.write(data[start * RECORD_SIZE:position * RECORD_SIZE])
+                f.write(key)
+                start = position
+            f.write(data[start * RECORD_SIZE:])
+        self.close_index()
+        os.replace(tmp_path, self.index_path)
+        self.log.close()
+        self.log = open(self.log_path, "wb")
+        self.recent = set()
+        self.open_index()
+
+    def base_offset(self, bucket):
+        return self.offsets[bucket] if self.offsets is not None else 0
+
+    def close_index(self):
+        if self.index is None:
+            return
+        self.records.data.release()
+        self.records = _Records(b"")
+        self.offsets.release()
+        self.offsets = None
+        self.index.close()
+        self.index_file.close()
+        self.index = self.index_file = None
+
+    def close(self, compact=True):
+        if self.directory is None:
+            return
+        if compact:
+            self.compact()
+        self.log.close()
+        self.close_index()
+
+
+class CompactDupeFilter(BaseDupeFilter):
+    """
+    Request dupefilter keeping the fingerprints of a JOBDIR in a FingerprintStore.
+
+    Resuming a crawl maps the sorted fingerprint file instead of loading
+    every fingerprint, so it starts at once and uses little memory whatever
+    the size of the history. An existing requests.seen is imported on first
+    use.
+
+    Settings:
+        JOBDIR (str): Directory of the resumable crawl, fingerprints are only kept in memory without it.
+        DUPEFILTER_DEBUG (bool): Log every filtered request, not only the first one.
+    """
+
+    def __init__(self, path=None, debug=False, *, fingerprinter=None):
+        self.store = FingerprintStore(path)
+        self.fingerprinter = fingerprinter or RequestFingerprinter()
+        self.debug = debug
+        self.logdupes = True
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(job_dir(crawler.settings), crawler.settings.getbool("DUPEFILTER_DEBUG"),
+                   fingerprinter=crawler.request_fingerprinter)
+
+    def request_seen(self, request):
+        fingerprint = self.fingerprinter.fingerprint(request)
+        if fingerprint in self.store:
+            return True
+        self.store.add(fingerprint)
+        return False
+
+    def close(self, reason):
+        self.store.close()
+
+    def log(self, request, spider):
+        if self.debug:
+            logger.debug("Filtered duplicate request: %(request)s", {"request": request},
+                         extra={"spider": spider})
+        elif self.logdupes:
+            logger.debug("Filtered duplicate request: %(request)s - no more duplicates will be shown"
+                         " (see DUPEFILTER_DEBUG to show all duplicates)", {"request": request},
+                         extra={"spider": spider})
+            self.logdupes = False
+        spider.crawler.stats.inc_value("dupefilter/filtered")
@@ -0,0 +1,55 @@
+# HTTP cache policy for member profile pages
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
+
+from time import time
+
+from scrapy.extensions.httpcache import RFC2616Policy
+
+
+class ConditionalGetPolicy(RFC2616Policy):
+    """
+    HTTP cache policy that revalidates every stored page with a conditional GET.
+
+    Legislature sites rarely send useful expiration headers, so the stock
+    RFC2616 policy either serves stale member pages or downloads them again in
+    full. This policy always asks the server whether a stored page changed,
+    sending ``If-None-Match``/``If-Modified-Since`` from the stored ``ETag`` and
+    ``Last-Modified`` headers, and serves the stored body when the server
+    answers ``304 Not Modified``.
+
+    Settings:
+        HTTPCACHE_REVALIDATE_AFTER (int): Seconds during which a stored page is
+            served without contacting the server at all. Defaults to 0, so
+            every run revalidates every page. When set, pages without
+            validators are stored too, and downloaded again in full once
+            that delay has passed.
+    """
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.revalidate_after = settings.getint("HTTPCACHE_REVALIDATE_AFTER", 0)
+
+    def should_cache_response(self, response, request):
+        # RFC2616Policy never stores pages without validators or expiration
+        # hints. They cannot be revalidated, but within
+        # HTTPCACHE_REVALIDATE_AFTER they are served without contacting the
+        # server at all, so they are worth storing then.
+        if (self.revalidate_after and response.status == 200 and not self._has_validators(response)
+                and b"no-store" not in self._parse_cachecontrol(response)):
+            return True
+        return super().should_cache_response(response, request)
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        # The age of a page comes from its Date header, a page without one
+        # would look freshly stored forever
+        if self.revalidate_after and b"Date" in cachedresponse.headers:
+            age = self._compute_current_age(cachedresponse, request, time())
+            if age < self.revalidate_after:
+                return True
+        self._set_conditional_validators(request, cachedresponse)
+        return False
+
+    def _has_validators(self, response):
+        return b"ETag" in response.headers or b"Last-Modified" in response.headers
@@ -0,0 +1,139 @@
+# Member identity index
+#
+# Every member is reduced to canonical identity keys (profile URL, email,
+# name plus telephone). The index maps each key to the first member that
+# claimed it and the fields known about that member, in memory or spilled to a
+# dbm file for very large or resumable runs, and is shared by all crawlers of
+# a process so `crawlall` deduplicates across legislatures. A dbm file only
+# outlives its run for a resumed job.
+
+import dbm
+import json
+
+from w3lib.url import canonicalize_url
+
+from scrapeMPContacts.normalize import canonical_email, canonical_name, canonical_phone
+
+KEY_TYPES = ("url", "email", "name_phone")
+
+
+def identity_keys(member, key_types=KEY_TYPES):
+    """
+    Returns the canonical identity keys of a member.
+
+    Args:
+        member (dict): The member fields.
+        key_types (tuple): The kinds of keys to build, among KEY_TYPES.
+
+    Returns:
+        list: ``(key_type, key)`` pairs, without the keys whose fields are empty.
+    """
+    keys = []
+    if "url" in key_types and member.get("Url"):
+        keys.append(("url", canonicalize_url(member["Url"])))
+    if "email" in key_types:
+        email = canonical_email(member.get("Contact"))
+        if email:
+            keys.append(("email", email))
+    if "name_phone" in key_types:
+        name = canonical_name(member.get("Name"))
+        phone = canonical_phone(member.get("Telephone"))
+        if name and phone:
+            keys.append(("name_phone", f"{name}|{phone}"))
+    return keys
+
+
+class MemberIndex:
+    """
+    Maps identity keys to the first member that claimed them.
+
+    Attributes:
+        path (str): dbm file holding the index, None to keep it in memory.
+        entries: The dict or dbm mapping of ``key_type:key`` to the owner, as JSON.
+        users (int): Number of pipelines sharing the index.
+    """
+
+    _shared = {}
+    # Paths of the dbm files this process already opened
+    _opened = set()
+
+    def __init__(self, path=None, reset=False):
+        self.path = path
+        self.entries = dbm.open(path, "n" if reset else "c") if path else {}
+        self.users = 0
+
+    @classmethod
+    def acquire(cls, path=None, resume=False):
+        """
+        Returns the index of a path shared by the process, opening it on first use.
+
+        A dbm file left by an earlier run is emptied the first time the process
+        opens it, otherwise every member would match itself from that run.
+
+        Args:
+            path (str): dbm file holding the index, None for the in-memory index.
+            resume (bool): Keep the members of the earlier run, for a resumed job.
+
+        Returns:
+            MemberIndex: The shared index.
+        """
+        index = cls._shared.get(path)
+        if index is None:
+            reset = not resume and path not in cls._opened
+            index = cls._shared[path] = cls(path, reset)
+            cls._opened.add(path)
+        index.users += 1
+        return index
+
+    def release(self):
+        self.users -= 1
+        if self.users == 0:
+            del self._shared[self.path]
+            if self.path:
+                self.entries.close()
+
+    def lookup(self, keys):
+        """
+        Returns the members already owning some of the keys.
+
+        Args:
+            keys (list): ``(key_type, key)`` pairs as returned by identity_keys.
+
+        Returns:
+            list: ``(key_type, key, owner)`` for every key already recorded.
+        """
+        found = []
+        for key_type, key in keys:
+            owner = self.entries.get(f"{key_type}:{key}")
+            if owner is not None:
+                found.append((key_type, key, json.loads(owner)))
+        return found
+
+    def record(self, keys, owner):
+        """
+        Records a member as the owner of the keys nobody owns yet.
+
+        Args:
+            keys (list): ``(key_type, key)`` pairs as returned by identity_keys.
+            owner (dict): Description of the member, e.g. its Url and spider.
+        """
+        encoded = json.dumps(owner, ensure_ascii=False)
+        for key_type, key in keys:
+            if f"{key_type}:{key}" not in self.entries:
+                self.entries[f"{key_type}:{key}"] = encoded
+
+    def update(self, keys, owner):
+        """
+        Replaces the recorded description of a member, and records it as the owner of the keys nobody owns yet.
+
+        Keys owned by another member, identified by its Url, are left to it.
+
+        Args:
+            keys (list): ``(key_type, key)`` pairs as returned by identity_keys.
+            owner (dict): The new description of the member.
+        """
+        encoded = json.dumps(owner, ensure_ascii=False)
+        for key_type, key in keys:
+            current = self.entries.get(f"{key_type}:{key}")
+            if current is None or json.loads(current)["Url"] == owner["Url"]:
+                self.entries[f"{key_type}:{key}"] = encoded
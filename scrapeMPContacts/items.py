@@ -3,10 +3,74 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
-import scrapy
+import re
+from dataclasses import dataclass, fields
 
+_whitespace = re.compile(r"\s+")
 
-class ScrapempcontactsItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+
+@dataclass(slots=True)
+class MemberItem:
+    """
+    A member of a legislature, with the same schema for every spider.
+
+    Every field is a string. Missing values are stored as empty strings and
+    whitespace is collapsed, so rows from different legislatures can be
+    exported into one columnar file without reconciling keys.
+
+    Attributes:
+        Name (str): Full name of the member.
+        Govt (str): Level of government, e.g. 'Federal Leader' or 'Provincial Leader'.
+        PoliticalAffiliation (str): Party or caucus of the member.
+        Constituency (str): Riding represented by the member.
+        ProvinceTerritory (str): Province or territory of the legislature or riding.
+        PreferredLanguage (str): Preferred language of the member.
+        Contact (str): Email address of the member.
+        Telephone (str): Telephone number of the member.
+        Url (str): Profile page the member was extracted from.
+        Latitude (str): Latitude of the member's riding, set by the enrichment pipeline.
+        Longitude (str): Longitude of the member's riding, set by the enrichment pipeline.
+        ContactMX (str): 'yes' or 'no' whether the email domain has MX records, set by the enrichment pipeline.
+        BoundaryId (str): Identifier of the riding boundary, set by the enrichment pipeline.
+        ChangeType (str): Set by the incremental pipeline to 'added', 'changed' or 'removed'.
+        Errors (str): Set by FailSoftMiddleware on members extracted after a callback error.
+    """
+    Name: str = ""
+    Govt: str = ""
+    PoliticalAffiliation: str = ""
+    Constituency: str = ""
+    ProvinceTerritory: str = ""
+    PreferredLanguage: str = ""
+    Contact: str = ""
+    Telephone: str = ""
+    Url: str = ""
+    Latitude: str = ""
+    Longitude: str = ""
+    ContactMX: str = ""
+    BoundaryId: str = ""
+    ChangeType: str = ""
+    Errors: str = ""
+
+    def __post_init__(self):
+        for name in MEMBER_FIELDS:
+            value = getattr(self, name)
+            if value is None:
+                setattr(self, name, "")
+            elif isinstance(value, str):
+                setattr(self, name, _whitespace.sub(" ", value).strip())
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds a member from a mapping, ignoring keys outside the schema.
+
+        Args:
+            data (dict): The member fields.
+
+        Returns:
+            MemberItem: The normalized member.
+        """
+        return cls(**{key: value for key, value in data.items() if key in MEMBER_FIELDS})
+
+
+MEMBER_FIELDS = tuple(field.name for field in fields(MemberItem))
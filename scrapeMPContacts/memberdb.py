@@ -0,0 +1,162 @@
+# Local SQLite index of scraped members
+#
+# Members are upserted on their profile Url. Every update that changes a
+# member, and every deletion, copies the previous row to member_history.
+
+import sqlite3
+from datetime import datetime, timezone
+
+from scrapeMPContacts.items import MEMBER_FIELDS
+
+COLUMNS = [name for name in MEMBER_FIELDS if name not in ("ChangeType", "Errors")]
+DATA_COLUMNS = [name for name in COLUMNS if name != "Url"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS members (
+    {", ".join(f"{name} TEXT" for name in DATA_COLUMNS)},
+    Url TEXT PRIMARY KEY,
+    Spider TEXT,
+    FirstSeen TEXT,
+    LastSeen TEXT
+);
+CREATE INDEX IF NOT EXISTS members_province ON members (ProvinceTerritory, PoliticalAffiliation);
+CREATE INDEX IF NOT EXISTS members_party ON members (PoliticalAffiliation);
+CREATE INDEX IF NOT EXISTS members_constituency ON members (Constituency);
+
+CREATE TABLE IF NOT EXISTS member_history (
+    id INTEGER PRIMARY KEY,
+    {", ".join(f"{name} TEXT" for name in COLUMNS)},
+    Spider TEXT,
+    FirstSeen TEXT,
+    LastSeen TEXT,
+    ReplacedAt TEXT
+);
+CREATE INDEX IF NOT EXISTS member_history_url ON member_history (Url);
+
+CREATE TRIGGER IF NOT EXISTS members_archive_update
+BEFORE UPDATE ON members
+WHEN {" OR ".join(f"OLD.{name} IS NOT NEW.{name}" for name in DATA_COLUMNS)}
+BEGIN
+    INSERT INTO member_history ({", ".join(COLUMNS)}, Spider, FirstSeen, LastSeen, ReplacedAt)
+    VALUES ({", ".join(f"OLD.{name}" for name in COLUMNS)}, OLD.Spider, OLD.FirstSeen, OLD.LastSeen, NEW.LastSeen);
+END;
+
+CREATE TRIGGER IF NOT EXISTS members_archive_delete
+BEFORE DELETE ON members
+BEGIN
+    INSERT INTO member_history ({", ".join(COLUMNS)}, Spider, FirstSeen, LastSeen, ReplacedAt)
+    VALUES ({", ".join(f"OLD.{name}" for name in COLUMNS)}, OLD.Spider, OLD.FirstSeen, OLD.LastSeen, strftime('%Y-%m-%dT%H:%M:%S+00:00', 'now'));
+END;
+"""
+
+UPSERT = f"""
+INSERT INTO members ({", ".join(COLUMNS)}, Spider, FirstSeen, LastSeen)
+VALUES ({", ".join("?" for _ in COLUMNS)}, ?, ?, ?)
+ON CONFLICT (Url) DO UPDATE SET
+    {", ".join(f"{name} = excluded.{name}" for name in DATA_COLUMNS)},
+    Spider = excluded.Spider,
+    LastSeen = excluded.LastSeen
+"""
+
+
+class MemberDatabase:
+    """
+    A SQLite database of members, queryable by province, party and constituency.
+
+    Attributes:
+        path (str): Path of the SQLite database file.
+        connection (sqlite3.Connection): The open connection.
+
+    Example:
+        >>> db = MemberDatabase("members.db")
+        >>> db.members(province="Manitoba", party="NDP")
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        self.migrate()
+
+    def migrate(self):
+        """
+        Adds the columns of fields added to MemberItem since the database was created.
+
+        The history triggers are recreated, so the new columns are archived too.
+        """
+        existing = {row["name"] for row in self.connection.execute("PRAGMA table_info(members)")}
+        missing = [name for name in DATA_COLUMNS if name not in existing]
+        if not missing:
+            return
+        with self.connection:
+            for name in missing:
+                self.connection.execute(f"ALTER TABLE members ADD COLUMN {name} TEXT")
+                self.connection.execute(f"ALTER TABLE member_history ADD COLUMN {name} TEXT")
+            self.connection.execute("DROP TRIGGER IF EXISTS members_archive_update")
+            self.connection.execute("DROP TRIGGER IF EXISTS members_archive_delete")
+        self.connection.executescript(SCHEMA)
+
+    def upsert(self, rows, spider_name):
+        """
+        Inserts or updates members in a single transaction.
+
+        Args:
+            rows (list): Member rows, each a sequence of values in COLUMNS order.
+            spider_name (str): Name of the spider that scraped the members.
+        """
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.connection:
+            self.connection.executemany(
+                UPSERT, [(*row, spider_name, now, now) for row in rows])
+
+    def delete(self, urls):
+        """
+        Deletes members in a single transaction, keeping their last values in the history.
+
+        Args:
+            urls (list): Profile URLs of the members to delete.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM members WHERE Url = ?", [(url,) for url in urls])
+
+    def members(self, province=None, party=None, constituency=None):
+        """
+        Returns the members matching every given criterion.
+
+        Args:
+            province (str): Exact ProvinceTerritory value.
+            party (str): Exact PoliticalAffiliation value.
+            constituency (str): Exact Constituency value.
+
+        Returns:
+            list: The matching members, as dicts.
+        """
+        criteria = {
+            "ProvinceTerritory": province,
+            "PoliticalAffiliation": party,
+            "Constituency": constituency,
+        }
+        criteria = {column: value for column, value in criteria.items() if value is not None}
+        where = " AND ".join(f"{column} = ?" for column in criteria) or "1"
+        cursor = self.connection.execute(
+            f"SELECT * FROM members WHERE {where} ORDER BY Name", tuple(criteria.values()))
+        return [dict(row) for row in cursor]
+
+    def history(self, url):
+        """
+        Returns the previous values of a member, oldest first.
+
+        Args:
+            url (str): Profile URL of the member.
+
+        Returns:
+            list: The archived rows, as dicts.
+        """
+        cursor = self.connection.execute(
+            "SELECT * FROM member_history WHERE Url = ? ORDER BY id", (url,))
+        return [dict(row) for row in cursor]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,65 @@
+# Export of crawl metrics collected as Scrapy stats
+#
+# The instrumentation middlewares record per-domain download latency and
+# bytes, and per-callback timings, under these stats keys:
+#
+#     latency/<domain>/count, latency/<domain>/seconds, latency/<domain>/max_seconds
+#     response_bytes/<domain>/total
+#     callback/<name>/calls, callback/<name>/seconds, callback/<name>/max_seconds,
+#     callback/<name>/items, callback/<name>/errors
+
+import json
+import re
+from datetime import datetime
+
+_invalid_metric_chars = re.compile(r"[^a-zA-Z0-9_]")
+
+# Stats key prefixes whose second component becomes a Prometheus label
+LABELLED_PREFIXES = {"latency": "domain", "response_bytes": "domain", "callback": "callback"}
+
+
+def prometheus_lines(stats, spider_name):
+    """
+    Converts numeric stats to Prometheus text exposition lines.
+
+    Args:
+        stats (dict): The stats of a crawl.
+        spider_name (str): Name of the spider, added as the ``spider`` label.
+
+    Returns:
+        list: One line per numeric stat.
+    """
+    lines = []
+    for key, value in sorted(stats.items()):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        labels = {"spider": spider_name}
+        parts = key.split("/")
+        if parts[0] in LABELLED_PREFIXES and len(parts) == 3:
+            labels[LABELLED_PREFIXES[parts[0]]] = parts[1]
+            name = f"{parts[0]}_{parts[2]}"
+        else:
+            name = key
+        name = "scrapy_" + _invalid_metric_chars.sub("_", name)
+        rendered = ",".join(f'{label}="{text}"' for label, text in labels.items())
+        lines.append(f"{name}{{{rendered}}} {value}")
+    return lines
+
+
+def write_metrics(stats, spider_name, path, fmt="json"):
+    """
+    Writes the stats of a crawl to a file.
+
+    Args:
+        stats (dict): The stats of a crawl.
+        spider_name (str): Name of the spider.
+        path (str): Destination file, ``%(name)s`` is replaced by the spider name.
+        fmt (str): Either 'json' or 'prometheus'.
+    """
+    path = path % {"name": spider_name}
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "prometheus":
+            f.write("\n".join(prometheus_lines(stats, spider_name)) + "\n")
+        else:
+            json.dump(stats, f, indent=2, sort_keys=True,
+                      default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
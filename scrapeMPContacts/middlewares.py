@@ -3,7 +3,24 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import cProfile
+import hashlib
+import json
+import os
+import random
+import re
+import time
+
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.request import RequestFingerprinter
+
+from scrapeMPContacts.extraction import compile_legislatures, load_legislatures
+from scrapeMPContacts.items import MemberItem
+from scrapeMPContacts.metrics import write_metrics
+from scrapeMPContacts.replay import HarArchive
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
@@ -13,12 +30,27 @@ class ScrapempcontactsSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the spider middleware does not modify the
     # passed objects.
+    #
+    # Installed right next to the spider, it times every callback (parse,
+    # parse_contact, parse_author, ...) and counts the items it yields, see
+    # scrapeMPContacts.metrics for the stats keys. PROFILE_CALLBACKS also
+    # records the callbacks with cProfile.
+
+    def __init__(self, stats=None, settings=None):
+        self.stats = stats
+        self.metrics_path = settings.get("METRICS_EXPORT_PATH") if settings else None
+        self.metrics_format = settings.get("METRICS_EXPORT_FORMAT", "json") if settings else "json"
+        self.profile_path = settings.get("PROFILE_OUTPUT", "%(name)s.prof") if settings else None
+        self.profiler = None
+        if settings and settings.getbool("PROFILE_CALLBACKS"):
+            self.profiler = cProfile.Profile()
 
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        s = cls(crawler.stats, crawler.settings)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
     def process_spider_input(self, response, spider):
@@ -33,8 +65,76 @@ class ScrapempcontactsSpiderMiddleware:
         # it has processed the response.
 
         # Must return an iterable of Request, or item objects.
-        for i in result:
-            yield i
+        # The callback runs lazily while its output is iterated, so
+        # each step of the iteration is timed, also when it raises.
+        elapsed = 0.0
+        items = 0
+        failed = False
+        result = iter(result)
+        try:
+            while True:
+                started = self.start_timer()
+                try:
+                    i = next(result)
+                except StopIteration:
+                    break
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    elapsed += self.stop_timer(started)
+                if not isinstance(i, Request):
+                    items += 1
+                yield i
+        finally:
+            self.record_callback(response, elapsed, items, failed)
+
+    async def process_spider_output_async(self, response, result, spider):
+        elapsed = 0.0
+        items = 0
+        failed = False
+        result = result.__aiter__()
+        try:
+            while True:
+                started = self.start_timer()
+                try:
+                    i = await result.__anext__()
+                except StopAsyncIteration:
+                    break
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    elapsed += self.stop_timer(started)
+                if not isinstance(i, Request):
+                    items += 1
+                yield i
+        finally:
+            self.record_callback(response, elapsed, items, failed)
+
+    def start_timer(self):
+        if self.profiler is not None:
+            self.profiler.enable()
+        return time.perf_counter()
+
+    def stop_timer(self, started):
+        elapsed = time.perf_counter() - started
+        if self.profiler is not None:
+            self.profiler.disable()
+        return elapsed
+
+    def record_callback(self, response, elapsed, items, failed=False):
+        if self.stats is None:
+            return
+        callback = response.request.callback if response.request else None
+        name = getattr(callback, "__name__", "parse").lstrip("_")
+        self.stats.inc_value(f"callback/{name}/calls")
+        if failed:
+            self.stats.inc_value(f"callback/{name}/errors")
+        self.stats.inc_value(f"callback/{name}/seconds", elapsed, start=0.0)
+        self.stats.max_value(f"callback/{name}/max_seconds", elapsed)
+        self.stats.inc_value(f"callback/{name}/items", items)
+        self.stats.max_value("items_per_response/max", items)
 
     def process_spider_exception(self, response, exception, spider):
         # Called when a spider or process_spider_input() method
@@ -55,17 +155,253 @@ class ScrapempcontactsSpiderMiddleware:
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
 
+    def spider_closed(self, spider):
+        if self.metrics_path and self.stats is not None:
+            write_metrics(self.stats.get_stats(), spider.name,
+                          self.metrics_path, self.metrics_format)
+        if self.profiler is not None:
+            path = self.profile_path % {"name": spider.name}
+            self.profiler.dump_stats(path)
+            spider.logger.info("Callback profile written to %s" % path)
+
+
+class RosterFingerprintMiddleware:
+    """
+    Skips the member page fan-out of a legislature whose roster did not change.
+
+    The requests yielded from each index page (depth 0) are fingerprinted as
+    the hash of their sorted URLs and compared with the fingerprint stored by
+    the previous run. When the roster is unchanged only a random sample of the
+    member pages is requested, except on every Nth run which always does a full
+    refresh.
+
+    Settings:
+        ROSTER_FINGERPRINT_ENABLED (bool): Enable the middleware.
+        ROSTER_STATE_DIR (str): Directory holding the per-spider fingerprints.
+        ROSTER_FULL_REFRESH_EVERY (int): Force a full crawl every N runs, 0 never forces one.
+        ROSTER_SAMPLE_SIZE (int): Member pages still requested when the roster is unchanged.
+    """
+
+    def __init__(self, state_dir, refresh_every=0, sample_size=0, stats=None):
+        self.state_dir = state_dir
+        self.refresh_every = refresh_every
+        self.sample_size = sample_size
+        self.stats = stats
+        self.state = {}
+        self.fingerprints = {}
+        self.full_refresh = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ROSTER_FINGERPRINT_ENABLED"):
+            raise NotConfigured
+        s = cls(
+            settings.get("ROSTER_STATE_DIR", "state"),
+            refresh_every=settings.getint("ROSTER_FULL_REFRESH_EVERY"),
+            sample_size=settings.getint("ROSTER_SAMPLE_SIZE"),
+            stats=crawler.stats,
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def state_path(self, spider):
+        return os.path.join(self.state_dir, f"{spider.name}.roster.json")
+
+    def spider_opened(self, spider):
+        path = self.state_path(spider)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.state = json.load(f)
+        runs = self.state.get("runs_since_full", 0)
+        self.full_refresh = bool(self.refresh_every) and runs + 1 >= self.refresh_every
+
+    def process_spider_output(self, response, result, spider):
+        if response.meta.get("depth", 0) != 0:
+            yield from result
+            return
+
+        requests = []
+        for i in result:
+            if isinstance(i, Request):
+                requests.append(i)
+            else:
+                yield i
+        yield from self.filter_roster(response, requests, spider)
+
+    async def process_spider_output_async(self, response, result, spider):
+        if response.meta.get("depth", 0) != 0:
+            async for i in result:
+                yield i
+            return
+
+        requests = []
+        async for i in result:
+            if isinstance(i, Request):
+                requests.append(i)
+            else:
+                yield i
+        for r in self.filter_roster(response, requests, spider):
+            yield r
+
+    def filter_roster(self, response, requests, spider):
+        """
+        Returns the member page requests to follow from an index page.
+
+        Args:
+            response (scrapy.http.Response): The index page response.
+            requests (list): Every request yielded from the index page.
+            spider (scrapy.Spider): The spider that parsed the index page.
+
+        Returns:
+            list: All requests when the roster changed, a sample otherwise.
+        """
+        if not requests:
+            return requests
+        fingerprint = self.fingerprint(requests)
+        previous = self.state.get("fingerprints", {}).get(response.url)
+        self.fingerprints[response.url] = fingerprint
+        if self.full_refresh or fingerprint != previous:
+            return requests
+
+        sample = random.sample(requests, min(self.sample_size, len(requests)))
+        self.stats.inc_value("roster/unchanged")
+        self.stats.inc_value("roster/skipped_requests", len(requests) - len(sample))
+        spider.logger.info("Roster unchanged on %s, requesting %d of %d member pages" % (
+            response.url, len(sample), len(requests)))
+        return sample
+
+    def fingerprint(self, requests):
+        """
+        Returns the hash of the sorted set of URLs requested from an index page.
+
+        Args:
+            requests (list): The requests yielded from the index page.
+
+        Returns:
+            str: The hexadecimal SHA-1 digest of the URLs.
+        """
+        urls = "\n".join(sorted({r.url for r in requests}))
+        return hashlib.sha1(urls.encode("utf-8")).hexdigest()
+
+    def spider_closed(self, spider, reason):
+        if reason != "finished" or not self.fingerprints:
+            return
+        unchanged = not self.full_refresh and all(
+            self.state.get("fingerprints", {}).get(url) == fp
+            for url, fp in self.fingerprints.items())
+        state = {
+            "fingerprints": self.fingerprints,
+            "runs_since_full": self.state.get("runs_since_full", 0) + 1 if unchanged else 0,
+        }
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self.state_path(spider)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+
+class RequestFilterMiddleware:
+    """
+    Drops the useless requests yielded by the callbacks before the scheduler.
+
+    Roster tables link every member several times (name, riding, photo) and
+    mix in in-page anchors. Requests that are not HTTP(S), that point back to
+    the page they were found on (fragments), or that repeat an earlier request
+    of the same page never reach the scheduler. Requests are compared by
+    their fingerprint, and their URLs are left as they are. Duplicates of
+    requests from other pages are left to the configured dupefilter. On a
+    domain listed in REQUEST_FILTER_PATTERNS, links whose path does not match
+    the domain's pattern are dropped too. Requests with dont_filter and
+    non-GET requests pass unchanged.
+
+    Settings:
+        REQUEST_FILTER_ENABLED (bool): Enable the middleware.
+        REQUEST_FILTER_PATTERNS (dict): Regular expression the URL paths of a domain must match, keyed by domain.
+    """
+
+    SCHEMES = ("http", "https")
+
+    def __init__(self, patterns=None, stats=None, *, fingerprinter=None):
+        self.patterns = {domain: re.compile(pattern) for domain, pattern in (patterns or {}).items()}
+        self.stats = stats
+        self.fingerprinter = fingerprinter or RequestFingerprinter()
+        self.host_patterns = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("REQUEST_FILTER_ENABLED"):
+            raise NotConfigured
+        return cls(settings.getdict("REQUEST_FILTER_PATTERNS"), crawler.stats,
+                   fingerprinter=crawler.request_fingerprinter)
+
+    def process_spider_output(self, response, result, spider):
+        page, seen = self.fingerprinter.fingerprint(Request(response.url)), set()
+        for i in result:
+            if isinstance(i, Request) and not self.keep(i, page, seen):
+                continue
+            yield i
+
+    async def process_spider_output_async(self, response, result, spider):
+        page, seen = self.fingerprinter.fingerprint(Request(response.url)), set()
+        async for i in result:
+            if isinstance(i, Request) and not self.keep(i, page, seen):
+                continue
+            yield i
+
+    def keep(self, request, page, seen):
+        """
+        Returns whether a request should be scheduled.
+
+        Args:
+            request (scrapy.Request): A request yielded by a callback.
+            page (bytes): Fingerprint of the page the request was found on.
+            seen (set): Fingerprints of the requests the page already yielded.
+        """
+        if request.dont_filter or request.method != "GET":
+            return True
+        parsed = urlparse_cached(request)
+        if parsed.scheme not in self.SCHEMES:
+            return self.drop("scheme")
+        fingerprint = self.fingerprinter.fingerprint(request)
+        if fingerprint == page:
+            return self.drop("self_link")
+        pattern = self.host_pattern(parsed.hostname or "")
+        if pattern is not None and not pattern.search(parsed.path):
+            return self.drop("off_pattern")
+        if fingerprint in seen:
+            return self.drop("duplicate")
+        seen.add(fingerprint)
+        return True
+
+    def host_pattern(self, host):
+        if host not in self.host_patterns:
+            self.host_patterns[host] = next(
+                (pattern for domain, pattern in self.patterns.items()
+                 if host == domain or host.endswith("." + domain)), None)
+        return self.host_patterns[host]
+
+    def drop(self, reason):
+        self.stats.inc_value(f"request_filter/dropped/{reason}")
+        return False
+
 
 class ScrapempcontactsDownloaderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the downloader middleware does not modify the
     # passed objects.
 
+    def __init__(self, stats=None):
+        self.stats = stats
+
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        s = cls(crawler.stats)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
     def process_request(self, request, spider):
@@ -87,8 +423,22 @@ class ScrapempcontactsDownloaderMiddleware:
         # - return a Response object
         # - return a Request object
         # - or raise IgnoreRequest
+        if self.stats is not None:
+            self.record_download(request, response)
         return response
 
+    def record_download(self, request, response):
+        # Latency and body size per domain, see scrapeMPContacts.metrics.
+        # Responses served from the HTTP cache were not downloaded.
+        domain = urlparse_cached(request).hostname or "-"
+        self.stats.inc_value(f"response_bytes/{domain}/total", len(response.body))
+        latency = request.meta.get("download_latency")
+        if latency is None or "cached" in response.flags:
+            return
+        self.stats.inc_value(f"latency/{domain}/count")
+        self.stats.inc_value(f"latency/{domain}/seconds", latency, start=0.0)
+        self.stats.max_value(f"latency/{domain}/max_seconds", latency)
+
     def process_exception(self, request, exception, spider):
         # Called when a download handler or a process_request()
         # (from other downloader middleware) raises an exception.
@@ -101,3 +451,331 @@ class ScrapempcontactsDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+    def spider_closed(self, spider):
+        # Summarize how the HTTP cache served this spider's pages
+        if self.stats is None or not spider.settings.getbool("HTTPCACHE_ENABLED"):
+            return
+        spider.logger.info(
+            "HTTP cache: %d hits, %d revalidated, %d changed, %d misses" % (
+                self.stats.get_value("httpcache/hit", 0),
+                self.stats.get_value("httpcache/revalidate", 0),
+                self.stats.get_value("httpcache/invalidate", 0),
+                self.stats.get_value("httpcache/miss", 0),
+            ))
+
+
+class HarRecorderMiddleware:
+    """
+    Records every downloaded response into a HAR archive per spider.
+
+    The archives can be replayed offline with ``scrapy replay``.
+
+    Settings:
+        HAR_RECORD_DIR (str): Directory receiving ``<spider>.har``, recording is disabled when unset.
+    """
+
+    def __init__(self, record_dir):
+        self.record_dir = record_dir
+        self.archive = HarArchive()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        record_dir = crawler.settings.get("HAR_RECORD_DIR")
+        if not record_dir:
+            raise NotConfigured
+        s = cls(record_dir)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_response(self, request, response, spider):
+        self.archive.add(request, response)
+        return response
+
+    def spider_closed(self, spider):
+        os.makedirs(self.record_dir, exist_ok=True)
+        path = os.path.join(self.record_dir, f"{spider.name}.har")
+        self.archive.save(path)
+        spider.logger.info("Recorded %d responses to %s" % (len(self.archive.entries), path))
+
+
+class MockServerMiddleware:
+    """
+    Sends every request to the local mock legislature server instead of the real site.
+
+    The request is rescheduled for ``<MOCK_SERVER_URL>/<host><path>`` in the
+    download slot of the original host, and the response gets the original
+    URL back, so spiders follow links and filter domains as on the real site.
+    See scrapeMPContacts.mockserver.
+
+    Settings:
+        MOCK_SERVER_URL (str): Base URL of the mock server, the middleware is disabled when unset.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        base_url = crawler.settings.get("MOCK_SERVER_URL")
+        if not base_url:
+            raise NotConfigured
+        return cls(base_url)
+
+    def process_request(self, request, spider):
+        if "mock_original_url" in request.meta:
+            return None
+        parsed = urlparse_cached(request)
+        url = f"{self.base_url}/{parsed.netloc}{parsed.path or '/'}"
+        if parsed.query:
+            url += f"?{parsed.query}"
+        meta = dict(request.meta, mock_original_url=request.url)
+        meta.setdefault("download_slot", parsed.hostname)
+        return request.replace(url=url, meta=meta, dont_filter=True)
+
+    def process_response(self, request, response, spider):
+        original_url = request.meta.get("mock_original_url")
+        if original_url is None:
+            return response
+        return response.replace(url=original_url)
+
+
+class AdaptiveConcurrencyMiddleware:
+    """
+    Adapts the concurrency of each download slot (domain) to how the site responds.
+
+    Every domain gets a concurrency window that grows by one after a full
+    window of responses whose latency stays close to the best latency seen,
+    shrinks by one when latency rises, and is halved on 429/503 responses and
+    download errors. Responses and errors of requests sent before the last
+    change of a window are ignored, they answer for the previous window. The
+    learned windows are saved when the spider closes and applied to the slots
+    of the next crawl as soon as they are created.
+
+    Settings:
+        ADAPTIVE_CONCURRENCY_ENABLED (bool): Enable the middleware.
+        ADAPTIVE_CONCURRENCY_MIN (int): Smallest window, 1 by default.
+        ADAPTIVE_CONCURRENCY_MAX (int): Largest window, 16 by default.
+        ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE (float): Latency increase over the
+            best latency tolerated before backing off, 0.5 meaning +50%.
+        ADAPTIVE_CONCURRENCY_STATE (str): JSON file holding the learned windows.
+    """
+
+    BACKOFF_STATUSES = {429, 503}
+    # Latency jitter, in seconds, never treated as congestion
+    LATENCY_MARGIN = 0.05
+
+    def __init__(self, crawler, minimum=1, maximum=16, tolerance=0.5, state_path=None):
+        self.crawler = crawler
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.state_path = state_path
+        self.initial = crawler.settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN")
+        self.learned = {}
+        self.domains = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_CONCURRENCY_ENABLED"):
+            raise NotConfigured
+        s = cls(
+            crawler,
+            minimum=settings.getint("ADAPTIVE_CONCURRENCY_MIN", 1),
+            maximum=settings.getint("ADAPTIVE_CONCURRENCY_MAX", 16),
+            tolerance=settings.getfloat("ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE", 0.5),
+            state_path=settings.get("ADAPTIVE_CONCURRENCY_STATE"),
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def spider_opened(self, spider):
+        if self.state_path and os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                self.learned = json.load(f)
+
+    def request_reached_downloader(self, request, spider):
+        # Sent once the request has its slot, which the downloader creates
+        # with the default concurrency, also after garbage collecting it
+        key = request.meta.get("download_slot")
+        if key is None:
+            return
+        request.meta["adaptive_concurrency_queued"] = time.time()
+        window = self.domain_state(key)["window"]
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is not None and slot.concurrency != window:
+            slot.concurrency = window
+
+    def domain_state(self, key):
+        state = self.domains.get(key)
+        if state is None:
+            window = self.learned.get(key, self.initial)
+            state = self.domains[key] = {
+                "window": max(self.minimum, min(self.maximum, window)),
+                "successes": 0,
+                "latency": None,
+                "best": None,
+                "changed_at": 0.0,
+            }
+        return state
+
+    def process_response(self, request, response, spider):
+        key = request.meta.get("download_slot")
+        if key is None or "cached" in response.flags:
+            return response
+        state = self.domain_state(key)
+        latency = request.meta.get("download_latency")
+        if self.sent_before_change(request, state):
+            return response
+        if response.status in self.BACKOFF_STATUSES:
+            self.shrink(key, state, half=True)
+        elif latency is not None:
+            self.observe(key, state, latency)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        key = request.meta.get("download_slot")
+        if key is None:
+            return
+        state = self.domain_state(key)
+        if not self.sent_before_change(request, state):
+            self.shrink(key, state, half=True)
+
+    def sent_before_change(self, request, state):
+        """
+        Returns whether a request was sent before the last change of its domain's window.
+
+        Such requests say nothing about the new window. Failed downloads have no
+        latency, the time they were queued in the downloader is used instead.
+        """
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            sent = time.time() - latency
+        else:
+            sent = request.meta.get("adaptive_concurrency_queued")
+        return sent is not None and sent < state["changed_at"]
+
+    def observe(self, key, state, latency):
+        # Exponentially weighted latency, compared with the best one seen
+        ewma = latency if state["latency"] is None else 0.7 * state["latency"] + 0.3 * latency
+        state["latency"] = ewma
+        state["best"] = ewma if state["best"] is None else min(state["best"], ewma)
+        if ewma > state["best"] * (1 + self.tolerance) + self.LATENCY_MARGIN:
+            self.shrink(key, state)
+            return
+        state["successes"] += 1
+        if state["successes"] >= state["window"] and state["window"] < self.maximum:
+            self.apply(key, state, state["window"] + 1)
+
+    def shrink(self, key, state, half=False):
+        window = state["window"] // 2 if half else state["window"] - 1
+        self.apply(key, state, max(self.minimum, window))
+        # Give the site time to recover before the latency is trusted again
+        state["latency"] = None
+
+    def apply(self, key, state, window):
+        if window != state["window"]:
+            self.crawler.spider.logger.debug(
+                "Concurrency of %s changed from %d to %d" % (key, state["window"], window))
+        state["window"] = window
+        state["successes"] = 0
+        state["changed_at"] = time.time()
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is not None:
+            slot.concurrency = window
+        self.crawler.stats.set_value(f"adaptive_concurrency/{key}", window)
+
+    def spider_closed(self, spider):
+        if not self.state_path or not self.domains:
+            return
+        # Other spiders of the same process may have saved their domains
+        learned = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                learned = json.load(f)
+        learned.update({key: state["window"] for key, state in self.domains.items()})
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        with open(self.state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(learned, f, indent=2, sort_keys=True)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+
+class FailSoftMiddleware:
+    """
+    Turns callback errors into partial members instead of lost ones.
+
+    When a callback raises, e.g. an IndexError on ``getall()[6]`` after a
+    layout change, the page is extracted again field by field with the
+    selectors of the spider's legislature in legislatures.json. The member is
+    yielded with whatever fields could be extracted and an ``Errors``
+    annotation naming the exception and the missing fields. Roster pages
+    yield nothing.
+
+    Every failing page is also stored with its callback in the quarantine
+    archive ``<QUARANTINE_DIR>/<spider>.har``, so the fixed callbacks can be
+    checked with ``scrapy replay <spider> <archive> --recorded`` instead of
+    recrawling the legislature.
+
+    Settings:
+        FAILSOFT_ENABLED (bool): Enable the middleware.
+        QUARANTINE_DIR (str): Directory of the quarantine archives.
+    """
+
+    def __init__(self, crawler, quarantine_dir="quarantine"):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.quarantine_dir = quarantine_dir
+        self.extractors = compile_legislatures(load_legislatures(crawler.settings.get("LEGISLATURE_CONFIG")))
+        self.archive = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("FAILSOFT_ENABLED"):
+            raise NotConfigured
+        s = cls(crawler, crawler.settings.get("QUARANTINE_DIR", "quarantine"))
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def quarantine_path(self, spider):
+        return os.path.join(self.quarantine_dir, f"{spider.name}.har")
+
+    def process_spider_exception(self, response, exception, spider):
+        request = response.request
+        callback = getattr(request.callback, "__name__", "parse")
+        self.stats.inc_value(f"failsoft/errors/{callback}")
+        self.quarantine(request, response, callback, spider)
+
+        legislature = request.cb_kwargs.get("legislature", spider.name)
+        extractor = self.extractors.get(legislature)
+        if extractor is None or callback in ("parse", "parse_bulk") or not hasattr(response, "text"):
+            return []
+        member, errors = extractor.extract_safely(response)
+        row = request.cb_kwargs.get("row")
+        if row:
+            # Fields the bulk source already had are not missing
+            member = extractor.merge(row, member)
+            errors = {field: error for field, error in errors.items() if not row.get(field)}
+        annotations = [f"{callback}: {type(exception).__name__}: {exception}"]
+        annotations += [f"{field}: {error}" for field, error in errors.items()]
+        self.stats.inc_value("failsoft/partial_items")
+        spider.logger.warning("Recovered a partial member from %s after %r" % (response.url, exception))
+        return [MemberItem.from_dict(dict(member, Errors="; ".join(annotations)))]
+
+    def quarantine(self, request, response, callback, spider):
+        if self.archive is None:
+            path = self.quarantine_path(spider)
+            self.archive = HarArchive.load(path) if os.path.exists(path) else HarArchive()
+        self.archive.add(request, response, callback=callback)
+        self.stats.inc_value("failsoft/quarantined")
+
+    def spider_closed(self, spider):
+        if self.archive is None:
+            return
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        path = self.quarantine_path(spider)
+        self.archive.save(path)
+        spider.logger.info("Quarantined %d pages to %s" % (len(self.archive.entries), path))
+
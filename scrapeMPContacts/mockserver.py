@@ -0,0 +1,376 @@
+# Local stand-in for the legislature websites
+#
+# MockLegislatureServer generates synthetic roster and member pages in the
+# markup of every site the spiders crawl, for any number of members, with
+# optional latency and injected errors. Pages are served under
+# http://<server>/<original host><original path>, and MockServerMiddleware
+# sends the spiders' requests there, so the spiders crawl the mock unchanged.
+#
+# The server also stubs the JSON services of the enrichment pipeline under
+# http://<server>/enrichment/, see enrichment_settings().
+#
+# Run it on its own with:
+#
+#     python -m scrapeMPContacts.mockserver --port 8800 --members 5000
+#     scrapy crawl Ontario -s MOCK_SERVER_URL=http://127.0.0.1:8800
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+FIRST_NAMES = ["Jane", "Jean-François", "Mary", "Amarjeet", "Élise", "John", "Ann", "Kevin", "Marie", "Omar"]
+LAST_NAMES = ["Doe", "Tremblay", "O'Neil", "Singh", "Roy", "MacDonald", "Lee", "Gagnon", "Chen", "Côté"]
+PARTIES = ["Liberal", "Conservative", "New Democratic", "Green", "Independent"]
+
+PAGE = "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{title}</title></head><body>{body}</body></html>"
+
+# Per host: the legislature, its roster path, the path of member pages
+# ({n} being the member number) and the markup of both kinds of pages.
+SITES = {
+    "www.ourcommons.ca": {
+        "legislature": "ourcommons",
+        "roster": "/members/en/search",
+        "profile": "/members/en/member-{n}",
+        "roster_page": "<div class=\"ce-mip-flex-tile-container\">{rows}</div>",
+        "roster_row": (
+            "<div class=\"ce-mip-mp-tile-container\"><a class=\"ce-mip-mp-tile\" href=\"/members/en/member-{n}\">"
+            "<div class=\"ce-mip-mp-name\">{name}</div><div class=\"ce-mip-mp-party\">{party}</div>"
+            "<div class=\"ce-mip-mp-constituency\">{riding}</div>"
+            "<div class=\"ce-mip-mp-province\">{province}</div></a></div>"),
+        "profile_page": (
+            "<h1>{name}</h1><dl><dt>Political Affiliation:</dt><dd class=\"mip-mp-profile-caucus\">{party}</dd>"
+            "<dt>Constituency:</dt><dd><a href=\"/members/en/constituencies/{n}\">{riding}</a></dd>"
+            "<dt>Province / Territory:</dt><dd>{province}</dd>"
+            "<dt>Preferred Language:</dt><dd>English</dd></dl>"
+            "<div id=\"contact\"><a href=\"mailto:{email}\">{email}</a>"
+            "<p>Telephone: {phone}</p></div>"),
+        "province": "Ontario",
+        "area": "613",
+    },
+    "www.assnat.qc.ca": {
+        "legislature": "Quebec",
+        "roster": "/en/deputes/index.html",
+        "profile": "/en/deputes/member-{n}/coordonnees.html",
+        "link": "/en/deputes/member-{n}/index.html",
+        "roster_page": "<a class=\"nePasRediriger\" href=\"#ListeDeputes\">Top</a><ul id=\"ListeDeputes\">{rows}</ul>",
+        "roster_row": ("<li><a href=\"/en/deputes/member-{n}/index.html\">{name}</a> "
+                       "<a class=\"nePasRediriger\" href=\"#\">{riding}</a></li>"),
+        "profile_page": (
+            "<h1>{first} <span>{last}</span></h1>"
+            "<div class=\"enteteFicheDepute\"><ul><li>{riding}</li><li>{party}</li></ul></div>"
+            "<div class=\"blockAdresseDepute\"><a href=\"mailto:{email}\">{email}</a>"
+            "<span class=\"paragraph\">Telephone: {phone}</span></div>"),
+        "area": "418",
+    },
+    "www.ola.org": {
+        "legislature": "Ontario",
+        "roster": "/en/members/parliament-43",
+        "profile": "/en/members/all/member-{n}",
+        "roster_page": "<table><thead><tr><th>Member</th><th>Riding</th></tr></thead><tbody>{rows}</tbody></table>",
+        "roster_row": ("<tr><td><a href=\"/en/members/all/member-{n}\">{name}</a></td>"
+                       "<td><a href=\"/en/members/all/member-{n}\">{riding}</a></td></tr>"),
+        "profile_page": (
+            "<h2 class=\"field-content\">{name}</h2>"
+            "<p class=\"riding\"><a href=\"/en/members/current\">Current MPPs</a> "
+            "<a href=\"/en/members/riding/{n}\">{riding}</a></p>"
+            "<span class=\"field-content\"><a href=\"mailto:{email}\">{email}</a></span>"),
+        "area": "416",
+    },
+    "www.assembly.ab.ca": {
+        "legislature": "Alberta",
+        "roster": "/members/members-of-the-legislative-assembly",
+        "profile": "/members/members-of-the-legislative-assembly/member-{n}",
+        "roster_page": "<div id=\"mla-table\">{rows}</div>",
+        "roster_row": ("<div class=\"mla-row\"><a href=\"/members/members-of-the-legislative-assembly/"
+                       "member-{n}\">{name}</a></div>"),
+        "profile_page": (
+            "<h2>{name}</h2><div class=\"col-lg-6 my-3 px-3 px-lg-0\"><p>Member</p><p>MLA</p>"
+            "<p>{party}</p><p>{riding}</p></div>"
+            "<div id=\"mla-header\"><div><div class=\"card-body bg-white mla-contact\">"
+            "<div class=\"row border-bottom pt-2 ml-0 mr-0\"><div class=\"col-lg-auto pb-2\">"
+            "<a href=\"#\">Legislature Office</a><a href=\"#\">Map</a><a href=\"tel:{phone}\">{phone}</a>"
+            "<a href=\"#\">Fax</a><a href=\"#\">Hours</a><a href=\"mailto:{email}\">{email}</a>"
+            "</div></div></div></div></div>"),
+        "area": "780",
+    },
+    "www.leg.bc.ca": {
+        "legislature": "BC",
+        "roster": "/content-committees/pages/mla-contact-information.aspx",
+        "profile": "/members/member-{n}",
+        "roster_page": "<table><tbody>{rows}</tbody></table>",
+        "roster_row": ("<tr><td><a href=\"/members/member-{n}\">{name}</a></td>"
+                       "<td><a href=\"mailto:{email}\">{email}</a></td></tr>"),
+        "profile_page": (
+            "<h2>{name}</h2><div class=\"col-xs-12 col-sm-9 col-md-9\"><div><div>"
+            "<span>MLA:</span><span>{name}</span><span>{riding}</span><span>Elected:</span>"
+            "<span>2020</span><span>Party:</span><span>{party}</span></div></div></div>"
+            "<div class=\"convertToEmail\"><span>Email:</span><span>{email}</span></div>"),
+        "area": "604",
+    },
+    "www.gov.mb.ca": {
+        "legislature": "Manitoba",
+        "roster": "/legislature/members/mla_list_alphabetical.html",
+        "profile": "/legislature/members/info/member{n}.html",
+        "roster_page": "<table><tbody>{rows}</tbody></table>",
+        "roster_row": ("<tr><td><a href=\"/legislature/members/info/member{n}.html\">{name}</a></td>"
+                       "<td>{riding}</td></tr>"),
+        "profile_page": (
+            "<h2>{name}</h2><h2>{riding}</h2><h3>{party}</h3>"
+            "<p><a href=\"mailto:{email}\">{email}</a></p>"
+            "<h3>Constituency Office:</h3><p>100 Main Street<br>Phone: {phone_parens}</p>"),
+        "area": "204",
+    },
+    "www.assembly.pe.ca": {
+        "legislature": "PEI",
+        "roster": "/members",
+        "profile": "/members/member-{n}",
+        "roster_page": ("<div id=\"block-assembly-content\"><div><div><div>"
+                        "<div class=\"view-content row\">{rows}</div></div></div></div></div>"),
+        "roster_row": (
+            "<div class=\"views-row\"><a href=\"/members/member-{n}\">{name}</a>"
+            "<div class=\"views-field views-field-field-member-constituency\"><div>{riding}</div></div>"
+            "<div class=\"views-field views-field-field-member-pol-affiliation\"><div>{party}</div></div></div>"),
+        "profile_page": (
+            "<h1 class=\"title\"><span>{name}</span></h1>"
+            "<div class=\"views-field views-field-field-member-pol-affiliation\"><div>{party}</div></div>"
+            "<div class=\"views-field views-field-field-member-constituency\"><div>{riding}</div></div>"
+            "<div class=\"right-sidebar_sidebar clearfix text-formatted field "
+            "field--name-field-member-contact-information field--type-text-long field--label-hidden "
+            "field__item\"><p><a href=\"mailto:{email}\">{email}</a><br>Phone: {phone}</p></div>"),
+        "area": "782",
+    },
+    "nslegislature.ca": {
+        "legislature": "Nova",
+        "roster": "/members/profiles-table",
+        "profile": "/members/profiles/member-{n}",
+        "roster_page": "<table><thead><tr><th>Name</th><th>Party</th><th>Constituency</th></tr></thead>"
+                       "<tbody>{rows}</tbody></table>",
+        "roster_row": (
+            "<tr><td class=\"views-field views-field-title\"><a href=\"/members/profiles/member-{n}\">{name}</a></td>"
+            "<td class=\"views-field views-field-field-party\">{party}</td>"
+            "<td class=\"views-field views-field-field-constituency\">{riding}</td></tr>"),
+        "profile_page": (
+            "<h1>{name}</h1><table><tbody><tr>"
+            "<td class=\"views-field views-field-field-party\">{party}</td>"
+            "<td class=\"views-field views-field-field-constituency\">{riding}</td></tr></tbody></table>"
+            "<div class=\"panel-pane pane-dsc mla-current-profile-contact\">"
+            "<a href=\"mailto:{email}\">{email}</a><p>Phone: {phone}</p></div>"),
+        "area": "902",
+    },
+}
+
+
+def enrichment_settings(url):
+    """
+    Returns the settings pointing the enrichers at the stub services of a mock server.
+
+    Args:
+        url (str): Base URL of the MockLegislatureServer.
+
+    Returns:
+        dict: The ENRICHMENT_*_URL settings.
+    """
+    return {
+        "ENRICHMENT_GEOCODER_URL": f"{url}/enrichment/search",
+        "ENRICHMENT_DNS_URL": f"{url}/enrichment/resolve",
+        "ENRICHMENT_BOUNDARIES_URL": f"{url}/enrichment/boundaries/",
+    }
+
+
+def enrichment_response(path, query):
+    """
+    Returns the JSON answer of a stub enrichment service, the same for a given query on every run.
+
+    Domains ending in ``.invalid`` have no MX record, every riding has a
+    federal and a provincial boundary of the same name.
+
+    Args:
+        path (str): The service path, below /enrichment.
+        query (dict): The query string parameters, as parsed by urllib.parse.parse_qs.
+
+    Returns:
+        The JSON document, or None for an unknown service.
+    """
+    value = query.get("q", query.get("name", [""]))[0]
+    digest = zlib.crc32(value.encode("utf-8"))
+    if path == "/search":
+        return [{"lat": f"{42 + digest % 1400 / 100:.4f}", "lon": f"{-60 - digest % 7000 / 100:.4f}",
+                 "display_name": value}]
+    if path == "/resolve":
+        if value.endswith(".invalid"):
+            return {"Status": 3, "Answer": []}
+        return {"Status": 0, "Answer": [{"name": value, "type": 15, "data": f"10 mx.{value}."}]}
+    if path == "/boundaries/":
+        return {"objects": [
+            {"name": value, "boundary_set_name": "Federal electoral district", "external_id": str(digest % 100000)},
+            {"name": value, "boundary_set_name": "Provincial electoral district",
+             "external_id": str(digest % 100000 + 100000)},
+        ]}
+    return None
+
+
+def _path_pattern(template):
+    return re.compile(re.escape(template).replace(r"\{n\}", r"(\d+)") + "$")
+
+
+for _site in SITES.values():
+    _site["patterns"] = [_path_pattern(_site[key]) for key in ("profile", "link") if key in _site]
+
+
+def mock_member(site, number):
+    """
+    Returns the synthetic member of a site, the same for a given number on every run.
+
+    Args:
+        site (dict): The site description, from SITES.
+        number (int): The member number.
+
+    Returns:
+        dict: The values substituted in the site's markup, HTML escaped.
+    """
+    first = FIRST_NAMES[number % len(FIRST_NAMES)]
+    last = LAST_NAMES[number // len(FIRST_NAMES) % len(LAST_NAMES)]
+    line = f"{number % 10000:04d}"
+    exchange = 200 + number // 10000 % 800
+    values = {
+        "n": number,
+        "first": first,
+        "last": last,
+        "name": f"{first} {last}",
+        "party": PARTIES[number % len(PARTIES)],
+        "riding": f"{site['legislature']} Riding {number}",
+        "province": site.get("province", ""),
+        "email": f"member{number}@{site['legislature'].lower()}.example.ca",
+        "phone": f"{site['area']}-{exchange}-{line}",
+        "phone_parens": f"({site['area']}) {exchange}-{line}",
+    }
+    return {key: escape(value) if isinstance(value, str) else value for key, value in values.items()}
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    server_version = "MockLegislature/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.delay()
+        if server.inject_error():
+            return self.send_page(503, "<p>Service unavailable</p>", "Error")
+        host, _, path = self.path.lstrip("/").partition("/")
+        path, _, query = path.partition("?")
+        path = "/" + path
+        if host == "enrichment":
+            document = enrichment_response(path, parse_qs(query))
+            if document is None:
+                return self.send_page(404, "<p>Unknown service</p>", "Not found")
+            return self.send_json(document)
+        site = SITES.get(host)
+        if site is None:
+            return self.send_page(404, "<p>Unknown site</p>", "Not found")
+        if path == site["roster"]:
+            rows = "".join(site["roster_row"].format(**mock_member(site, n)) for n in range(server.members))
+            return self.send_page(200, site["roster_page"].format(rows=rows), "Members")
+        for pattern in site["patterns"]:
+            match = pattern.match(path)
+            if match and int(match.group(1)) < server.members:
+                member = mock_member(site, int(match.group(1)))
+                return self.send_page(200, site["profile_page"].format(**member), member["name"])
+        return self.send_page(404, "<p>Page not found</p>", "Not found")
+
+    def send_page(self, status, body, title):
+        content = PAGE.format(title=title, body=body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_json(self, document):
+        content = json.dumps(document).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockLegislatureServer(ThreadingHTTPServer):
+    """
+    HTTP server generating the pages of every legislature site, one thread per connection.
+
+    Attributes:
+        members (int): Number of members of every legislature.
+        latency (float): Seconds each response is delayed.
+        jitter (float): Extra random delay, up to this many seconds.
+        error_rate (float): Share of requests answered with a 503 error.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), members=100, latency=0.0, jitter=0.0,
+                 error_rate=0.0, seed=0):
+        super().__init__(address, MockRequestHandler)
+        self.members = members
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def delay(self):
+        seconds = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def inject_error(self):
+        return self.error_rate > 0 and self.random.random() < self.error_rate
+
+    def start(self):
+        """
+        Serves in a daemon thread and returns the base URL of the server.
+        """
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthetic legislature websites")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--members", type=int, default=100, help="members of every legislature")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds each response is delayed")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay, in seconds")
+    parser.add_argument("--error-rate", dest="error_rate", type=float, default=0.0,
+                        help="share of requests answered with a 503 error")
+    args = parser.parse_args(argv)
+    server = MockLegislatureServer((args.host, args.port), args.members, args.latency,
+                                   args.jitter, args.error_rate)
+    print(f"Serving {len(SITES)} legislatures with {args.members} members each on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# Canonical forms of member names, emails and telephone numbers
+#
+# Legislatures format the same values differently ("Hon. Jane Doe, MPP",
+# "mailto:Jane.Doe@ola.org", "(416) 555-0100"). The canonical_* functions
+# reduce them to keys used to recognise the same member across sources, and
+# normalize_members() cleans the values of whole batches of members for
+# output: E.164 telephone numbers, lowercase validated emails and names
+# without honorifics.
+
+import re
+import unicodedata
+
+_honorifics = re.compile(
+    r"\b(?:the\s+)?(?:hon|honourable|honorable|right\s+hon|rt\s+hon|dr|mr|mrs|ms|mx|"
+    r"mme|mp|mpp|mla|mha|mna|ecm|kc|qc|pc)\b\.?",
+    re.IGNORECASE)
+_name_prefix = re.compile(
+    r"^(?:(?:the\s+)?(?:(?:right\s+|rt\.?\s+)?hon(?:ou?rable|\.)?|dr\.?|mr\.?|mrs\.?|ms\.?|mme\.?)\s+)+",
+    re.IGNORECASE)
+_name_suffix = re.compile(r"(?:,?\s+(?:mp|mpp|mla|mha|mna|ecm|kc|qc|pc|p\.c\.|k\.c\.|q\.c\.))+\.?$",
+                          re.IGNORECASE)
+_email = re.compile(r"^[a-z0-9.!#$%&'*+/=?^_`{|}~-]+@[a-z0-9](?:[a-z0-9-]*[a-z0-9])?(?:\.[a-z0-9](?:[a-z0-9-]*[a-z0-9])?)+$")
+_non_letters = re.compile(r"[^a-z ]+")
+_non_digits = re.compile(r"\D+")
+_batch_non_digits = re.compile(r"[^\d\n]+")
+_batch_spaces = re.compile(r"[^\S\n]+")
+_spaces = re.compile(r"\s+")
+
+
+def strip_accents(text):
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def canonical_name(name):
+    """
+    Returns a comparison key for a member name.
+
+    Honorifics and post-nominals are removed, accents stripped, case folded
+    and punctuation dropped, so ``"Hon. Jean-François Roy, MNA"`` and
+    ``"Jean Francois Roy"`` share a key.
+
+    Args:
+        name (str): The name as scraped.
+
+    Returns:
+        str: The canonical name, empty when nothing is left.
+    """
+    if not name:
+        return ""
+    name = _honorifics.sub(" ", strip_accents(name).casefold())
+    name = name.replace("'", "").replace("\u2019", "").replace("-", " ")
+    name = _non_letters.sub(" ", name)
+    return _spaces.sub(" ", name).strip()
+
+
+def canonical_email(email):
+    """
+    Returns an email address without ``mailto:``, query or surrounding spaces, in lowercase.
+
+    Args:
+        email (str): The address or mailto link as scraped.
+
+    Returns:
+        str: The canonical address, empty when the value is not an address.
+    """
+    if not email:
+        return ""
+    email = email.strip()
+    if email[:7].lower() == "mailto:":
+        email = email[7:]
+    email = email.split("?", 1)[0].strip().lower()
+    return email if "@" in email else ""
+
+
+def canonical_phone(phone):
+    """
+    Returns the ten digits of a North American telephone number.
+
+    Args:
+        phone (str): The number as scraped, e.g. ``"1-416-555-0100"``.
+
+    Returns:
+        str: The ten digits, or the digits as found when they are not a NANP number.
+    """
+    if not phone:
+        return ""
+    digits = _non_digits.sub("", phone)
+    if len(digits) == 11 and digits.startswith("1"):
+        digits = digits[1:]
+    return digits
+
+
+def e164_phone(phone):
+    """
+    Formats a North American telephone number in E.164, e.g. ``+14165550100``.
+
+    Args:
+        phone (str): The number as scraped, e.g. ``"(416) 555-0100"``.
+
+    Returns:
+        str: The E.164 number, empty when the value is not a valid NANP number.
+    """
+    digits = canonical_phone(phone)
+    if len(digits) != 10 or digits[0] in "01" or digits[3] in "01":
+        return ""
+    return "+1" + digits
+
+
+def clean_email(email):
+    """
+    Returns a lowercase email address without ``mailto:``, empty when it is not a valid address.
+    """
+    email = canonical_email(email)
+    return email if _email.match(email) else ""
+
+
+def clean_name(name):
+    """
+    Removes honorifics and post-nominals from a display name.
+
+    ``"Hon. Jane Doe, MPP"`` becomes ``"Jane Doe"``. Accents and case are kept.
+
+    Args:
+        name (str): The name as scraped.
+
+    Returns:
+        str: The cleaned name.
+    """
+    if not name:
+        return ""
+    name = _spaces.sub(" ", name).strip()
+    name = _name_suffix.sub("", _name_prefix.sub("", name))
+    return name.strip(" ,")
+
+
+def _batch_phones(values):
+    # One regex pass over the whole batch instead of one call per number
+    joined = "\n".join(values)
+    digits = _batch_non_digits.sub("", joined).split("\n")
+    if len(digits) != len(values):
+        return [e164_phone(value) for value in values]
+    normalized = []
+    for number in digits:
+        if len(number) == 11 and number[0] == "1":
+            number = number[1:]
+        valid = len(number) == 10 and number[0] not in "01" and number[3] not in "01"
+        normalized.append("+1" + number if valid else "")
+    return normalized
+
+
+def _batch_emails(values):
+    # Case folding and mailto: removal run once over the whole batch
+    joined = _batch_spaces.sub("", "\n".join(values).lower()).replace("mailto:", "")
+    addresses = joined.split("\n")
+    if len(addresses) != len(values):
+        return [clean_email(value) for value in values]
+    return [a if _email.match(a) else "" for a in (a.split("?", 1)[0] for a in addresses)]
+
+
+def normalize_members(members, stats=None, cache=None):
+    """
+    Normalizes the contact fields of a batch of members in place.
+
+    Telephone numbers become E.164, Contact a validated lowercase email and
+    Name loses its honorifics. Values that cannot be normalized are kept as
+    scraped. Telephones and emails are processed as a whole batch, with one
+    regex pass over the joined values. Names repeat across rosters and are
+    cleaned once per distinct value, once overall when the same ``cache`` is
+    passed to every call.
+
+    Args:
+        members (list): Mutable member mappings, e.g. dicts or ItemAdapter instances.
+        stats (collections.Counter): Receives the count of invalid phones and emails.
+        cache (dict): Cleaned names of previous calls, filled by this call.
+
+    Returns:
+        list: The members.
+    """
+    names = {} if cache is None else cache
+    for field, normalize, invalid in (("Telephone", _batch_phones, "invalid_phone"),
+                                      ("Contact", _batch_emails, "invalid_email")):
+        scraped = [(member, member[field]) for member in members if member[field]]
+        for (member, value), normalized in zip(scraped, normalize([v for _, v in scraped])):
+            if normalized:
+                member[field] = normalized
+            elif stats is not None:
+                stats[invalid] += 1
+    for member in members:
+        name = member["Name"]
+        if name:
+            if name not in names:
+                names[name] = clean_name(name) or name
+            member["Name"] = names[name]
+    return members
@@ -3,11 +3,604 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import asyncio
+import hashlib
+import json
+import os
+from collections import Counter
+
+import scrapy
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, DropItem, NotConfigured
+from scrapy.utils.misc import load_object
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from scrapeMPContacts.archive import ArchiveWriter, run_prefix, zstandard
+from scrapeMPContacts.enrichment import EnrichmentClient, TTLCache, aiohttp, enrich_members
+from scrapeMPContacts.identity import KEY_TYPES, MemberIndex, identity_keys
+from scrapeMPContacts.items import MemberItem
+from scrapeMPContacts.memberdb import COLUMNS, MemberDatabase
+from scrapeMPContacts.normalize import canonical_name, normalize_members
+
+# Fields set after extraction, which do not make a member changed
+UNHASHED_FIELDS = ("Latitude", "Longitude", "ContactMX", "BoundaryId", "ChangeType", "Errors")
+
+
+class NormalizationPipeline:
+    """
+    Normalizes the contact fields of every member with precompiled patterns.
+
+    Telephone numbers become E.164 (``+14165550100``), Contact a validated
+    lowercase email without ``mailto:`` and Name loses its honorifics and
+    post-nominals, whatever the legislature. Each distinct name is cleaned
+    once per crawl. Values that cannot be normalized are kept as scraped and
+    counted in the ``normalize/invalid_phone`` and ``normalize/invalid_email``
+    stats.
+
+    Items are collected in batches of NORMALIZATION_BATCH_SIZE, or whatever
+    arrived within NORMALIZATION_BATCH_DELAY seconds, so normalize_members()
+    runs its single regex passes over many members at once. Batching requires
+    the asyncio reactor, a batch size of 1 normalizes every member as it
+    arrives.
+
+    Settings:
+        NORMALIZATION_ENABLED (bool): Enable the pipeline.
+        NORMALIZATION_BATCH_SIZE (int): Members normalized together.
+        NORMALIZATION_BATCH_DELAY (float): Seconds a partial batch waits for more members.
+    """
+
+    def __init__(self, batch_size=100, batch_delay=0.1, stats=None):
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.stats = stats
+        self.cache = {}
+        self.batch = []
+        self.timer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("NORMALIZATION_ENABLED"):
+            raise NotConfigured
+        return cls(
+            batch_size=settings.getint("NORMALIZATION_BATCH_SIZE", 100),
+            batch_delay=settings.getfloat("NORMALIZATION_BATCH_DELAY", 0.1),
+            stats=crawler.stats,
+        )
+
+    async def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        if adapter.get("ChangeType") == "removed":
+            return item
+        if self.batch_size <= 1:
+            self.normalize([adapter])
+            return item
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        self.batch.append((adapter, done))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.batch_delay, self.flush)
+        await done
+        return item
+
+    def flush(self):
+        """
+        Normalizes the members collected so far and passes them on.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        try:
+            self.normalize([adapter for adapter, _ in batch])
+        except Exception as e:
+            for _, done in batch:
+                done.set_exception(e)
+            return
+        for _, done in batch:
+            done.set_result(None)
+
+    def normalize(self, members):
+        invalid = Counter()
+        normalize_members(members, stats=invalid, cache=self.cache)
+        self.stats.inc_value("normalize/batches")
+        for key, count in invalid.items():
+            self.stats.inc_value(f"normalize/{key}", count)
+
+
+class DedupePipeline:
+    """
+    Drops members already scraped under another profile, page or legislature.
+
+    Each member is reduced to canonical identity keys (profile URL, email,
+    name plus telephone) and checked against an index shared by every crawler
+    of the process. The first member seen is emitted and later ones are
+    dropped and reported as collisions with the member they matched, so every
+    member makes one row. The fields a dropped member knew and the kept one
+    left empty are listed under ``added`` in its collisions and counted in the
+    ``dedupe/added_fields/<field>`` stats. Members sharing only an email under
+    different names are kept and reported, as legislatures list shared office
+    inboxes.
+
+    The index is kept in memory, or in a dbm file when DEDUPE_INDEX_PATH is
+    set or a JOBDIR is used. The file is emptied when a run starts, unless
+    the run resumes a JOBDIR, so resumed jobs remember the members emitted
+    before the interruption and other runs start afresh.
+
+    Settings:
+        DEDUPE_ENABLED (bool): Enable the pipeline.
+        DEDUPE_KEYS (list): Identity keys to match on, among 'url', 'email' and 'name_phone'.
+        DEDUPE_INDEX_PATH (str): dbm file spilling the index to disk.
+        DEDUPE_REPORT (str): JSON lines file receiving the collisions, ``%(name)s`` is the spider name.
+    """
+
+    def __init__(self, key_types=KEY_TYPES, index_path=None, report_path=None, stats=None, resume=False):
+        self.key_types = tuple(key_types)
+        self.index_path = index_path
+        self.resume = resume
+        self.report_path = report_path
+        self.stats = stats
+        self.index = None
+        self.collisions = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("DEDUPE_ENABLED"):
+            raise NotConfigured
+        jobdir = settings.get("JOBDIR")
+        index_path = settings.get("DEDUPE_INDEX_PATH")
+        if not index_path and jobdir:
+            index_path = os.path.join(jobdir, "dedupe.db")
+        return cls(
+            key_types=settings.getlist("DEDUPE_KEYS", list(KEY_TYPES)),
+            index_path=index_path,
+            report_path=settings.get("DEDUPE_REPORT"),
+            stats=crawler.stats,
+            # A JOBDIR already holding files is a job being resumed
+            resume=bool(jobdir and os.path.isdir(jobdir) and os.listdir(jobdir)),
+        )
+
+    def open_spider(self, spider):
+        if self.index_path:
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        self.index = MemberIndex.acquire(self.index_path, resume=self.resume)
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        if adapter.get("ChangeType") == "removed":
+            return item
+        keys = identity_keys(adapter, self.key_types)
+        fields = {key: value for key, value in adapter.items() if value and key != "ChangeType"}
+        member = {"Url": adapter.get("Url"), "spider": spider.name,
+                  "name": canonical_name(adapter.get("Name")), "fields": fields}
+        duplicate = None
+        collisions = []
+        for key_type, key, kept in self.index.lookup(keys):
+            # An office inbox shared by several members is not a duplicate
+            shared = (key_type == "email" and member["name"] and kept["name"]
+                      and member["name"] != kept["name"])
+            self.stats.inc_value(f"dedupe/{'shared_email' if shared else key_type + '_collisions'}")
+            if kept["Url"] != member["Url"]:
+                collisions.append({
+                    "key_type": key_type, "key": key, "duplicate": not shared,
+                    "kept_url": kept["Url"], "kept_spider": kept["spider"],
+                    "other_url": member["Url"], "other_spider": spider.name,
+                    "Name": adapter.get("Name"),
+                })
+            if not shared and duplicate is None:
+                duplicate = key_type, key, kept
+        self.collisions.extend(collisions)
+        if duplicate is None:
+            self.index.record(keys, member)
+            return item
+
+        key_type, key, kept = duplicate
+        kept_fields = kept.get("fields", {})
+        added = {field: value for field, value in fields.items() if not kept_fields.get(field)}
+        if added:
+            for collision in collisions:
+                if collision["duplicate"]:
+                    collision["added"] = added
+            self.record_added(kept, added)
+        raise DropItem(f"Duplicate member ({key_type} {key}): {member['Url']}")
+
+    def record_added(self, kept, added):
+        """
+        Records the fields of a dropped duplicate that the member it matched lacks.
+
+        The kept member was already emitted, so the fields are reported rather
+        than emitted in a second row for the same member. The index remembers
+        them, so later copies carrying the same fields are not reported again.
+
+        Args:
+            kept (dict): The index entry of the kept member.
+            added (dict): The fields of the duplicate the kept member lacks.
+        """
+        merged = dict(kept.get("fields", {}), **added)
+        self.stats.inc_value("dedupe/completing_duplicates")
+        for field in added:
+            self.stats.inc_value(f"dedupe/added_fields/{field}")
+        self.index.update(identity_keys(merged, self.key_types), dict(kept, fields=merged))
+
+    def close_spider(self, spider):
+        self.index.release()
+        if self.collisions:
+            spider.logger.info("%d members matched an already scraped member" % len(self.collisions))
+        if self.report_path and self.collisions:
+            with open(self.report_path % {"name": spider.name}, "w", encoding="utf-8") as f:
+                for collision in self.collisions:
+                    f.write(json.dumps(collision, ensure_ascii=False) + "\n")
+
 
 class ScrapempcontactsPipeline:
+    """
+    Keeps a persistent state of every member seen by a spider.
+
+    The state is a JSON file per spider, keyed by the member ``Url`` and holding
+    a content hash of the extracted fields. In incremental mode only members
+    that were added or changed since the previous run are passed on, tagged
+    with a ``ChangeType``, and members missing from the new run are emitted
+    once at the end of the crawl as ``removed``.
+
+    Settings:
+        INCREMENTAL_ENABLED (bool): Emit only added, changed and removed members.
+        INCREMENTAL_STATE_DIR (str): Directory holding the per-spider state files.
+    """
+
+    def __init__(self, state_dir, incremental=False, stats=None):
+        self.state_dir = state_dir
+        self.incremental = incremental
+        self.stats = stats
+        self.previous = {}
+        self.current = {}
+        self.removed_emitted = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        pipeline = cls(
+            settings.get("INCREMENTAL_STATE_DIR", "state"),
+            incremental=settings.getbool("INCREMENTAL_ENABLED"),
+            stats=crawler.stats,
+        )
+        pipeline.crawler = crawler
+        crawler.signals.connect(pipeline.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def state_path(self, spider):
+        return os.path.join(self.state_dir, f"{spider.name}.json")
+
+    def open_spider(self, spider):
+        path = self.state_path(spider)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.previous = json.load(f)
+
     def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        if adapter.get("ChangeType") == "removed":
+            return item
+
+        fields = {key: value for key, value in adapter.items() if key != "ChangeType"}
+        digest = self.content_hash(fields)
+        url = fields.get("Url")
+        self.current[url] = {"hash": digest, "item": fields}
+        if not self.incremental:
+            return item
+
+        previous = self.previous.get(url)
+        if previous is None:
+            change_type = "added"
+        elif previous["hash"] != digest:
+            change_type = "changed"
+        else:
+            self.stats.inc_value("incremental/unchanged")
+            raise DropItem(f"Unchanged member: {url}")
+        self.stats.inc_value(f"incremental/{change_type}")
+        adapter["ChangeType"] = change_type
         return item
+
+    def content_hash(self, fields):
+        """
+        Returns a stable hash of the extracted fields of a member.
+
+        The enrichment fields and Errors are left out, so adding them to the
+        schema or enriching a member does not change the digest.
+
+        Args:
+            fields (dict): The member fields.
+
+        Returns:
+            str: The hexadecimal SHA-1 digest of the extracted fields.
+        """
+        extracted = {key: value for key, value in fields.items() if key not in UNHASHED_FIELDS}
+        payload = json.dumps(extracted, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def spider_idle(self, spider):
+        # Members of the previous run that were not seen again are emitted once,
+        # through a data: request so they pass through every pipeline.
+        if not self.incremental or self.removed_emitted or not self.current:
+            return
+        if self.partial_crawl():
+            return
+        self.removed_emitted = True
+        removed = [url for url in self.previous if url not in self.current]
+        if not removed:
+            return
+        request = scrapy.Request(
+            "data:,", callback=self.emit_removed, cb_kwargs={"urls": removed},
+            meta={"dont_cache": True}, dont_filter=True)
+        self.crawler.engine.crawl(request)
+        raise DontCloseSpider
+
+    def partial_crawl(self):
+        # Member pages skipped because the roster was unchanged are not removed
+        return bool(self.stats and self.stats.get_value("roster/unchanged"))
+
+    def emit_removed(self, response, urls):
+        for url in urls:
+            self.stats.inc_value("incremental/removed")
+            yield MemberItem.from_dict(dict(self.previous[url]["item"], ChangeType="removed"))
+
+    def spider_closed(self, spider, reason):
+        # Only a complete crawl may replace the stored state, an interrupted one
+        # would mark every member it did not reach as removed next time.
+        if reason != "finished" or not self.current:
+            return
+        state = self.current
+        if self.partial_crawl():
+            state = dict(self.previous, **self.current)
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self.state_path(spider)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+class EnrichmentPipeline:
+    """
+    Enriches members with outbound lookups, concurrently with the crawl.
+
+    Items are collected in batches of ENRICHMENT_BATCH_SIZE, or whatever
+    arrived within ENRICHMENT_BATCH_DELAY seconds, and every enricher of
+    ENRICHERS runs over the batch as asyncio coroutines on the crawl's
+    reactor. Each distinct lookup of a batch is sent once, over a single
+    pooled aiohttp client with at most ENRICHMENT_CONCURRENCY lookups in
+    flight, and answered from a TTL cache when it was made before. Items are
+    passed on once their batch is enriched; a failed lookup leaves its
+    fields empty rather than dropping the member.
+
+    The cache is saved to ENRICHMENT_CACHE_PATH when the spider closes, so
+    later runs only look up ridings and domains they have not seen recently.
+    Requires the asyncio reactor and the aiohttp library.
+
+    Settings:
+        ENRICHMENT_ENABLED (bool): Enable the pipeline.
+        ENRICHERS (list): Import paths of the Enricher classes to run.
+        ENRICHMENT_BATCH_SIZE (int): Members enriched together.
+        ENRICHMENT_BATCH_DELAY (float): Seconds a partial batch waits for more members.
+        ENRICHMENT_CONCURRENCY (int): Largest number of lookups in flight.
+        ENRICHMENT_TIMEOUT (float): Seconds before a lookup is abandoned.
+        ENRICHMENT_CACHE_TTL (float): Seconds a lookup result stays valid.
+        ENRICHMENT_CACHE_SIZE (int): Largest number of cached results.
+        ENRICHMENT_CACHE_PATH (str): JSON file keeping the cache between runs, not kept when unset.
+    """
+
+    def __init__(self, enrichers, client, cache, batch_size=50, batch_delay=0.5,
+                 cache_path=None, stats=None):
+        self.enrichers = enrichers
+        self.client = client
+        self.cache = cache
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.cache_path = cache_path
+        self.stats = stats
+        self.batch = []
+        self.timer = None
+        self.semaphore = None
+        self.inflight = {}
+        # Batches being enriched, referenced until done so they are not collected
+        self.tasks = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ENRICHMENT_ENABLED"):
+            raise NotConfigured
+        if aiohttp is None:
+            raise NotConfigured("EnrichmentPipeline requires the aiohttp library")
+        enrichers = [load_object(path)(settings) for path in settings.getlist("ENRICHERS")]
+        if not enrichers:
+            raise NotConfigured
+        ttl = settings.getfloat("ENRICHMENT_CACHE_TTL", 86400)
+        max_entries = settings.getint("ENRICHMENT_CACHE_SIZE", 100000)
+        cache_path = settings.get("ENRICHMENT_CACHE_PATH")
+        cache = TTLCache.load(cache_path, ttl, max_entries) if cache_path else TTLCache(ttl, max_entries)
+        client = EnrichmentClient(
+            concurrency=settings.getint("ENRICHMENT_CONCURRENCY", 8),
+            timeout=settings.getfloat("ENRICHMENT_TIMEOUT", 10.0),
+            user_agent=settings.get("USER_AGENT"),
+        )
+        return cls(
+            enrichers, client, cache,
+            batch_size=settings.getint("ENRICHMENT_BATCH_SIZE", 50),
+            batch_delay=settings.getfloat("ENRICHMENT_BATCH_DELAY", 0.5),
+            cache_path=cache_path,
+            stats=crawler.stats,
+        )
+
+    async def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        if adapter.get("ChangeType") == "removed":
+            return item
+        loop = asyncio.get_running_loop()
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.client.concurrency)
+        done = loop.create_future()
+        self.batch.append((adapter, done))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.batch_delay, self.flush)
+        await done
+        return item
+
+    def flush(self):
+        """
+        Starts enriching the members collected so far.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.batch = self.batch, []
+        if batch:
+            task = asyncio.ensure_future(self.enrich(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def enrich(self, batch):
+        """
+        Enriches a batch, then resumes its members, failing them when the batch fails.
+        """
+        self.stats.inc_value("enrichment/batches")
+        try:
+            await enrich_members([adapter for adapter, _ in batch], self.enrichers, self.client,
+                                 self.cache, semaphore=self.semaphore, stats=self.stats,
+                                 inflight=self.inflight)
+        except Exception as e:
+            for _, done in batch:
+                if not done.done():
+                    done.set_exception(e)
+        finally:
+            for _, done in batch:
+                if not done.done():
+                    done.set_result(None)
+
+    async def close_spider(self, spider):
+        self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+        await self.client.close()
+        self.stats.set_value("enrichment/cache_entries", len(self.cache))
+        if self.cache_path:
+            self.cache.save(self.cache_path)
+
+
+class SQLitePipeline:
+    """
+    Stores members in a local SQLite database.
+
+    Members are buffered and upserted on their ``Url`` in batched transactions.
+    Members reported as removed by the incremental pipeline are deleted, and
+    the previous values of every changed or deleted member are kept in the
+    ``member_history`` table. See ``MemberDatabase`` for querying it.
+
+    Settings:
+        SQLITE_DATABASE (str): Path of the database file, the pipeline is disabled when unset.
+        SQLITE_BATCH_SIZE (int): Members written per transaction.
+    """
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.rows = []
+        self.removed = []
+        self.db = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get("SQLITE_DATABASE")
+        if not path:
+            raise NotConfigured
+        return cls(path, batch_size=crawler.settings.getint("SQLITE_BATCH_SIZE", 500))
+
+    def open_spider(self, spider):
+        self.db = MemberDatabase(self.path)
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        if adapter.get("ChangeType") == "removed":
+            self.removed.append(adapter.get("Url"))
+        else:
+            self.rows.append(tuple(adapter.get(name) for name in COLUMNS))
+        if len(self.rows) + len(self.removed) >= self.batch_size:
+            self.flush(spider)
+        return item
+
+    def flush(self, spider):
+        if self.rows:
+            self.db.upsert(self.rows, spider.name)
+            self.rows = []
+        if self.removed:
+            self.db.delete(self.removed)
+            self.removed = []
+
+    def close_spider(self, spider):
+        self.flush(spider)
+        self.db.close()
+
+
+class ArchivePipeline:
+    """
+    Streams members to compressed NDJSON files, one series of files per run.
+
+    Each member is written as soon as it is scraped and the files are rotated
+    by item count or size, so memory stays constant however large the run.
+    Read archived runs back with ``scrapeMPContacts.archive.iter_members``.
+
+    Settings:
+        ARCHIVE_DIR (str): Directory receiving the archives, the pipeline is disabled when unset.
+        ARCHIVE_COMPRESSION (str): 'gzip' (default), 'zstd' or 'none'.
+        ARCHIVE_MAX_ITEMS (int): Members per file before rotating.
+        ARCHIVE_MAX_BYTES (int): Compressed bytes per file before rotating.
+        ARCHIVE_FLUSH_EVERY (int): Members between compressor flushes.
+    """
+
+    def __init__(self, directory, compression="gzip", max_items=100000,
+                 max_bytes=64 * 1024 * 1024, flush_every=1000):
+        self.directory = directory
+        self.compression = compression
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        directory = settings.get("ARCHIVE_DIR")
+        if not directory:
+            raise NotConfigured
+        compression = settings.get("ARCHIVE_COMPRESSION", "gzip")
+        if compression == "zstd" and zstandard is None:
+            raise NotConfigured("zstd archives require the zstandard library")
+        return cls(
+            directory,
+            compression=compression,
+            max_items=settings.getint("ARCHIVE_MAX_ITEMS", 100000),
+            max_bytes=settings.getint("ARCHIVE_MAX_BYTES", 64 * 1024 * 1024),
+            flush_every=settings.getint("ARCHIVE_FLUSH_EVERY", 1000),
+        )
+
+    def open_spider(self, spider):
+        self.writer = ArchiveWriter(
+            self.directory, run_prefix(spider.name), compression=self.compression,
+            max_items=self.max_items, max_bytes=self.max_bytes, flush_every=self.flush_every)
+
+    def process_item(self, item, spider):
+        self.writer.write(ItemAdapter(item).asdict())
+        return item
+
+    def close_spider(self, spider):
+        self.writer.close()
+        if self.writer.paths:
+            spider.logger.info("Archived members to %s" % ", ".join(self.writer.paths))
@@ -0,0 +1,309 @@
+# Offline replay of recorded legislature pages
+#
+# Responses are recorded into HAR archives by HarRecorderMiddleware and
+# replayed here through the spiders' own callbacks, without any network, to
+# measure the parse path reproducibly.
+
+import base64
+import json
+import logging
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+from scrapy import Request
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.misc import load_object
+from w3lib.url import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+
+class HarArchive:
+    """
+    Recorded responses, stored in the HTTP Archive (HAR 1.2) format.
+
+    Bodies are stored base64 encoded so the archive reproduces the exact bytes
+    the spider received.
+
+    Attributes:
+        entries (dict): Recorded responses keyed by method and canonical URL.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+
+    @staticmethod
+    def key(method, url):
+        return method.upper(), canonicalize_url(url)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an archive from a HAR file.
+
+        Args:
+            path (str): Path of the HAR file.
+
+        Returns:
+            HarArchive: The loaded archive.
+        """
+        with open(path, encoding="utf-8") as f:
+            har = json.load(f)
+        archive = cls()
+        for entry in har["log"]["entries"]:
+            archive.entries[cls.key(entry["request"]["method"], entry["request"]["url"])] = entry
+        return archive
+
+    def add(self, request, response, callback=None):
+        """
+        Records a downloaded response.
+
+        The response is also recorded under every URL that redirected to it,
+        so replayed requests for the original URL find it. Requests sent to
+        the mock server are recorded under the URL of the real site, kept by
+        MockServerMiddleware, so the archive replays against the spider's
+        own URLs.
+
+        Args:
+            request (scrapy.Request): The request the response answers.
+            response (scrapy.http.Response): The downloaded response.
+            callback (str): Name of the spider callback to replay the page with, see recorded_requests().
+        """
+        requested_url = request.meta.get("mock_original_url", request.url)
+        for url in [*request.meta.get("redirect_urls", []), requested_url]:
+            entry = self._entry(request, url, response)
+            if callback:
+                # Custom HAR fields start with an underscore
+                entry["_callback"] = callback
+                entry["_cb_kwargs"] = request.cb_kwargs
+            self.entries[self.key(request.method, url)] = entry
+
+    def _entry(self, request, url, response):
+        return {
+            "startedDateTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "time": round(request.meta.get("download_latency", 0) * 1000, 3),
+            "request": {
+                "method": request.method,
+                "url": url,
+                "httpVersion": "HTTP/1.1",
+                "headers": self._headers(request.headers),
+                "queryString": [],
+                "cookies": [],
+                "headersSize": -1,
+                "bodySize": len(request.body),
+            },
+            "response": {
+                "status": response.status,
+                "statusText": "",
+                "httpVersion": "HTTP/1.1",
+                "headers": self._headers(response.headers),
+                "cookies": [],
+                "content": {
+                    "size": len(response.body),
+                    "mimeType": response.headers.get("Content-Type", b"").decode("latin-1"),
+                    "text": base64.b64encode(response.body).decode("ascii"),
+                    "encoding": "base64",
+                },
+                "redirectURL": response.url if response.url != url else "",
+                "headersSize": -1,
+                "bodySize": len(response.body),
+            },
+            "cache": {},
+            "timings": {"send": 0, "wait": 0, "receive": 0},
+        }
+
+    def _headers(self, headers):
+        return [
+            {"name": name.decode("latin-1"), "value": value.decode("latin-1")}
+            for name, values in headers.items() for value in values
+        ]
+
+    def save(self, path):
+        har = {
+            "log": {
+                "version": "1.2",
+                "creator": {"name": "scrapeMPContacts", "version": "1.0"},
+                "entries": list(self.entries.values()),
+            }
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(har, f)
+
+    def response_for(self, request):
+        """
+        Builds the recorded response for a request.
+
+        Args:
+            request (scrapy.Request): The request to answer.
+
+        Returns:
+            scrapy.http.Response: The recorded response, or None when the request was not recorded.
+        """
+        entry = self.entries.get(self.key(request.method, request.url))
+        if entry is None:
+            return None
+        recorded = entry["response"]
+        content = recorded["content"]
+        if content.get("encoding") == "base64":
+            body = base64.b64decode(content.get("text", ""))
+        else:
+            body = content.get("text", "").encode("utf-8")
+        headers = Headers([(h["name"], h["value"]) for h in recorded["headers"]])
+        url = recorded.get("redirectURL") or request.url
+        cls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return cls(url=url, status=recorded["status"], headers=headers, body=body,
+                   request=request)
+
+
+class ReplayStats:
+    """
+    Timings collected while replaying an archive through a spider.
+
+    Attributes:
+        pages (int): Responses passed to a callback.
+        items (int): Items yielded by the callbacks.
+        missing (int): Requests that were not found in the archive.
+        errors (int): Callbacks that raised an exception.
+        callbacks (dict): Call count and total seconds of each callback.
+        elapsed (float): Wall time of the replay, in seconds.
+        peak_memory (int): Peak memory allocated during the replay, in bytes.
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.items = 0
+        self.missing = 0
+        self.errors = 0
+        self.callbacks = defaultdict(lambda: [0, 0.0])
+        self.elapsed = 0.0
+        self.peak_memory = 0
+
+    def report(self):
+        """
+        Returns the replay report as a dict of plain values.
+        """
+        return {
+            "pages": self.pages,
+            "items": self.items,
+            "missing": self.missing,
+            "errors": self.errors,
+            "seconds": round(self.elapsed, 4),
+            "pages_per_second": round(self.pages / self.elapsed, 1) if self.elapsed else 0.0,
+            "items_per_second": round(self.items / self.elapsed, 1) if self.elapsed else 0.0,
+            "peak_memory_kib": round(self.peak_memory / 1024, 1),
+            "callbacks": {
+                name: {"calls": calls, "seconds": round(seconds, 4),
+                       "ms_per_call": round(seconds * 1000 / calls, 3) if calls else 0.0}
+                for name, (calls, seconds) in self.callbacks.items()
+            },
+        }
+
+
+def start_requests(spider):
+    """
+    Returns the start requests of a spider without running its async start().
+    """
+    if hasattr(spider, "start_requests"):
+        return list(spider.start_requests())
+    return [Request(url, dont_filter=True) for url in spider.start_urls]
+
+
+def recorded_requests(spider, archive):
+    """
+    Returns a request for every archived page recorded with its callback, e.g. quarantined pages.
+    """
+    return [
+        Request(entry["request"]["url"], callback=getattr(spider, entry["_callback"]),
+                cb_kwargs=entry.get("_cb_kwargs") or {}, dont_filter=True)
+        for entry in archive.entries.values() if entry.get("_callback")
+    ]
+
+
+def attach_stats(crawler):
+    """
+    Gives a crawler that was never started the stats collector its spider's callbacks use.
+    """
+    try:
+        stats = crawler.stats
+    except RuntimeError:
+        stats = None
+    if stats is None:
+        crawler.stats = load_object(crawler.settings["STATS_CLASS"])(crawler)
+
+
+def replay(spider, archive, max_pages=None, requests=None, follow=True):
+    """
+    Runs a spider's callbacks over an archive, following the requests they yield.
+
+    Requests are answered from the archive only, each URL once, and requests
+    that were not recorded are counted as missing. The pages are replayed
+    twice: once timed, then once under tracemalloc to measure the peak memory,
+    so the tracing overhead does not distort the timings.
+
+    Args:
+        spider (scrapy.Spider): The spider whose callbacks are replayed.
+        archive (HarArchive): The recorded responses.
+        max_pages (int): Stop after this many responses.
+        requests (list): Requests to start from, the spider's start requests by default.
+        follow (bool): Also replay the requests yielded by the callbacks.
+
+    Returns:
+        ReplayStats: The collected timings.
+    """
+    if getattr(spider, "crawler", None) is not None:
+        attach_stats(spider.crawler)
+    requests = start_requests(spider) if requests is None else list(requests)
+
+    stats = ReplayStats()
+    started = time.perf_counter()
+    _replay_pages(spider, archive, stats, max_pages, requests, follow)
+    stats.elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        _replay_pages(spider, archive, ReplayStats(), max_pages, requests, follow, log_errors=False)
+        stats.peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return stats
+
+
+def _replay_pages(spider, archive, stats, max_pages, requests, follow, log_errors=True):
+    """
+    Replays the pages reachable from the requests once, counting them in stats.
+    """
+    queue = deque(requests)
+    seen = set()
+    default_callback = getattr(spider, "_parse", spider.parse)
+
+    while queue and (max_pages is None or stats.pages < max_pages):
+        request = queue.popleft()
+        key = HarArchive.key(request.method, request.url)
+        if key in seen:
+            continue
+        seen.add(key)
+        response = archive.response_for(request)
+        if response is None:
+            stats.missing += 1
+            continue
+
+        callback = request.callback or default_callback
+        name = getattr(callback, "__name__", "parse").lstrip("_")
+        call_started = time.perf_counter()
+        try:
+            for output in callback(response, **request.cb_kwargs) or ():
+                if isinstance(output, Request):
+                    if follow:
+                        queue.append(output)
+                else:
+                    stats.items += 1
+        except Exception:
+            stats.errors += 1
+            if log_errors:
+                logger.exception("Error replaying %s with %s", request.url, name)
+        timing = stats.callbacks[name]
+        timing[0] += 1
+        timing[1] += time.perf_counter() - call_started
+        stats.pages += 1
@@ -11,6 +11,54 @@ BOT_NAME = "OpenAIBot"
 
 SPIDER_MODULES = ["scrapeMPContacts.spiders"]
 NEWSPIDER_MODULE = "scrapeMPContacts.spiders"
+COMMANDS_MODULE = "scrapeMPContacts.commands"
+
+# Spiders skipped by `scrapy crawlall` when no spider names are given, the
+# generic legislature spider would crawl every legislature a second time
+CRAWLALL_EXCLUDE = ["legislature"]
+
+# Request only the Quebec contact pages planned from the roster page instead
+# of following every deputy page with the CrawlSpider rules
+QUEBEC_REQUEST_PLAN = True
+
+# Legislature descriptions used by the generic `legislature` spider, defaults
+# to the bundled scrapeMPContacts/legislatures.json
+#LEGISLATURE_CONFIG = "legislatures.json"
+# Extract the member pages of the `legislature` spider with precompiled lxml
+# XPath instead of parsel, compare both with `scrapy benchextract
+# <legislature> <archive.har>`. Only applies to `scrapy crawl legislature`:
+# crawlall skips that spider and its per-legislature spiders always use parsel
+FAST_EXTRACTION_ENABLED = False
+# Extract the member pages of the `legislature` spider in this many worker
+# processes (0 extracts them on the reactor thread), with at most
+# PARSE_POOL_MAX_INFLIGHT pages waiting for the pool. Only applies to
+# `scrapy crawl legislature`: crawlall skips that spider and its
+# per-legislature spiders always parse on the reactor thread
+PARSE_POOL_SIZE = 0
+PARSE_POOL_MAX_INFLIGHT = 16
+# Build the members of the `legislature` spider from the "bulk" roster of
+# legislatures that describe one, requesting member pages only for rows that
+# miss a required field, Contact and Telephone included (never, without
+# BULK_SOURCE_PROFILE_FALLBACK, which leaves them empty outside BC). Only
+# applies to `scrapy crawl legislature`: crawlall skips that spider and its
+# per-legislature spiders always request every member page
+BULK_SOURCE_ENABLED = False
+BULK_SOURCE_PROFILE_FALLBACK = True
+
+# Keep the request fingerprints of a JOBDIR as a memory-mapped sorted binary
+# file, so resuming a long crawl neither reloads nor holds its whole history,
+# and serialize its pending requests with marshal rather than pickle
+DUPEFILTER_CLASS = "scrapeMPContacts.fingerprints.CompactDupeFilter"
+SCHEDULER_DISK_QUEUE = "scrapy.squeues.MarshalLifoDiskQueue"
+
+# Share the request queue and fingerprints of a crawl between worker processes
+# or hosts through a SQLite database, instead of a per-process JOBDIR. Every
+# worker running the same spider with these settings joins the same crawl.
+#SCHEDULER = "scrapeMPContacts.sharedqueue.SharedScheduler"
+#DUPEFILTER_CLASS = "scrapeMPContacts.sharedqueue.SharedDupeFilter"
+SHARED_QUEUE_DATABASE = "crawl/queue.db"
+# Seconds before a request claimed by a worker that died is handed out again
+SHARED_QUEUE_LEASE = 600
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 6.2; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/27.0.1453.93 Safari/537.36"
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
@@ -27,7 +75,7 @@ ROBOTSTXT_OBEY = False
 # See also autothrottle settings and docs
 #DOWNLOAD_DELAY = 3
 # The download delay setting will honor only one of:
-#CONCURRENT_REQUESTS_PER_DOMAIN = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = 8
 #CONCURRENT_REQUESTS_PER_IP = 16
 
 # Disable cookies (enabled by default)
@@ -44,27 +92,155 @@ ROBOTSTXT_OBEY = False
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "scrapeMPContacts.middlewares.ScrapempcontactsSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    # Outermost, marks shared queue requests done once their output is queued
+    "scrapeMPContacts.sharedqueue.SharedQueueMiddleware": 10,
+    "scrapeMPContacts.middlewares.RosterFingerprintMiddleware": 550,
+    "scrapeMPContacts.middlewares.RequestFilterMiddleware": 560,
+    "scrapeMPContacts.middlewares.FailSoftMiddleware": 900,
+    # Next to the spider, so only the callbacks themselves are timed
+    "scrapeMPContacts.middlewares.ScrapempcontactsSpiderMiddleware": 990,
+}
+
+# Drop the non-HTTP links, in-page anchors and links repeated on one page
+# yielded by the callbacks before they reach the scheduler.
+# Links on a domain listed below must also match its member page pattern;
+# only add a domain whose member URLs are known for sure.
+REQUEST_FILTER_ENABLED = True
+REQUEST_FILTER_PATTERNS = {
+    "ourcommons.ca": r"^/members/(en|fr)/",
+    "assnat.qc.ca": r"^/(en|fr)/deputes/",
+    "ola.org": r"^/(en|fr)/members/",
+    "gov.mb.ca": r"^/legislature/members/",
+    "nslegislature.ca": r"^/members/",
+}
+
+# Dump the crawl stats, including per-domain latency and per-callback timings,
+# when a spider closes. Formats: "json" or "prometheus".
+#METRICS_EXPORT_PATH = "metrics-%(name)s.json"
+METRICS_EXPORT_FORMAT = "json"
+# Record the spider callbacks with cProfile into PROFILE_OUTPUT
+PROFILE_CALLBACKS = False
+PROFILE_OUTPUT = "%(name)s.prof"
+
+# Skip the member pages of legislatures whose index page lists the same
+# members as last run, with a forced full refresh every N runs
+ROSTER_FINGERPRINT_ENABLED = False
+ROSTER_STATE_DIR = "state"
+ROSTER_FULL_REFRESH_EVERY = 7
+ROSTER_SAMPLE_SIZE = 0
+
+# Yield partial members annotated with their errors when a callback raises,
+# and keep the failing pages in QUARANTINE_DIR/<spider>.har for replay
+FAILSOFT_ENABLED = True
+QUARANTINE_DIR = "quarantine"
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "scrapeMPContacts.middlewares.ScrapempcontactsDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "scrapeMPContacts.sharedqueue.SharedQueueMiddleware": 10,
+    "scrapeMPContacts.middlewares.ScrapempcontactsDownloaderMiddleware": 543,
+    "scrapeMPContacts.middlewares.HarRecorderMiddleware": 585,
+    "scrapeMPContacts.middlewares.AdaptiveConcurrencyMiddleware": 595,
+    "scrapeMPContacts.middlewares.MockServerMiddleware": 950,
+}
+
+# Crawl the local mock legislature server (`python -m scrapeMPContacts.mockserver`)
+# instead of the real sites, `scrapy loadtest` sets it to its own server
+#MOCK_SERVER_URL = "http://127.0.0.1:8800"
+
+# Record every response into <HAR_RECORD_DIR>/<spider>.har for `scrapy replay`
+#HAR_RECORD_DIR = "fixtures"
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
+EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+    "scrapeMPContacts.extensions.FieldHealth": 500,
+}
+
+# Compare per-field fill rates and value shapes with the last healthy run,
+# stored in FIELD_HEALTH_BASELINE_DIR/<spider>.fields.json. With fail fast,
+# a spider whose fields drifted after FIELD_HEALTH_MIN_ITEMS members is closed.
+FIELD_HEALTH_ENABLED = True
+FIELD_HEALTH_BASELINE_DIR = "state"
+FIELD_HEALTH_MAX_DROP = 0.2
+FIELD_HEALTH_MAX_SHAPE_DRIFT = 0.5
+FIELD_HEALTH_MIN_ITEMS = 20
+FIELD_HEALTH_FAIL_FAST = False
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "scrapeMPContacts.pipelines.ScrapempcontactsPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "scrapeMPContacts.pipelines.NormalizationPipeline": 100,
+    "scrapeMPContacts.pipelines.DedupePipeline": 200,
+    "scrapeMPContacts.pipelines.ScrapempcontactsPipeline": 300,
+    "scrapeMPContacts.pipelines.EnrichmentPipeline": 400,
+    "scrapeMPContacts.pipelines.SQLitePipeline": 800,
+    "scrapeMPContacts.pipelines.ArchivePipeline": 850,
+}
+
+# Stream members to compressed NDJSON files under ARCHIVE_DIR, disabled when
+# unset. Files are rotated by item count or compressed size.
+#ARCHIVE_DIR = "archive"
+ARCHIVE_COMPRESSION = "gzip"
+ARCHIVE_MAX_ITEMS = 100000
+ARCHIVE_MAX_BYTES = 67108864
+ARCHIVE_FLUSH_EVERY = 1000
+
+# Format telephones as E.164, lowercase and validate emails and remove
+# honorifics from names, in batches of NORMALIZATION_BATCH_SIZE members
+NORMALIZATION_ENABLED = True
+NORMALIZATION_BATCH_SIZE = 100
+NORMALIZATION_BATCH_DELAY = 0.1
+
+# Drop members already scraped under another page or legislature, matched on
+# their canonical profile URL, email and name plus telephone with the first
+# one seen. The index is spilled to DEDUPE_INDEX_PATH (or the JOBDIR) when set,
+# and only kept from one run to the next when resuming a JOBDIR.
+DEDUPE_ENABLED = True
+DEDUPE_KEYS = ["url", "email", "name_phone"]
+#DEDUPE_INDEX_PATH = "state/dedupe.db"
+#DEDUPE_REPORT = "%(name)s_duplicates.jl"
+
+# Enrich members with the coordinates and boundary of their riding and the MX
+# records of their email domain, in batches, while the crawl goes on. Needs
+# aiohttp. Results are cached for ENRICHMENT_CACHE_TTL seconds. The public
+# Nominatim instance allows one request per second, point
+# ENRICHMENT_GEOCODER_URL at your own geocoder for large runs.
+ENRICHMENT_ENABLED = False
+ENRICHERS = [
+    "scrapeMPContacts.enrichment.ConstituencyGeocoder",
+    "scrapeMPContacts.enrichment.ContactDomainChecker",
+    "scrapeMPContacts.enrichment.RidingBoundaryLookup",
+]
+ENRICHMENT_BATCH_SIZE = 50
+ENRICHMENT_BATCH_DELAY = 0.5
+ENRICHMENT_CONCURRENCY = 8
+ENRICHMENT_TIMEOUT = 10
+ENRICHMENT_CACHE_TTL = 604800
+ENRICHMENT_CACHE_SIZE = 100000
+ENRICHMENT_CACHE_PATH = "state/enrichment.json"
+ENRICHMENT_GEOCODER_URL = "https://nominatim.openstreetmap.org/search"
+ENRICHMENT_DNS_URL = "https://dns.google/resolve"
+ENRICHMENT_BOUNDARIES_URL = "https://represent.opennorth.ca/boundaries/"
+
+# Upsert members into a local SQLite database, disabled when unset
+#SQLITE_DATABASE = "members.db"
+SQLITE_BATCH_SIZE = 500
+
+# Member state is kept per spider in INCREMENTAL_STATE_DIR. With incremental
+# mode enabled only added, changed and removed members are emitted.
+INCREMENTAL_ENABLED = False
+INCREMENTAL_STATE_DIR = "state"
+
+# Adapt the concurrency of each legislature site to its latency and errors,
+# starting from the windows learned by the previous crawl. Replaces AutoThrottle.
+ADAPTIVE_CONCURRENCY_ENABLED = True
+ADAPTIVE_CONCURRENCY_MIN = 1
+ADAPTIVE_CONCURRENCY_MAX = 16
+ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE = 0.5
+ADAPTIVE_CONCURRENCY_STATE = "state/concurrency.json"
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -81,13 +257,27 @@ ROBOTSTXT_OBEY = False
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# Stored pages are revalidated with If-None-Match/If-Modified-Since on every
+# run, unchanged member pages come back as a 304 and are served from disk.
+HTTPCACHE_ENABLED = True
+HTTPCACHE_EXPIRATION_SECS = 0
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_IGNORE_HTTP_CODES = []
+HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+HTTPCACHE_POLICY = "scrapeMPContacts.httpcache.ConditionalGetPolicy"
+# Serve stored pages without revalidating them for this many seconds
+HTTPCACHE_REVALIDATE_AFTER = 0
 
 # Set settings whose default value is deprecated to a future-proof value
 REQUEST_FINGERPRINTER_IMPLEMENTATION = "2.7"
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8"
+
+# Columnar feed exports, e.g. `scrapy crawlall -O members.parquet:parquet`
+FEED_EXPORTERS = {
+    "parquet": "scrapeMPContacts.exporters.ParquetItemExporter",
+}
+FEED_PARQUET_ROW_GROUP_SIZE = 10000
+FEED_PARQUET_COMPRESSION = "snappy"
+# Give every province its own row groups so readers can skip the others
+FEED_PARQUET_PARTITION_BY = "ProvinceTerritory"
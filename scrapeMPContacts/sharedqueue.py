@@ -0,0 +1,390 @@
+# Crawl queue and request fingerprints shared by several worker processes
+#
+# The scheduler and dupefilter below keep their state in a SQLite database
+# instead of a per-process JOBDIR. Any number of workers, on one host or on
+# hosts sharing the database file, pull requests from the same crawl, share
+# its request fingerprints, and resume it after a crash: a request claimed by
+# a worker that died is handed out again once its lease expires.
+#
+# Enable both with:
+#
+#     SCHEDULER = "scrapeMPContacts.sharedqueue.SharedScheduler"
+#     DUPEFILTER_CLASS = "scrapeMPContacts.sharedqueue.SharedDupeFilter"
+#     SHARED_QUEUE_DATABASE = "crawl/queue.db"
+#
+# SharedQueueMiddleware, enabled as a spider and a downloader middleware in the
+# project settings, marks the requests done once they are fully processed.
+
+import marshal
+import os
+import socket
+import sqlite3
+import time
+from collections import deque
+
+from scrapy import Request
+from scrapy.core.scheduler import BaseScheduler
+from scrapy.dupefilters import BaseDupeFilter
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.misc import load_object
+from scrapy.utils.request import request_from_dict
+
+try:
+    from scrapy.utils.misc import build_from_crawler
+except ImportError:
+    from scrapy.utils.misc import create_instance
+
+    def build_from_crawler(objcls, crawler):
+        return create_instance(objcls, settings=None, crawler=crawler)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY,
+    crawl TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    claimed_by TEXT,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS requests_next ON requests (crawl, done, priority DESC, id);
+
+CREATE TABLE IF NOT EXISTS fingerprints (
+    crawl TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (crawl, fingerprint)
+) WITHOUT ROWID;
+"""
+
+
+def crawl_name(crawler):
+    """
+    Returns the name of the shared crawl, SHARED_QUEUE_CRAWL or the spider name.
+    """
+    return crawler.settings.get("SHARED_QUEUE_CRAWL") or crawler.spider.name
+
+
+def is_start_request(request):
+    """
+    Tells whether a request is a start request of the spider, rather than a retry or redirect of one.
+    """
+    if "retry_times" in request.meta or "redirect_times" in request.meta:
+        return False
+    # Scrapy < 2.13 does not set is_start_request, start requests have no depth yet
+    return request.meta.get("is_start_request", "depth" not in request.meta)
+
+
+class SharedQueueStore:
+    """
+    The SQLite database holding the requests and fingerprints of shared crawls.
+
+    Every write is a short IMMEDIATE transaction, so concurrent workers never
+    claim the same request twice.
+
+    Attributes:
+        path (str): Path of the database file.
+        worker (str): Identifier of this worker, host name and process id.
+    """
+
+    def __init__(self, path, timeout=30):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def transaction(self):
+        return _Immediate(self.connection)
+
+    def add_fingerprint(self, crawl, fingerprint):
+        """
+        Records a fingerprint.
+
+        Returns:
+            bool: False when another request of the crawl already had this fingerprint.
+        """
+        with self.transaction():
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO fingerprints (crawl, fingerprint) VALUES (?, ?)",
+                (crawl, fingerprint))
+        return cursor.rowcount == 1
+
+    def push(self, crawl, priority, data):
+        with self.transaction():
+            self.connection.execute(
+                "INSERT INTO requests (crawl, priority, data) VALUES (?, ?, ?)",
+                (crawl, priority, data))
+
+    def claim(self, crawl, lease):
+        """
+        Claims the pending request of highest priority for this worker.
+
+        Requests whose lease expired, because their worker died, are pending again.
+
+        Args:
+            crawl (str): The crawl name.
+            lease (float): Seconds the request stays claimed.
+
+        Returns:
+            tuple: ``(id, data)`` of the claimed request, or None when nothing is pending.
+        """
+        now = time.time()
+        with self.transaction():
+            return self.connection.execute(
+                """
+                UPDATE requests SET claimed_by = ?, claimed_until = ?
+                WHERE id = (
+                    SELECT id FROM requests
+                    WHERE crawl = ? AND done = 0 AND claimed_until < ?
+                    ORDER BY priority DESC, id LIMIT 1)
+                RETURNING id, data
+                """,
+                (self.worker, now + lease, crawl, now)).fetchone()
+
+    def complete(self, request_id):
+        with self.transaction():
+            self.connection.execute("UPDATE requests SET done = 1 WHERE id = ?", (request_id,))
+
+    def replace(self, request_id, priority, data):
+        """
+        Replaces a claimed request with another one, e.g. its retry, and hands it out again.
+        """
+        with self.transaction():
+            self.connection.execute(
+                "UPDATE requests SET priority = ?, data = ?, claimed_by = NULL, claimed_until = 0 "
+                "WHERE id = ?", (priority, data, request_id))
+
+    def pending(self, crawl):
+        """
+        Returns the number of requests not yet completed: pending, or claimed by a live worker.
+        """
+        return self.connection.execute(
+            "SELECT count(*) FROM requests WHERE crawl = ? AND done = 0", (crawl,)).fetchone()[0]
+
+    def started(self, crawl):
+        return self.connection.execute(
+            "SELECT 1 FROM requests WHERE crawl = ? LIMIT 1", (crawl,)).fetchone() is not None
+
+    def clear(self, crawl):
+        """
+        Forgets a finished crawl, so the next run of the same name starts afresh.
+        """
+        with self.transaction():
+            self.connection.execute("DELETE FROM requests WHERE crawl = ?", (crawl,))
+            self.connection.execute("DELETE FROM fingerprints WHERE crawl = ?", (crawl,))
+
+    def close(self):
+        self.connection.close()
+
+
+class _Immediate:
+    # BEGIN IMMEDIATE takes the write lock up front, so read-then-write
+    # statements of concurrent workers cannot interleave.
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class SharedDupeFilter(BaseDupeFilter):
+    """
+    Request fingerprints shared by every worker of a crawl.
+
+    Settings:
+        SHARED_QUEUE_DATABASE (str): Path of the shared SQLite database.
+        SHARED_QUEUE_CRAWL (str): Name of the crawl, the spider name by default.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.store = None
+        self.crawl = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def open(self):
+        self.store = SharedQueueStore(self.crawler.settings.get("SHARED_QUEUE_DATABASE", "crawl/queue.db"))
+        self.crawl = crawl_name(self.crawler)
+
+    def request_seen(self, request):
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        return not self.store.add_fingerprint(self.crawl, fingerprint)
+
+    def close(self, reason):
+        self.store.close()
+
+
+class SharedScheduler(BaseScheduler):
+    """
+    Schedules requests through a SQLite queue shared by several worker processes.
+
+    Requests are claimed with a lease (SHARED_QUEUE_LEASE seconds) and marked
+    done by SharedQueueMiddleware once the requests their callback yielded are
+    queued, or once their download failed for good. Until then the requests
+    of a crashed worker are downloaded again by another one, or by the same
+    one after a restart. A retry or redirect replaces the request it comes
+    from in the queue. Start requests are filtered like any other request,
+    so workers joining or resuming a crawl do not start it over. Requests are
+    serialized with marshal; those that cannot be, e.g. with a callback
+    outside the spider, stay in a local queue of the worker that created them.
+
+    A worker keeps running while other workers still hold requests of the
+    crawl, since they can yield new ones. The last worker to finish clears
+    the crawl, so the next run with the same name starts afresh.
+
+    Settings:
+        SHARED_QUEUE_DATABASE (str): Path of the shared SQLite database.
+        SHARED_QUEUE_CRAWL (str): Name of the crawl, the spider name by default.
+        SHARED_QUEUE_LEASE (float): Seconds a claimed request is reserved to its worker.
+    """
+
+    def __init__(self, crawler, dupefilter, lease=600):
+        self.crawler = crawler
+        self.df = dupefilter
+        self.lease = lease
+        self.stats = crawler.stats
+        self.store = None
+        self.crawl = None
+        self.spider = None
+        self.local = deque()
+        self.claimed = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        path = f"{SharedQueueMiddleware.__module__}.{SharedQueueMiddleware.__name__}"
+        for setting in ("SPIDER_MIDDLEWARES", "DOWNLOADER_MIDDLEWARES"):
+            if settings.getwithbase(setting).get(path) is None:
+                raise ValueError(f"SharedScheduler requires {path} in {setting}")
+        dupefilter = build_from_crawler(load_object(settings["DUPEFILTER_CLASS"]), crawler)
+        return cls(crawler, dupefilter, lease=settings.getfloat("SHARED_QUEUE_LEASE", 600))
+
+    def open(self, spider):
+        self.spider = spider
+        self.store = SharedQueueStore(self.crawler.settings.get("SHARED_QUEUE_DATABASE", "crawl/queue.db"))
+        self.crawl = crawl_name(self.crawler)
+        if self.store.started(self.crawl):
+            spider.logger.info("Joining shared crawl %s with %d requests left"
+                               % (self.crawl, self.store.pending(self.crawl)))
+        return self.df.open()
+
+    def close(self, reason):
+        if reason == "finished" and self.store.pending(self.crawl) == 0:
+            self.store.clear(self.crawl)
+        self.store.close()
+        return self.df.close(reason)
+
+    def has_pending_requests(self):
+        return bool(self.local) or self.store.pending(self.crawl) > 0
+
+    def enqueue_request(self, request):
+        # Callback requests lose the id in SharedQueueMiddleware, a request
+        # still holding one is a retry or redirect of a claimed request
+        replaces = request.meta.pop("shared_queue_id", None)
+        if replaces not in self.claimed:
+            replaces = None
+        if (not request.dont_filter or is_start_request(request)) and self.df.request_seen(request):
+            self.stats.inc_value("scheduler/shared/filtered")
+            if replaces is not None:
+                self.complete(replaces)
+            return False
+        try:
+            data = marshal.dumps(request.to_dict(spider=self.spider))
+        except ValueError:
+            if replaces is not None:
+                request.meta["shared_queue_id"] = replaces
+            self.local.append(request)
+            self.stats.inc_value("scheduler/shared/local")
+            return True
+        if replaces is not None:
+            self.claimed.discard(replaces)
+            self.store.replace(replaces, request.priority, data)
+        else:
+            self.store.push(self.crawl, request.priority, data)
+        self.stats.inc_value("scheduler/enqueued/shared")
+        return True
+
+    def next_request(self):
+        if self.local:
+            return self.local.popleft()
+        claimed = self.store.claim(self.crawl, self.lease)
+        if claimed is None:
+            return None
+        request_id, data = claimed
+        request = request_from_dict(marshal.loads(data), spider=self.spider)
+        request.meta["shared_queue_id"] = request_id
+        self.claimed.add(request_id)
+        self.stats.inc_value("scheduler/dequeued/shared")
+        return request
+
+    def complete(self, request_id):
+        """
+        Marks a request claimed by this worker as done.
+
+        Args:
+            request_id (int): The ``shared_queue_id`` of the request.
+        """
+        if request_id in self.claimed:
+            self.claimed.discard(request_id)
+            self.store.complete(request_id)
+
+
+class SharedQueueMiddleware:
+    """
+    Marks the requests of a SharedScheduler done once they are fully processed.
+
+    As a spider middleware it completes a request after its callback's
+    output went through, so the requests the callback yielded are already in
+    the shared queue, and after an unhandled callback error. As a downloader
+    middleware, it completes the requests whose download failed and was not
+    retried, e.g. an IgnoreRequest. Responses served by the HTTP cache go
+    through the callback like any other. The middleware disables itself
+    unless the SharedScheduler is used.
+
+    It goes last of the spider middlewares, 10 in SPIDER_MIDDLEWARES, and
+    first of the downloader middlewares, 10 in DOWNLOADER_MIDDLEWARES.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not issubclass(load_object(crawler.settings["SCHEDULER"]), SharedScheduler):
+            raise NotConfigured
+        return cls(crawler)
+
+    def complete(self, request_id):
+        if request_id is not None:
+            self.crawler.engine.scheduler.complete(request_id)
+
+    def process_spider_output(self, response, result, spider):
+        request_id = response.request.meta.get("shared_queue_id")
+        for i in result:
+            yield self.detach(i, request_id)
+        self.complete(request_id)
+
+    async def process_spider_output_async(self, response, result, spider):
+        request_id = response.request.meta.get("shared_queue_id")
+        async for i in result:
+            yield self.detach(i, request_id)
+        self.complete(request_id)
+
+    def detach(self, output, request_id):
+        # A callback passing its response.meta on must not pass the id of its request
+        if isinstance(output, Request) and request_id is not None and "shared_queue_id" in output.meta:
+            output = output.replace(meta={k: v for k, v in output.meta.items() if k != "shared_queue_id"})
+        return output
+
+    def process_spider_exception(self, response, exception, spider):
+        self.complete(response.request.meta.get("shared_queue_id"))
+
+    def process_exception(self, request, exception, spider):
+        self.complete(request.meta.get("shared_queue_id"))
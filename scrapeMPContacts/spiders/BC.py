@@ -1,6 +1,8 @@
 import scrapy
 from scrapy.spiders import Spider
 
+from scrapeMPContacts.items import MemberItem
+
 
 class BCSpider(Spider):
     """
@@ -41,27 +43,27 @@ class BCSpider(Spider):
             response (scrapy.http.Response): The response object containing the downloaded page content.
 
         Yields:
-            dict: A dictionary containing extracted information about the member.
+            MemberItem: The extracted information about the member.
         """
-        name = response.css('h2::text').get().strip(
-        ) if response.css('h2::text').get() else ''
-        political_affiliation = response.css(
-            'div.col-xs-12.col-sm-9.col-md-9 > div:nth-child(1) > div ::text').getall()[6].strip()
-        constituency = response.css(
-            'div.col-xs-12.col-sm-9.col-md-9 > div:nth-child(1) > div ::text').getall()[2].strip()
-        contact_email = response.css('div.convertToEmail ::text').getall()[1].strip() if len(response.css(
-            'div.convertToEmail ::text').getall()) > 1 else response.css('div.convertToEmail ::text').getall()[0].strip()
+        # Each selector is evaluated once, its values are reused
+        name = response.css('h2::text').get()
+        details = response.css(
+            'div.col-xs-12.col-sm-9.col-md-9 > div:nth-child(1) > div ::text').getall()
+        political_affiliation = details[6].strip()
+        constituency = details[2].strip()
+        emails = response.css('div.convertToEmail ::text').getall()
+        contact_email = emails[1].strip() if len(emails) > 1 else emails[0].strip()
         # telephone = response.css('div.view-content.col-md ::text').getall()[8].strip()
         telephone = ''
 
-        yield {
-            'Name': name,
-            'Govt': 'Provincial Leader',
-            'PoliticalAffiliation': political_affiliation,
-            'Constituency': constituency,
-            'ProvinceTerritory': 'BC',
-            'PreferredLanguage': 'English',
-            'Contact': contact_email,
-            'Telephone': telephone,
-            'Url': response.url
-        }
+        yield MemberItem(
+            Name=name,
+            Govt='Provincial Leader',
+            PoliticalAffiliation=political_affiliation,
+            Constituency=constituency,
+            ProvinceTerritory='BC',
+            PreferredLanguage='English',
+            Contact=contact_email,
+            Telephone=telephone,
+            Url=response.url
+        )
@@ -1,6 +1,8 @@
 import scrapy
 from scrapy.spiders import Spider
 
+from scrapeMPContacts.items import MemberItem
+
 
 class PEISpider(Spider):
     """
@@ -41,7 +43,7 @@ class PEISpider(Spider):
             response (scrapy.http.Response): The response object containing the downloaded page content.
 
         Yields:
-            dict: A dictionary containing extracted information about the member.
+            MemberItem: The extracted information about the member.
         """
         name = response.css('h1.title ::text').get()
         political_affiliation = response.css(
@@ -54,14 +56,14 @@ class PEISpider(Spider):
         telephone = response.css(
             'div.right-sidebar_sidebar.clearfix.text-formatted.field.field--name-field-member-contact-information.field--type-text-long.field--label-hidden.field__item > p').re_first(r'Phone:\s*([\d-]+)')
 
-        yield {
-            'Name': name,
-            'Govt': 'Provincial Leader',
-            'PoliticalAffiliation': political_affiliation,
-            'Constituency': constituency,
-            'ProvinceTerritory': 'PEI',
-            'PreferredLanguage': 'English',
-            'Contact': contact_email,
-            'Telephone': telephone,
-            'Url': response.url
-        }
+        yield MemberItem(
+            Name=name,
+            Govt='Provincial Leader',
+            PoliticalAffiliation=political_affiliation,
+            Constituency=constituency,
+            ProvinceTerritory='PEI',
+            PreferredLanguage='English',
+            Contact=contact_email,
+            Telephone=telephone,
+            Url=response.url
+        )
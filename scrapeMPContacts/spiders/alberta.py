@@ -1,6 +1,8 @@
 import scrapy
 from scrapy.spiders import Spider
 
+from scrapeMPContacts.items import MemberItem
+
 
 class AlbertaSpider(Spider):
     """
@@ -40,10 +42,9 @@ class AlbertaSpider(Spider):
             response (scrapy.http.Response): The response object containing the downloaded page content.
 
         Yields:
-            dict: A dictionary containing extracted information about the member.
+            MemberItem: The extracted information about the member.
         """
-        name = response.css('h2 ::text').get().strip(
-        ) if response.css('h2 ::text').get() else ''
+        name = response.css('h2 ::text').get()
         political_affiliation = response.css(
             'div.col-lg-6.my-3.px-3.px-lg-0 > p:nth-child(3)::text').get()
         constituency = response.css(
@@ -58,13 +59,14 @@ class AlbertaSpider(Spider):
         telephone = response.css(
             '#mla-header > div > div.card-body.bg-white.mla-contact > div.row.border-bottom.pt-2.ml-0.mr-0 > div.col-lg-auto.pb-2 > a:nth-child(3)::text').get()
 
-        yield {
-            'Name': name,
-            'PoliticalAffiliation': political_affiliation,
-            'Constituency': constituency,
-            'ProvinceTerritory': 'Alberta',
-            'PreferredLanguage': 'English',
-            'Contact': contact_email,
-            'Telephone': telephone,
-            'Url': response.url
-        }
+        yield MemberItem(
+            Name=name,
+            Govt='Provincial Leader',
+            PoliticalAffiliation=political_affiliation,
+            Constituency=constituency,
+            ProvinceTerritory='Alberta',
+            PreferredLanguage='English',
+            Contact=contact_email,
+            Telephone=telephone,
+            Url=response.url
+        )
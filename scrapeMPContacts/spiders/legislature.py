@@ -0,0 +1,179 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import scrapy
+from scrapy.spiders import Spider
+
+from scrapeMPContacts.extraction import (compile_legislatures, extract_in_pool, init_pool_worker,
+                                         load_legislatures)
+from scrapeMPContacts.items import MemberItem
+
+
+class LegislatureSpider(Spider):
+    """
+    Generic spider crawling any legislature described in legislatures.json.
+
+    The selectors of every legislature are compiled once when the spider is
+    created, so member pages are parsed without redundant DOM queries. Adding a
+    legislature only takes a new configuration entry.
+
+    Attributes:
+        name (str): The name of the spider.
+        legislature (str): Comma separated legislatures to crawl, all configured ones by default.
+        extractors (dict): The compiled legislature descriptions, keyed by name.
+        fast_extraction (bool): Extract member pages with lxml directly (FAST_EXTRACTION_ENABLED).
+
+    With PARSE_POOL_SIZE set, member pages are extracted in a pool of worker
+    processes instead of the reactor thread, at most PARSE_POOL_MAX_INFLIGHT
+    pages at a time, and the members are yielded in the order their pages
+    were received.
+
+    With BULK_SOURCE_ENABLED, legislatures describing a bulk source in their
+    configuration are crawled from it: every member comes from one row of the
+    structured roster, and its member page is only requested when the row
+    lacks a required field, to complete the missing fields. Without
+    BULK_SOURCE_PROFILE_FALLBACK, incomplete rows are yielded as they are and
+    a legislature costs a single request.
+
+    Example:
+        scrapy crawl legislature -a legislature=BC,Manitoba -O contacts.csv
+    """
+    name = "legislature"
+
+    def __init__(self, legislature=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.legislature = legislature
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        extractors = compile_legislatures(
+            load_legislatures(crawler.settings.get("LEGISLATURE_CONFIG")))
+        if spider.legislature:
+            names = [name.strip() for name in spider.legislature.split(",")]
+            unknown = [name for name in names if name not in extractors]
+            if unknown:
+                raise ValueError(f"Unknown legislature(s): {', '.join(unknown)}")
+            extractors = {name: extractors[name] for name in names}
+        spider.extractors = extractors
+        spider.fast_extraction = crawler.settings.getbool("FAST_EXTRACTION_ENABLED")
+        spider.bulk_source = crawler.settings.getbool("BULK_SOURCE_ENABLED")
+        spider.bulk_fallback = crawler.settings.getbool("BULK_SOURCE_PROFILE_FALLBACK", True)
+        spider.pool = None
+        pool_size = crawler.settings.getint("PARSE_POOL_SIZE")
+        if pool_size:
+            spider.pool = ProcessPoolExecutor(
+                pool_size, initializer=init_pool_worker,
+                initargs=(crawler.settings.get("LEGISLATURE_CONFIG"),))
+            spider.max_inflight = crawler.settings.getint("PARSE_POOL_MAX_INFLIGHT", 2 * pool_size)
+            spider.inflight = None
+            spider.last_member = None
+        spider.allowed_domains = [
+            domain for extractor in extractors.values() for domain in extractor.allowed_domains]
+        return spider
+
+    async def start(self):
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        for name, extractor in self.extractors.items():
+            if self.bulk_source and extractor.bulk is not None:
+                urls, callback = extractor.bulk.urls, self.parse_bulk
+            else:
+                urls, callback = extractor.start_urls, self.parse
+            for url in urls:
+                yield scrapy.Request(url, callback, cb_kwargs={"legislature": name}, dont_filter=True)
+
+    def parse(self, response, legislature):
+        """
+        Extracts links to individual member pages from a roster page and follows them.
+
+        Args:
+            response (scrapy.http.Response): The response object containing the downloaded page content.
+            legislature (str): The legislature the roster page belongs to.
+        """
+        links = self.extractors[legislature].member_links(response)
+        callback = self.parse_contact_in_pool if self.pool else self.parse_contact
+        yield from response.follow_all(links, callback, cb_kwargs={"legislature": legislature})
+
+    def parse_bulk(self, response, legislature):
+        """
+        Yields the members of a structured roster, following member pages only for incomplete rows.
+
+        Args:
+            response (scrapy.http.Response): The structured roster document.
+            legislature (str): The legislature the roster belongs to.
+
+        Yields:
+            MemberItem: The members whose row has every required field.
+            scrapy.Request: The member pages of the other rows.
+        """
+        bulk = self.extractors[legislature].bulk
+        callback = self.parse_contact_in_pool if self.pool else self.parse_contact
+        stats = self.crawler.stats
+        for member, url in bulk.members(response):
+            if url and self.bulk_fallback and bulk.missing(member):
+                stats.inc_value(f"bulk/{legislature}/profile_fallbacks")
+                yield scrapy.Request(url, callback, cb_kwargs={"legislature": legislature, "row": member})
+                continue
+            stats.inc_value(f"bulk/{legislature}/members")
+            yield MemberItem(**member)
+
+    def parse_contact(self, response, legislature, row=None):
+        """
+        Parses individual member pages with the compiled selectors of their legislature.
+
+        Args:
+            response (scrapy.http.Response): The response object containing the downloaded page content.
+            legislature (str): The legislature the member page belongs to.
+            row (dict): The member as found in the bulk source, completed with the page.
+
+        Yields:
+            MemberItem: The extracted information about the member.
+        """
+        extractor = self.extractors[legislature]
+        if not self.fast_extraction:
+            member = extractor.extract(response)
+        else:
+            member = extractor.extract_fast(response)
+            self.crawler.stats.set_value(f"extraction/{legislature}/fallbacks", extractor.fallbacks)
+        if row is not None:
+            member = extractor.merge(row, member)
+        yield MemberItem(**member)
+
+    async def parse_contact_in_pool(self, response, legislature, row=None):
+        """
+        Parses individual member pages in the parse pool, keeping the order of the pages.
+
+        Args:
+            response (scrapy.http.Response): The response object containing the downloaded page content.
+            legislature (str): The legislature the member page belongs to.
+            row (dict): The member as found in the bulk source, completed with the page.
+
+        Yields:
+            MemberItem: The extracted information about the member.
+        """
+        if self.inflight is None:
+            self.inflight = asyncio.Semaphore(self.max_inflight)
+        # Each page waits for the member of the previous one before yielding its own
+        loop = asyncio.get_running_loop()
+        previous, done = self.last_member, loop.create_future()
+        self.last_member = done
+        try:
+            async with self.inflight:
+                member = await loop.run_in_executor(
+                    self.pool, extract_in_pool, legislature, response.url, response.body,
+                    response.encoding, self.fast_extraction)
+            if row is not None:
+                member = self.extractors[legislature].merge(row, member)
+            if previous is not None:
+                await previous
+            yield MemberItem(**member)
+        finally:
+            done.set_result(None)
+
+    def closed(self, reason):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
@@ -1,6 +1,8 @@
 import scrapy
 from scrapy.spiders import Spider
 
+from scrapeMPContacts.items import MemberItem
+
 
 class ManitobaSpider(Spider):
     """
@@ -40,28 +42,27 @@ class ManitobaSpider(Spider):
             response (scrapy.http.Response): The response object containing the downloaded page content.
 
         Yields:
-            dict: A dictionary containing extracted information about the member.
+            MemberItem: The extracted information about the member.
         """
-        name = response.css('h2::text').getall()[0].strip() if len(
-            response.css('h2::text').getall()) > 1 else response.css('h2 a::text').get()
-        political_affiliation = response.css('h3::text').get(
-        ).strip() if response.css('h3::text').get() else ''
-        constituency = response.css('h2::text').getall()[1].strip() if len(
-            response.css('h2::text').getall()) > 1 else ''
+        # Each selector is evaluated once, its values are reused
+        headings = response.css('h2::text').getall()
+        name = headings[0].strip() if len(headings) > 1 else response.css('h2 a::text').get()
+        political_affiliation = response.css('h3::text').get()
+        constituency = headings[1].strip() if len(headings) > 1 else ''
         contact_email = response.css('a[href^="mailto:"]::text').get()
 
         # telephone = response.css('div.view-content.col-md ::text').getall()[8].strip()
         telephone = response.css(
             'h3:contains("Constituency Office:") + p ::text').re_first(r'Phone:\s*(\(\d{3}\) \d{3}-\d{4})')
 
-        yield {
-            'Name': name,
-            'Govt': 'Provincial Leader',
-            'PoliticalAffiliation': political_affiliation,
-            'Constituency': constituency,
-            'ProvinceTerritory': 'Manitoba',
-            'PreferredLanguage': 'English',
-            'Contact': contact_email,
-            'Telephone': telephone,
-            'Url': response.url
-        }
+        yield MemberItem(
+            Name=name,
+            Govt='Provincial Leader',
+            PoliticalAffiliation=political_affiliation,
+            Constituency=constituency,
+            ProvinceTerritory='Manitoba',
+            PreferredLanguage='English',
+            Contact=contact_email,
+            Telephone=telephone,
+            Url=response.url
+        )
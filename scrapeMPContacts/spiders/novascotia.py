@@ -1,6 +1,8 @@
 import scrapy
 from scrapy.spiders import Spider
 
+from scrapeMPContacts.items import MemberItem
+
 
 class NovaSpider(Spider):
     """
@@ -39,10 +41,9 @@ class NovaSpider(Spider):
             response (scrapy.http.Response): The response object containing the downloaded page content.
 
         Yields:
-            dict: A dictionary containing extracted information about the member.
+            MemberItem: The extracted information about the member.
         """
-        name = response.css('h1 ::text').get().strip(
-        ) if response.css('h1 ::text').get() else ''
+        name = response.css('h1 ::text').get()
         political_affiliation = response.css(
             'table > tbody > tr > td.views-field.views-field-field-party ::text').get().strip()
         constituency = response.css(
@@ -53,13 +54,14 @@ class NovaSpider(Spider):
         telephone = response.css(
             'div.panel-pane.pane-dsc.mla-current-profile-contact p:contains("Phone:")').re_first(r'Phone:\s*([\d-]+)')
 
-        yield {
-            'Name': name,
-            'PoliticalAffiliation': political_affiliation,
-            'Constituency': constituency,
-            'ProvinceTerritory': 'Nova Scotia',
-            'PreferredLanguage': 'English',
-            'Contact': contact_email,
-            'Telephone': telephone,
-            'Url': response.url
-        }
+        yield MemberItem(
+            Name=name,
+            Govt='Provincial Leader',
+            PoliticalAffiliation=political_affiliation,
+            Constituency=constituency,
+            ProvinceTerritory='Nova Scotia',
+            PreferredLanguage='English',
+            Contact=contact_email,
+            Telephone=telephone,
+            Url=response.url
+        )
@@ -1,6 +1,8 @@
 import scrapy
 from scrapy.spiders import Spider
 
+from scrapeMPContacts.items import MemberItem
+
 
 class OntarioSpider(Spider):
     """
@@ -39,26 +41,26 @@ class OntarioSpider(Spider):
             response (scrapy.http.Response): The response object containing the downloaded page content.
 
         Yields:
-            dict: A dictionary containing extracted information about the member.
+            MemberItem: The extracted information about the member.
         """
-        name = response.css(
-            'h2.field-content::text').get().strip() if response.css('h2.field-content::text') else ''
+        name = response.css('h2.field-content::text').get()
         political_affiliation = response.css(
             'div.enteteFicheDepute ul > li:nth-child(2)::text').get()
-        constituency = response.css('p.riding a::text').getall()[1].strip() if len(
-            response.css('p.riding a::text').getall()) > 1 else ''
+        riding_links = response.css('p.riding a::text').getall()
+        constituency = riding_links[1].strip() if len(riding_links) > 1 else ''
         contact_email = response.css(
             'span.field-content a[href^="mailto:"]::text').get()
         # telephone = response.css('div.view-content.col-md ::text').getall()[8].strip()
         telephone = ''  # will fix later not working for every page
 
-        yield {
-            'Name': name,
-            'PoliticalAffiliation': political_affiliation,
-            'Constituency': constituency,
-            'ProvinceTerritory': 'Ontario',
-            'PreferredLanguage': 'English',
-            'Contact': contact_email,
-            'Telephone': telephone,
-            'Url': response.url
-        }
+        yield MemberItem(
+            Name=name,
+            Govt='Provincial Leader',
+            PoliticalAffiliation=political_affiliation,
+            Constituency=constituency,
+            ProvinceTerritory='Ontario',
+            PreferredLanguage='English',
+            Contact=contact_email,
+            Telephone=telephone,
+            Url=response.url
+        )
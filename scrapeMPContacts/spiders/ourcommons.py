@@ -1,6 +1,6 @@
 import scrapy
-from scrapy.linkextractors import LinkExtractor
-from scrapy.spiders import Rule, CrawlSpider
+
+from scrapeMPContacts.items import MemberItem
 
 
 class OurcommonsSpider(scrapy.Spider):
@@ -11,24 +11,11 @@ class OurcommonsSpider(scrapy.Spider):
         name (str): The name of the spider.
         allowed_domains (list): A list of allowed domains for the spider.
         start_urls (list): A list of URLs where the spider will start crawling.
-        rules (list): A list of rules for the spider to follow links and parse pages.
     """
     name = "ourcommons"
     allowed_domains = ["ourcommons.ca"]
     start_urls = ["https://www.ourcommons.ca/members/en/search"]
 
-    rules = [
-        Rule(
-            LinkExtractor(
-                canonicalize=True,
-                unique=True,
-                allow_domains=allowed_domains,
-            ),
-            follow=True,
-            callback="parse"
-        ),
-    ]
-
     def parse(self, response):
         """
         The default callback used by Scrapy to process downloaded responses.
@@ -52,15 +39,16 @@ class OurcommonsSpider(scrapy.Spider):
             response (scrapy.http.Response): The response object containing the downloaded page content.
 
         Yields:
-            dict: A dictionary containing extracted information about the member.
+            MemberItem: The extracted information about the member.
         """
-        yield {
-            'Name': response.css('h1::text').get(),
-            'Political Affiliation': response.css('dd.mip-mp-profile-caucus::text').get(),
-            'Constituency': response.css('dd a::text').get(),
-            'Province/Territory': response.css('dt:contains("Province / Territory:") + dd::text').get(),
-            'Preferred Language': response.css('dt:contains("Preferred Language:") + dd::text').get(),
-            'Contact': response.css('#contact a::text').get(),
-            'Telephone': response.css('p:contains("Telephone")::text').re_first(r'Telephone:\s+([\d-]+)'),
-            'Url': response.url
-        }
+        yield MemberItem(
+            Name=response.css('h1::text').get(),
+            Govt='Federal Leader',
+            PoliticalAffiliation=response.css('dd.mip-mp-profile-caucus::text').get(),
+            Constituency=response.css('dd a::text').get(),
+            ProvinceTerritory=response.css('dt:contains("Province / Territory:") + dd::text').get(),
+            PreferredLanguage=response.css('dt:contains("Preferred Language:") + dd::text').get(),
+            Contact=response.css('#contact a::text').get(),
+            Telephone=response.css('p:contains("Telephone")::text').re_first(r'Telephone:\s+([\d-]+)'),
+            Url=response.url
+        )
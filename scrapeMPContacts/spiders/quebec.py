@@ -2,6 +2,8 @@ import scrapy
 from scrapy.linkextractors import LinkExtractor
 from scrapy.spiders import Rule, CrawlSpider
 
+from scrapeMPContacts.items import MemberItem
+
 
 class QuebecSpider(CrawlSpider):
     """
@@ -12,6 +14,10 @@ class QuebecSpider(CrawlSpider):
         allowed_domains (list): A list of allowed domains for the spider.
         start_urls (list): A list of URLs where the spider will start crawling.
         rules (list): A list of rules for the spider to follow links and parse pages.
+
+    With the QUEBEC_REQUEST_PLAN setting, the rules are bypassed: the contact
+    page URLs are planned from the roster page alone and only those are
+    requested, about 1 + N requests instead of 2N or more.
     """
     name = "Quebec"
     allowed_domains = ["assnat.qc.ca"]
@@ -31,6 +37,33 @@ class QuebecSpider(CrawlSpider):
         ),
     ]
 
+    async def start(self):
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        plan = self.settings.getbool("QUEBEC_REQUEST_PLAN")
+        for url in self.start_urls:
+            # Without a callback, CrawlSpider applies the rules to the roster page
+            yield scrapy.Request(url, self.plan if plan else None, dont_filter=True)
+
+    def plan(self, response):
+        """
+        Requests the contact page of every member listed on the roster page.
+
+        The deputy index pages the rules would have downloaded first are counted
+        as avoided requests.
+
+        Args:
+            response (scrapy.http.Response): The roster page.
+        """
+        rule_links = {link.url for rule in self._rules for link in rule.link_extractor.extract_links(response)}
+        planned = list(self.parse(response))
+        stats = self.crawler.stats
+        stats.inc_value("plan/planned_requests", len(planned))
+        stats.inc_value("plan/avoided_requests", len(rule_links - {request.url for request in planned}))
+        yield from planned
+
     def parse(self, response):
         """
         The default callback used by Scrapy to process downloaded responses.
@@ -57,16 +90,16 @@ class QuebecSpider(CrawlSpider):
             response (scrapy.http.Response): The response object containing the downloaded page content.
 
         Yields:
-            dict: A dictionary containing extracted information about the member.
+            MemberItem: The extracted information about the member.
         """
-        print(response.url)
-        yield {
-            'Name': ' '.join(response.css("h1 ::text").getall()),
-            'PoliticalAffiliation': response.css('div.enteteFicheDepute ul > li:nth-child(2)::text').get(),
-            'Constituency': response.css('div.enteteFicheDepute > ul > li:nth-child(1) ::text').get(),
-            'ProvinceTerritory': 'Quebec',
-            'PreferredLanguage': 'French',
-            'Contact': response.css('div.blockAdresseDepute a[href^="mailto:"]::attr(href)').get(),
-            'Telephone': response.css('div.blockAdresseDepute span.paragraph').re_first(r'Telephone:\s*([\d-]+)'),
-            'Url': response.url
-        }
+        yield MemberItem(
+            Name=' '.join(response.css("h1 ::text").getall()),
+            Govt='Provincial Leader',
+            PoliticalAffiliation=response.css('div.enteteFicheDepute ul > li:nth-child(2)::text').get(),
+            Constituency=response.css('div.enteteFicheDepute > ul > li:nth-child(1) ::text').get(),
+            ProvinceTerritory='Quebec',
+            PreferredLanguage='French',
+            Contact=response.css('div.blockAdresseDepute a[href^="mailto:"]::attr(href)').get(),
+            Telephone=response.css('div.blockAdresseDepute span.paragraph').re_first(r'Telephone:\s*([\d-]+)'),
+            Url=response.url
+        )
@@ -0,0 +1,59 @@
+import json
+import time
+from types import SimpleNamespace
+
+from scrapy import Request
+from scrapy.core.downloader import Slot
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from scrapeMPContacts.middlewares import AdaptiveConcurrencyMiddleware
+
+
+def make_middleware(tmp_path, learned=None):
+    state_path = tmp_path / "concurrency.json"
+    if learned is not None:
+        state_path.write_text(json.dumps(learned))
+    crawler = get_crawler(settings_dict={
+        "ADAPTIVE_CONCURRENCY_ENABLED": True,
+        "ADAPTIVE_CONCURRENCY_STATE": str(state_path),
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 8,
+    })
+    crawler.stats.open_spider()
+    crawler.spider = SimpleNamespace(logger=SimpleNamespace(debug=lambda *args: None))
+    crawler.engine = SimpleNamespace(downloader=SimpleNamespace(slots={}))
+    middleware = AdaptiveConcurrencyMiddleware.from_crawler(crawler)
+    middleware.spider_opened(crawler.spider)
+    return middleware, crawler.engine.downloader.slots
+
+
+def queued(middleware, slots, key="example.org"):
+    # What the downloader does before sending request_reached_downloader
+    request = Request(f"https://{key}/", meta={"download_slot": key})
+    slots.setdefault(key, Slot(8, 0, 0))
+    middleware.request_reached_downloader(request, None)
+    return request
+
+
+def test_learned_window_applied_to_new_slot(tmp_path):
+    middleware, slots = make_middleware(tmp_path, {"example.org": 3})
+    queued(middleware, slots)
+    assert slots["example.org"].concurrency == 3
+
+
+def test_backoff_ignores_requests_sent_before_the_change(tmp_path):
+    middleware, slots = make_middleware(tmp_path, {"example.org": 8})
+    requests = [queued(middleware, slots) for _ in range(4)]
+    time.sleep(0.01)
+
+    middleware.process_exception(requests[0], TimeoutError(), None)
+    assert slots["example.org"].concurrency == 4
+    # The other requests were in flight with the old window
+    middleware.process_exception(requests[1], TimeoutError(), None)
+    response = Response("https://example.org/", status=503, request=requests[2])
+    middleware.process_response(requests[2], response, None)
+    assert slots["example.org"].concurrency == 4
+
+    time.sleep(0.01)
+    middleware.process_exception(queued(middleware, slots), TimeoutError(), None)
+    assert slots["example.org"].concurrency == 2
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import pytest
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapeMPContacts.middlewares import ScrapempcontactsSpiderMiddleware
+
+
+def parse_contact(response):
+    yield {"Name": "Jane Doe"}
+    time.sleep(0.02)
+    raise ValueError("missing riding")
+
+
+async def parse_contact_async(response):
+    for item in parse_contact(response):
+        yield item
+
+
+def middleware_and_response(callback):
+    middleware = ScrapempcontactsSpiderMiddleware(MemoryStatsCollector(get_crawler()))
+    request = Request("https://example.org/member", callback=callback)
+    return middleware, HtmlResponse(request.url, body=b"", request=request)
+
+
+def assert_failed_call_recorded(stats):
+    assert stats.get_value("callback/parse_contact/calls") == 1
+    assert stats.get_value("callback/parse_contact/errors") == 1
+    assert stats.get_value("callback/parse_contact/items") == 1
+    assert stats.get_value("callback/parse_contact/seconds") >= 0.02
+
+
+def test_failing_callback_is_timed():
+    middleware, response = middleware_and_response(parse_contact)
+    output = middleware.process_spider_output(response, parse_contact(response), None)
+    with pytest.raises(ValueError):
+        list(output)
+    assert_failed_call_recorded(middleware.stats)
+
+
+def test_failing_async_callback_is_timed():
+    middleware, response = middleware_and_response(parse_contact)
+
+    async def consume():
+        async for _ in middleware.process_spider_output_async(response, parse_contact_async(response), None):
+            pass
+
+    with pytest.raises(ValueError):
+        asyncio.run(consume())
+    assert_failed_call_recorded(middleware.stats)
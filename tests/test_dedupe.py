@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import pytest
+from scrapy.exceptions import DropItem
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapeMPContacts.identity import MemberIndex
+from scrapeMPContacts.items import MemberItem
+from scrapeMPContacts.pipelines import DedupePipeline
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = DedupePipeline(stats=MemoryStatsCollector(get_crawler()))
+    spider = SimpleNamespace(name="ourcommons", logger=SimpleNamespace(info=lambda *args: None))
+    pipeline.open_spider(spider)
+    yield pipeline, spider
+    pipeline.close_spider(spider)
+
+
+def test_duplicate_fields_are_reported_not_emitted(pipeline):
+    pipeline, spider = pipeline
+    kept = MemberItem(Name="Jane Doe", Contact="jane.doe@parl.gc.ca", Url="https://example.org/roster/1")
+    assert pipeline.process_item(kept, spider) is kept
+
+    duplicate = MemberItem(Name="Hon. Jane Doe", Contact="mailto:Jane.Doe@parl.gc.ca",
+                           Telephone="613-555-0101", Url="https://example.org/profile/1")
+    with pytest.raises(DropItem):
+        pipeline.process_item(duplicate, spider)
+    assert pipeline.stats.get_value("dedupe/completing_duplicates") == 1
+    assert pipeline.stats.get_value("dedupe/added_fields/Telephone") == 1
+    assert pipeline.collisions[0]["kept_url"] == "https://example.org/roster/1"
+    assert pipeline.collisions[0]["added"]["Telephone"] == "613-555-0101"
+
+    # The index now knows the telephone, a third copy adds nothing
+    with pytest.raises(DropItem):
+        pipeline.process_item(MemberItem(Name="Jane Doe", Telephone="(613) 555-0101",
+                                         Url="https://example.org/other/1"), spider)
+    assert pipeline.stats.get_value("dedupe/completing_duplicates") == 1
+
+
+def test_one_row_per_member(pipeline):
+    pipeline, spider = pipeline
+    members = [
+        MemberItem(Name="Jane Doe", Contact="jane.doe@parl.gc.ca", Url="https://example.org/roster/1"),
+        MemberItem(Name="John Roe", Url="https://example.org/roster/2"),
+        MemberItem(Name="Jane Doe", Contact="jane.doe@parl.gc.ca", Telephone="613-555-0101",
+                   Url="https://example.org/profile/1"),
+        MemberItem(Name="John Roe", PoliticalAffiliation="Liberal", Url="https://example.org/roster/2"),
+        MemberItem(Name="Jane Doe", Telephone="613-555-0101", Url="https://example.org/federal/1"),
+    ]
+    emitted = []
+    for member in members:
+        try:
+            emitted.append(pipeline.process_item(member, spider))
+        except DropItem:
+            pass
+    assert [member.Url for member in emitted] == ["https://example.org/roster/1", "https://example.org/roster/2"]
+    assert pipeline.stats.get_value("dedupe/completing_duplicates") == 2
+
+
+def test_shared_inbox_is_not_merged(pipeline):
+    pipeline, spider = pipeline
+    pipeline.process_item(MemberItem(Name="Jane Doe", Contact="office@example.org", Url="https://example.org/1"), spider)
+    other = MemberItem(Name="John Roe", Contact="office@example.org", Telephone="613-555-0102",
+                       Url="https://example.org/2")
+    assert pipeline.process_item(other, spider).Name == "John Roe"
+    assert pipeline.stats.get_value("dedupe/completing_duplicates") is None
+
+
+def run(tmp_path, members, resume=False):
+    pipeline = DedupePipeline(index_path=str(tmp_path / "dedupe.db"), stats=MemoryStatsCollector(get_crawler()),
+                              resume=resume)
+    spider = SimpleNamespace(name="Ontario", logger=SimpleNamespace(info=lambda *args: None))
+    pipeline.open_spider(spider)
+    emitted = []
+    for member in members:
+        try:
+            emitted.append(pipeline.process_item(member, spider))
+        except DropItem:
+            pass
+    pipeline.close_spider(spider)
+    return emitted
+
+
+def test_stored_index_is_only_kept_for_resumed_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(MemberIndex, "_opened", set())
+    members = [MemberItem(Name=f"Member {n}", Url=f"https://example.org/{n}") for n in range(3)]
+    assert len(run(tmp_path, members)) == 3
+    # A new process runs the crawl again with the same DEDUPE_INDEX_PATH
+    monkeypatch.setattr(MemberIndex, "_opened", set())
+    assert len(run(tmp_path, members)) == 3
+    # A JOBDIR job interrupted after two members, then resumed, remembers them
+    monkeypatch.setattr(MemberIndex, "_opened", set())
+    assert len(run(tmp_path, members[:2])) == 2
+    monkeypatch.setattr(MemberIndex, "_opened", set())
+    assert run(tmp_path, members, resume=True) == members[2:]
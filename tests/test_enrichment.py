@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+from itemadapter import ItemAdapter
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapeMPContacts import enrichment
+from scrapeMPContacts.enrichment import (
+    ConstituencyGeocoder, ContactDomainChecker, RidingBoundaryLookup, TTLCache, enrich_members,
+)
+from scrapeMPContacts.items import MemberItem
+from scrapeMPContacts.mockserver import MockLegislatureServer, enrichment_response, enrichment_settings
+from scrapeMPContacts.pipelines import EnrichmentPipeline
+
+
+@pytest.fixture
+def stub():
+    server = MockLegislatureServer(members=0)
+    yield server.start()
+    server.stop()
+
+
+def enrich(members, settings, cache, stats):
+    pytest.importorskip("aiohttp")
+    enrichers = [ConstituencyGeocoder(settings), ContactDomainChecker(settings), RidingBoundaryLookup(settings)]
+
+    async def run():
+        client = enrichment.EnrichmentClient(concurrency=4, timeout=5)
+        try:
+            await enrich_members(members, enrichers, client, cache, asyncio.Semaphore(4), stats)
+        finally:
+            await client.close()
+
+    asyncio.run(run())
+
+
+def test_enrich_members_against_stub(stub):
+    members = [ItemAdapter(member) for member in [
+        MemberItem(Name="Jane Doe", Govt="Federal Leader", Constituency="Ottawa Centre",
+                   ProvinceTerritory="Ontario", Contact="jane.doe@parl.example.ca"),
+        MemberItem(Name="John Lee", Govt="Federal Leader", Constituency="Ottawa Centre",
+                   ProvinceTerritory="Ontario", Contact="mailto:john.lee@parl.example.ca"),
+        MemberItem(Name="Ann Roy", Govt="Provincial Leader", Constituency="Ottawa Centre",
+                   ProvinceTerritory="Ontario", Contact="ann.roy@gone.invalid"),
+        MemberItem(Name="Kevin Chen", Govt="Provincial Leader"),
+    ]]
+    settings = Settings(enrichment_settings(stub))
+    cache, stats = TTLCache(), MemoryStatsCollector(get_crawler())
+    enrich(members, settings, cache, stats)
+
+    place = enrichment_response("/search", {"q": ["Ottawa Centre, Ontario, Canada"]})[0]
+    federal, provincial = enrichment_response("/boundaries/", {"name": ["Ottawa Centre"]})["objects"]
+    jane, john, ann, kevin = members
+    assert (jane["Latitude"], jane["Longitude"]) == (place["lat"], place["lon"])
+    assert (jane["ContactMX"], john["ContactMX"], ann["ContactMX"]) == ("yes", "yes", "no")
+    assert jane["BoundaryId"] == john["BoundaryId"] == federal["external_id"]
+    assert ann["BoundaryId"] == provincial["external_id"]
+    assert (kevin["Latitude"], kevin["ContactMX"], kevin["BoundaryId"]) == ("", "", "")
+    # Members sharing a riding or an email domain share one lookup
+    assert stats.get_value("enrichment/geocode/lookups") == 1
+    assert stats.get_value("enrichment/mx/lookups") == 2
+    assert stats.get_value("enrichment/boundary/lookups") == 2
+
+    # A later batch is answered from the cache
+    again = [ItemAdapter(MemberItem(Govt="Federal Leader", Constituency="Ottawa Centre",
+                                    ProvinceTerritory="Ontario", Contact="x@parl.example.ca"))]
+    enrich(again, settings, cache, stats)
+    assert again[0]["BoundaryId"] == federal["external_id"] and again[0]["ContactMX"] == "yes"
+    assert stats.get_value("enrichment/geocode/cache_hits") == 1
+    assert stats.get_value("enrichment/mx/cache_hits") == 1
+    assert stats.get_value("enrichment/geocode/lookups") == 1
+
+
+def test_failed_lookup_is_not_cached(stub):
+    settings = Settings(dict(enrichment_settings(stub), ENRICHMENT_DNS_URL=f"{stub}/enrichment/unknown"))
+    member = ItemAdapter(MemberItem(Constituency="Halifax", ProvinceTerritory="Nova Scotia",
+                                    Contact="member@nova.example.ca"))
+    cache, stats = TTLCache(), MemoryStatsCollector(get_crawler())
+    enrich([member], settings, cache, stats)
+
+    assert member["ContactMX"] == ""
+    assert member["Latitude"]
+    assert stats.get_value("enrichment/mx/errors") == 1
+    assert stats.get_value("enrichment/errors/ClientResponseError") == 1
+    assert cache.get("mx|nova.example.ca") is None
+
+
+def test_ttl_cache(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(enrichment.time, "time", lambda: now[0])
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.set("a", {"x": "1"})
+    cache.set("b", {"x": "2"})
+    assert cache.get("a") == {"x": "1"} and cache.hits == 1
+    # The oldest entry is evicted once the cache is full
+    cache.set("c", {"x": "3"})
+    assert cache.get("a") is None and len(cache) == 2
+
+    now[0] += 30
+    cache.set("b", {"x": "2"})
+    path = str(tmp_path / "cache" / "enrichment.json")
+    cache.save(path)
+    now[0] += 45
+    # c expired and is dropped, b was refreshed and survives a reload
+    loaded = TTLCache.load(path, ttl=60)
+    assert loaded.get("c") is None
+    assert loaded.get("b") == {"x": "2"}
+    assert len(loaded) == 1
+    assert len(TTLCache.load(str(tmp_path / "missing.json"))) == 0
+
+
+def test_close_spider_waits_for_batches(stub):
+    pytest.importorskip("aiohttp")
+    settings = Settings(enrichment_settings(stub))
+    pipeline = EnrichmentPipeline(
+        [ConstituencyGeocoder(settings), RidingBoundaryLookup(settings)],
+        enrichment.EnrichmentClient(concurrency=2, timeout=5), TTLCache(),
+        batch_size=2, batch_delay=60, stats=MemoryStatsCollector(get_crawler()))
+    members = [MemberItem(Govt="Provincial Leader", Constituency=f"Riding {n}", ProvinceTerritory="Ontario")
+               for n in range(5)]
+
+    async def crawl():
+        items = [asyncio.ensure_future(pipeline.process_item(member, None)) for member in members]
+        await asyncio.sleep(0)
+        # Two full batches are in flight, the last member waits for the batch delay
+        assert len(pipeline.tasks) == 2 and len(pipeline.batch) == 1
+        await pipeline.close_spider(None)
+        assert not pipeline.tasks and all(item.done() for item in items)
+        return await asyncio.gather(*items)
+
+    assert asyncio.run(crawl()) == members
+    assert all(member.BoundaryId and member.Latitude for member in members)
+    assert pipeline.stats.get_value("enrichment/batches") == 3
+
+
+class BrokenEnricher(ConstituencyGeocoder):
+    def key(self, member):
+        raise ValueError("no key")
+
+
+def test_failed_batch_fails_its_members(stub):
+    pytest.importorskip("aiohttp")
+    pipeline = EnrichmentPipeline(
+        [BrokenEnricher(Settings(enrichment_settings(stub)))],
+        enrichment.EnrichmentClient(), TTLCache(), batch_size=1, stats=MemoryStatsCollector(get_crawler()))
+
+    async def crawl():
+        try:
+            with pytest.raises(ValueError, match="no key"):
+                await pipeline.process_item(MemberItem(Constituency="Halifax"), None)
+        finally:
+            await pipeline.close_spider(None)
+
+    asyncio.run(crawl())
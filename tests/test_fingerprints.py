@@ -0,0 +1,129 @@
+import os
+import random
+
+from scrapy import Request
+from scrapy.dupefilters import RFPDupeFilter
+
+from scrapeMPContacts.fingerprints import (
+    RECORD_SIZE, CompactDupeFilter, FingerprintStore, bucket_of, read_requests_seen,
+)
+
+
+def fingerprints(count, seed=0):
+    rng = random.Random(seed)
+    keys = {rng.randbytes(RECORD_SIZE) for _ in range(count)}
+    # Both ends of the bucket table
+    keys |= {b"\x00" * RECORD_SIZE, b"\xff" * RECORD_SIZE, b"\x00\x00" + b"\x01" * 18}
+    return sorted(keys)
+
+
+def test_compact_then_lookup(tmp_path):
+    first, second = fingerprints(2000, seed=1), fingerprints(500, seed=2)
+    store = FingerprintStore(str(tmp_path))
+    for key in first:
+        store.add(key)
+    store.compact()
+    assert not store.recent and os.path.getsize(store.log_path) == 0
+    # Merge into an existing index, then reopen it
+    for key in second:
+        if key not in store:
+            store.add(key)
+    store.close()
+
+    store = FingerprintStore(str(tmp_path))
+    expected = sorted(set(first) | set(second))
+    assert len(store) == len(store.records) == len(expected)
+    assert [store.records[i] for i in range(len(expected))] == expected
+    for bucket in {bucket_of(key) for key in expected}:
+        lo, hi = store.offsets[bucket], store.offsets[bucket + 1]
+        assert all(bucket_of(store.records[i]) == bucket for i in range(lo, hi))
+    assert all(key in store for key in expected)
+    assert not any(key in store for key in fingerprints(500, seed=3) if key not in set(expected))
+    # Fingerprints of another size are stored hashed
+    store.add(b"\x01" * 8)
+    assert b"\x01" * 8 in store
+    store.close()
+
+
+def test_crash_truncated_log_is_replayed(tmp_path):
+    compacted, logged, later = (fingerprints(300, seed=4), fingerprints(50, seed=5),
+                                fingerprints(50, seed=6))
+    store = FingerprintStore(str(tmp_path))
+    for key in compacted:
+        store.add(key)
+    store.compact()
+    for key in logged:
+        if key not in store:
+            store.add(key)
+    store.log.flush()
+    # The process dies in the middle of a record, without closing the store
+    with open(store.log_path, "ab") as f:
+        f.write(b"\x42" * (RECORD_SIZE // 2))
+
+    resumed = FingerprintStore(str(tmp_path))
+    new = set(logged) - set(compacted)
+    assert resumed.recent == new
+    assert os.path.getsize(resumed.log_path) == len(new) * RECORD_SIZE
+    assert all(key in resumed for key in compacted + logged)
+    # Records logged after the partial one replay too
+    for key in later:
+        if key not in resumed:
+            resumed.add(key)
+    resumed.log.flush()
+    expected = set(compacted) | set(logged) | set(later)
+
+    again = FingerprintStore(str(tmp_path))
+    assert len(again) == len(expected)
+    assert all(key in again for key in expected)
+    again.close()
+    assert len(FingerprintStore(str(tmp_path)).records) == len(expected)
+
+
+def test_log_left_after_compaction_is_not_merged_twice(tmp_path):
+    keys = fingerprints(200, seed=7)
+    store = FingerprintStore(str(tmp_path))
+    for key in keys:
+        store.add(key)
+    store.log.flush()
+    with open(store.log_path, "rb") as f:
+        log = f.read()
+    store.close()
+    # A crash between replacing the index and emptying the log
+    with open(store.log_path, "wb") as f:
+        f.write(log)
+
+    resumed = FingerprintStore(str(tmp_path))
+    assert not resumed.recent
+    assert len(resumed) == len(keys)
+    resumed.add(b"\x07" * RECORD_SIZE)
+    resumed.close()
+    assert len(FingerprintStore(str(tmp_path)).records) == len(keys) + 1
+
+
+def test_import_hex_requests_seen(tmp_path):
+    keys = fingerprints(100, seed=8)
+    with open(tmp_path / "requests.seen", "w") as f:
+        f.writelines(key.hex() + "\n" for key in keys)
+
+    store = FingerprintStore(str(tmp_path))
+    assert len(store) == len(keys)
+    assert all(key in store for key in keys)
+    store.close()
+    # Imported once, a resumed store does not read requests.seen again
+    os.remove(tmp_path / "requests.seen")
+    assert len(FingerprintStore(str(tmp_path))) == len(keys)
+
+
+def test_import_length_prefixed_requests_seen(tmp_path):
+    requests = [Request(f"https://example.org/members/{n}") for n in range(50)]
+    dupefilter = RFPDupeFilter(str(tmp_path))
+    for request in requests:
+        dupefilter.request_seen(request)
+    dupefilter.close("finished")
+    with open(tmp_path / "requests.seen", "rb") as f:
+        assert len(read_requests_seen(f.read())) == len(requests)
+
+    resumed = CompactDupeFilter(str(tmp_path))
+    assert all(resumed.request_seen(request) for request in requests)
+    assert not resumed.request_seen(Request("https://example.org/members/new"))
+    resumed.close("finished")
@@ -0,0 +1,21 @@
+from itemadapter import ItemAdapter
+
+from scrapeMPContacts.items import MemberItem
+from scrapeMPContacts.pipelines import ScrapempcontactsPipeline
+
+SCRAPED = {"Name": "Jane Doe", "Govt": "Provincial Leader", "PoliticalAffiliation": "Liberal",
+           "Constituency": "Ottawa Centre", "ProvinceTerritory": "Ontario", "PreferredLanguage": "English",
+           "Contact": "jane.doe@ola.org", "Telephone": "+14165550100",
+           "Url": "https://www.ola.org/en/members/all/jane-doe"}
+
+
+def test_content_hash_covers_only_extracted_fields():
+    pipeline = ScrapempcontactsPipeline("state")
+    digest = pipeline.content_hash(SCRAPED)
+    # The digest of a state written before the enrichment fields existed
+    member = ItemAdapter(MemberItem(**SCRAPED))
+    assert pipeline.content_hash(member.asdict()) == digest
+    enriched = MemberItem(**SCRAPED, Latitude="45.4", Longitude="-75.7", ContactMX="yes", BoundaryId="35075",
+                          ChangeType="changed", Errors="ValueError: parse_contact")
+    assert pipeline.content_hash(ItemAdapter(enriched).asdict()) == digest
+    assert pipeline.content_hash(dict(SCRAPED, Telephone="+14165550101")) != digest
@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_loadtest_leaves_no_state_behind(tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT, SCRAPY_SETTINGS_MODULE="scrapeMPContacts.settings",
+               TMPDIR=str(tmp_path / "tmp"))
+    os.mkdir(tmp_path / "tmp")
+    os.mkdir(tmp_path / "run")
+    result = subprocess.run([sys.executable, "-m", "scrapy", "loadtest", "--members", "5", "--json",
+                             "-s", "SQLITE_DATABASE=members.db", "Ontario", "Manitoba"],
+                            cwd=tmp_path / "run", env=env, capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert '"finish_reason": "finished"' in result.stdout
+    # Member state, quarantine, dedupe index and database all went to the removed temporary directory
+    assert os.listdir(tmp_path / "run") == []
+    assert os.listdir(tmp_path / "tmp") == []
@@ -0,0 +1,23 @@
+import asyncio
+
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapeMPContacts.items import MemberItem
+from scrapeMPContacts.pipelines import NormalizationPipeline
+
+
+def test_members_are_normalized_in_batches():
+    pipeline = NormalizationPipeline(batch_size=3, batch_delay=0.05, stats=MemoryStatsCollector(get_crawler()))
+    members = [MemberItem(Name=f"Hon. Member {n}, MPP", Telephone="(416) 555-0100",
+                          Contact=f"mailto:Member.{n}@OLA.org") for n in range(5)]
+
+    async def scrape():
+        return await asyncio.gather(*(pipeline.process_item(member, None) for member in members))
+
+    assert asyncio.run(scrape()) == members
+    # A full batch of 3, then the 2 left once the batch delay expired
+    assert pipeline.stats.get_value("normalize/batches") == 2
+    assert members[4].Name == "Member 4"
+    assert members[4].Telephone == "+14165550100"
+    assert members[4].Contact == "member.4@ola.org"
@@ -0,0 +1,85 @@
+import tracemalloc
+from urllib.request import urlopen
+
+from scrapy import Request, Spider
+from scrapy.crawler import Crawler
+from scrapy.http import HtmlResponse
+
+from scrapeMPContacts.mockserver import MockLegislatureServer
+from scrapeMPContacts.replay import HarArchive, replay
+from scrapeMPContacts.spiders.quebec import QuebecSpider
+
+INDEX = "https://example.org/members"
+
+
+class MembersSpider(Spider):
+    name = "members"
+    start_urls = [INDEX]
+
+    def __init__(self):
+        super().__init__()
+        self.tracing = []
+
+    def parse(self, response):
+        self.tracing.append(tracemalloc.is_tracing())
+        for href in response.css("a::attr(href)").getall():
+            yield Request(response.urljoin(href), callback=self.parse_member)
+
+    def parse_member(self, response):
+        self.tracing.append(tracemalloc.is_tracing())
+        yield {"Name": response.css("h1::text").get()}
+
+
+def record(archive, url, body):
+    request = Request(url)
+    archive.add(request, HtmlResponse(url, body=body, encoding="utf-8", request=request))
+
+
+def test_replay_times_pages_without_tracing():
+    archive = HarArchive()
+    record(archive, INDEX, '<a href="/1">1</a><a href="/2">2</a><a href="/3">3</a>')
+    for number in (1, 2):
+        record(archive, f"https://example.org/{number}", f"<h1>Member {number}</h1>")
+    spider = MembersSpider()
+
+    stats = replay(spider, archive)
+
+    assert (stats.pages, stats.items, stats.missing, stats.errors) == (3, 2, 1, 0)
+    assert stats.callbacks["parse_member"][0] == 2
+    assert stats.peak_memory > 0
+    # The timed pass runs first, without tracemalloc, the memory pass after it
+    assert spider.tracing == [False] * 3 + [True] * 3
+    assert not tracemalloc.is_tracing()
+
+
+def test_replay_quebec_request_plan():
+    server = MockLegislatureServer(members=3)
+    url = server.start()
+    archive = HarArchive()
+    try:
+        roster = "https://www.assnat.qc.ca/en/deputes/index.html"
+        pages = [roster] + [f"https://www.assnat.qc.ca/en/deputes/member-{n}/coordonnees.html" for n in range(3)]
+        for page in pages:
+            with urlopen(url + "/" + page.split("://", 1)[1]) as f:
+                record(archive, page, f.read().decode("utf-8"))
+    finally:
+        server.stop()
+    # Built as `scrapy replay` builds it, without starting a crawl
+    crawler = Crawler(QuebecSpider, {"QUEBEC_REQUEST_PLAN": True})
+    spider = QuebecSpider.from_crawler(crawler)
+
+    stats = replay(spider, archive)
+
+    assert (stats.pages, stats.items, stats.missing, stats.errors) == (4, 3, 0, 0)
+    # Counted by both the timed and the memory pass
+    assert crawler.stats.get_value("plan/planned_requests") == 6
+
+
+def test_mock_server_pages_are_recorded_under_the_real_url():
+    archive = HarArchive()
+    request = Request("http://127.0.0.1:8800/example.org/members",
+                      meta={"mock_original_url": INDEX, "download_slot": "example.org"})
+    archive.add(request, HtmlResponse(INDEX, body=b"<h1>Members</h1>", request=request))
+
+    assert archive.response_for(Request(INDEX)) is not None
+    assert archive.response_for(Request(request.url)) is None
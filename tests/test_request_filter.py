@@ -0,0 +1,34 @@
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapeMPContacts.middlewares import RequestFilterMiddleware
+
+ROSTER = "https://www.ola.org/en/members/parliament-43"
+
+
+def filtered(middleware, urls, page=ROSTER):
+    response = HtmlResponse(page, body=b"")
+    output = middleware.process_spider_output(response, [Request(url) for url in urls], None)
+    return [request.url for request in output]
+
+
+def test_links_are_filtered_per_page_with_urls_unchanged():
+    middleware = RequestFilterMiddleware({"ola.org": r"^/(en|fr)/members/"},
+                                         MemoryStatsCollector(get_crawler()))
+    urls = [
+        "https://www.ola.org/en/members/all/jane-doe?b=2&a=1",
+        "https://www.ola.org/en/members/all/jane-doe?a=1&b=2#photo",
+        ROSTER + "#top",
+        "ftp://ftp.ola.org/members.csv",
+        "https://www.ola.org/en/visit",
+        "https://www.ola.org/en/members/all/john-roe",
+    ]
+    assert filtered(middleware, urls) == urls[:1] + urls[-1:]
+    stats = middleware.stats
+    assert [stats.get_value(f"request_filter/dropped/{reason}")
+            for reason in ("duplicate", "self_link", "scheme", "off_pattern")] == [1, 1, 1, 1]
+
+    # Another page may link the same members, the dupefilter filters them
+    assert filtered(middleware, urls[:1], page="https://www.ola.org/en/members/current") == urls[:1]
@@ -0,0 +1,52 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from scrapeMPContacts.mockserver import MockLegislatureServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def server():
+    server = MockLegislatureServer(members=3)
+    server.start()
+    yield server
+    server.stop()
+
+
+def crawl(directory, server):
+    settings = {
+        "MOCK_SERVER_URL": server.url,
+        "SCHEDULER": "scrapeMPContacts.sharedqueue.SharedScheduler",
+        "DUPEFILTER_CLASS": "scrapeMPContacts.sharedqueue.SharedDupeFilter",
+        # Mock pages have no validators, keep them in the cache anyway
+        "HTTPCACHE_REVALIDATE_AFTER": 3600,
+        "CLOSESPIDER_TIMEOUT": 30,
+    }
+    args = [sys.executable, "-m", "scrapy", "crawl", "Ontario", "-L", "INFO"]
+    for name, value in settings.items():
+        args += ["-s", f"{name}={value}"]
+    env = dict(os.environ, PYTHONPATH=ROOT, SCRAPY_SETTINGS_MODULE="scrapeMPContacts.settings")
+    result = subprocess.run(args, cwd=directory, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return result.stderr
+
+
+def test_cached_responses_complete_their_requests(tmp_path, server):
+    # The HTTP cache needs a project data dir
+    shutil.copy(os.path.join(ROOT, "scrapy.cfg"), tmp_path)
+    crawl(tmp_path, server)
+
+    log = crawl(tmp_path, server)
+
+    assert "'httpcache/hit': 4" in log
+    assert "'finish_reason': 'finished'" in log
+    assert "'item_scraped_count': 3" in log
+    # Every request was completed, so the last worker cleared the crawl
+    database = sqlite3.connect(tmp_path / "crawl" / "queue.db")
+    assert database.execute("SELECT count(*) FROM requests").fetchone() == (0,)